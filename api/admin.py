@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import UserProfile, Movie, Review, Comment, Like
+from .models import UserProfile, Movie, Review, Comment, Like, Job
 
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
@@ -32,3 +32,9 @@ class CommentAdmin(admin.ModelAdmin):
 class LikeAdmin(admin.ModelAdmin):
     list_display = ('user', 'review', 'timestamp')
     list_filter = ('timestamp',)
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('task', 'key', 'status', 'attempts', 'run_at', 'finished_at')
+    list_filter = ('status', 'task')
+    search_fields = ('task', 'key')
@@ -0,0 +1,170 @@
+"""
+Async read endpoints for the ASGI application.
+
+DRF 3.14 views are synchronous, so under ASGI every request to a viewset
+holds a worker thread for as long as its queries take. The views here are
+plain Django async views serving the hottest reads (feed, movie list and
+detail, movie reviews, review comments) with the async ORM. They reuse the
+serializers, paginators and filtering of ``api/views.py``, so they answer
+with the same JSON as the synchronous endpoints they mirror, and are
+mounted under ``/api/async/``.
+
+They do not go through the response cache in ``api/responsecache.py``.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.core.exceptions import ObjectDoesNotExist
+from django.http import Http404
+from rest_framework import exceptions, status
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.renderers import BrowsableAPIRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from .models import Movie, Review, Comment
+from .serializers import MovieSerializer, MovieDetailSerializer, ReviewSerializer, CommentSerializer
+from .pagination import AsyncPageNumberPagination, ReviewCursorPagination, CommentCursorPagination, FeedCursorPagination
+from .views import MovieViewSet, add_search_truncated
+from . import fastserializers, fieldsets
+
+
+async def _authenticate(request, authenticators):
+    for authenticator in authenticators:
+        if hasattr(authenticator, 'aauthenticate'):
+            user_auth = await authenticator.aauthenticate(request)
+        else:
+            user_auth = await sync_to_async(authenticator.authenticate)(request)
+        if user_auth is not None:
+            request.user, request.auth = user_auth
+            return
+    request.user, request.auth = AnonymousUser(), None
+
+
+def _render(response, request):
+    # Negotiate among the API's renderers, less the browsable API, which needs a view.
+    renderers = [
+        renderer() for renderer in api_settings.DEFAULT_RENDERER_CLASSES
+        if not issubclass(renderer, BrowsableAPIRenderer)
+    ]
+    try:
+        renderer, media_type = DefaultContentNegotiation().select_renderer(request, renderers)
+    except exceptions.NotAcceptable:
+        renderer, media_type = renderers[0], renderers[0].media_type
+    response.accepted_renderer = renderer
+    response.accepted_media_type = media_type
+    response.renderer_context = {'request': request, 'response': response, 'view': None}
+    return response.render()
+
+
+def async_api_view(require_authentication=False):
+    """
+    Turn ``async def view(request, **kwargs) -> Response`` into a GET-only
+    Django async view that authenticates like ``REST_FRAMEWORK`` and
+    renders errors the way DRF's exception handler does.
+    """
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(django_request, *args, **kwargs):
+            authenticators = [auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+            request = Request(django_request)
+            try:
+                if django_request.method not in ('GET', 'HEAD', 'OPTIONS'):
+                    raise exceptions.MethodNotAllowed(django_request.method)
+                await _authenticate(request, authenticators)
+                if require_authentication and not request.user.is_authenticated:
+                    raise exceptions.NotAuthenticated()
+                response = await view(request, *args, **kwargs)
+            except (Http404, ObjectDoesNotExist):
+                response = _error_response(exceptions.NotFound(), request, authenticators)
+            except exceptions.APIException as exc:
+                response = _error_response(exc, request, authenticators)
+            return _render(response, request)
+        return wrapper
+    return decorator
+
+
+def _error_response(exc, request, authenticators):
+    headers = {}
+    if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+        # As in APIView.permission_denied: 401 with a challenge when possible.
+        header = authenticators[0].authenticate_header(request) if authenticators else None
+        if header:
+            headers['WWW-Authenticate'] = header
+        else:
+            exc.status_code = status.HTTP_403_FORBIDDEN
+    if isinstance(exc.detail, (list, dict)):
+        data = exc.detail
+    else:
+        data = {'detail': exc.detail}
+    return Response(data, status=exc.status_code, headers=headers)
+
+
+def _context(request):
+    return {'request': request, 'format': None, 'view': None}
+
+
+async def _paginated(paginator, queryset, request, serializer_class):
+    serializer = serializer_class(context=_context(request))
+    ordering = [name.lstrip('-') for name in getattr(paginator, 'ordering', None) or ()]
+    compiled = fastserializers.compile_serializer(serializer, queryset)
+    if compiled is not None:
+        page = await paginator.apaginate_queryset(compiled.rows(queryset, extra=ordering), request)
+        return paginator.get_paginated_response(compiled.represent(page))
+    queryset = fieldsets.optimize_queryset(queryset, serializer, extra=ordering)
+    page = await paginator.apaginate_queryset(queryset, request)
+    return paginator.get_paginated_response(serializer_class(page, many=True, context=_context(request)).data)
+
+
+@async_api_view()
+async def movie_list(request):
+    """
+    Async ``GET /api/movies/``, with the same filters and ordering.
+    """
+    view = MovieViewSet(request=request, action='list', args=(), kwargs={}, format_kwarg=None)
+    # get_queryset may query the full-text index before building the queryset.
+    queryset = await sync_to_async(view.get_queryset)()
+    response = await _paginated(AsyncPageNumberPagination(), queryset, request, MovieSerializer)
+    return add_search_truncated(response, view.search_truncated)
+
+
+@async_api_view()
+async def movie_detail(request, pk):
+    """
+    Async ``GET /api/movies/<pk>/``.
+    """
+    movie = await Movie.objects.select_related('rating_stats').aget(pk=pk)
+    return Response(MovieDetailSerializer(movie, context=_context(request)).data)
+
+
+@async_api_view()
+async def movie_reviews(request, pk):
+    """
+    Async ``GET /api/movies/<pk>/reviews/``.
+    """
+    if not await Movie.objects.filter(pk=pk).aexists():
+        raise Http404
+    queryset = Review.objects.filter(movie_id=pk).select_related('user__profile')
+    return await _paginated(ReviewCursorPagination(), queryset, request, ReviewSerializer)
+
+
+@async_api_view()
+async def review_comments(request, pk):
+    """
+    Async ``GET /api/reviews/<pk>/comments/``.
+    """
+    if not await Review.objects.filter(pk=pk).aexists():
+        raise Http404
+    queryset = Comment.objects.filter(review_id=pk).select_related('author__profile')
+    return await _paginated(CommentCursorPagination(), queryset, request, CommentSerializer)
+
+
+@async_api_view(require_authentication=True)
+async def feed(request):
+    """
+    Async ``GET /api/profiles/feed/``.
+    """
+    queryset = Review.objects.select_related('user__profile')
+    return await _paginated(FeedCursorPagination(), queryset, request, ReviewSerializer)
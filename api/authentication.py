@@ -0,0 +1,169 @@
+"""
+JWT authentication that resolves users from an in-process cache.
+
+``JWTAuthentication`` loads the ``User`` row on every request although the
+token already names the user, and most views then read ``user.profile``
+too. ``CachedJWTAuthentication`` keeps recently seen users, with their
+profile, in a bounded LRU cache with a TTL, so a warm request runs no
+authentication queries at all.
+
+Entries are dropped by the receivers in ``api/signals.py`` whenever a user
+or profile is saved or deleted, which covers deactivation and password
+changes. That only reaches the current process; other workers keep their
+copy until ``TIMEOUT`` expires, and so do the profile's counter columns,
+which are updated without signals.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from . import profiling
+
+DEFAULT_SETTINGS = {
+    'MAX_SIZE': 10000,
+    # Seconds a user stays cached; bounds staleness across processes.
+    'TIMEOUT': 60,
+}
+
+
+def get_settings():
+    return {**DEFAULT_SETTINGS, **getattr(settings, 'AUTH_USER_CACHE', {})}
+
+
+class UserCache:
+    """
+    Thread-safe LRU cache of ``user_id -> (expiry, token claim, user)``.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id, claim):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            expires, cached_claim, user = entry
+            if expires < time.monotonic() or cached_claim != claim:
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return user
+
+    def set(self, user_id, claim, user):
+        config = get_settings()
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + config['TIMEOUT'], claim, user)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > config['MAX_SIZE']:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+user_cache = UserCache()
+
+
+def _copy(user):
+    # Each request gets its own instances, so nothing a view sets on
+    # request.user leaks into the cached copy.
+    user = copy.copy(user)
+    profile = user._state.fields_cache.get('profile')
+    if profile is not None:
+        profile = copy.copy(profile)
+        profile._state.fields_cache['user'] = user
+        user._state.fields_cache['profile'] = profile
+    return user
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    ``JWTAuthentication`` backed by ``user_cache``, loading users with their profile.
+    """
+
+    def authenticate(self, request):
+        with profiling.timed('auth'):
+            return super().authenticate(request)
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        claim = self._get_claim(validated_token)
+        user = user_cache.get(user_id, claim)
+        if user is None:
+            try:
+                user = self._get_queryset().get(**{api_settings.USER_ID_FIELD: user_id})
+            except self.user_model.DoesNotExist:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+            self._check_user(user, validated_token)
+            user_cache.set(user_id, claim, user)
+        return _copy(user)
+
+    async def aauthenticate(self, request):
+        """
+        ``authenticate`` for async views: a cache miss loads the user with ``aget``.
+        """
+        with profiling.timed('auth'):
+            header = self.get_header(request)
+            if header is None:
+                return None
+            raw_token = self.get_raw_token(header)
+            if raw_token is None:
+                return None
+            validated_token = self.get_validated_token(raw_token)
+            return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        claim = self._get_claim(validated_token)
+        user = user_cache.get(user_id, claim)
+        if user is None:
+            try:
+                user = await self._get_queryset().aget(**{api_settings.USER_ID_FIELD: user_id})
+            except self.user_model.DoesNotExist:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+            self._check_user(user, validated_token)
+            user_cache.set(user_id, claim, user)
+        return _copy(user)
+
+    def _get_claim(self, validated_token):
+        # The revocation claim ties an entry to the password the token was
+        # issued for, so tokens issued before a password change never match.
+        if api_settings.CHECK_REVOKE_TOKEN:
+            return validated_token.get(api_settings.REVOKE_TOKEN_CLAIM)
+        return None
+
+    def _get_queryset(self):
+        queryset = self.user_model.objects.all()
+        if hasattr(self.user_model, 'profile'):
+            queryset = queryset.select_related('profile')
+        return queryset
+
+    def _check_user(self, user, validated_token):
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
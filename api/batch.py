@@ -0,0 +1,159 @@
+"""
+Set-based social actions for many targets in one request.
+
+Each function runs in a single transaction. Inserts skip rows that conflict
+with the existing unique constraints and report the rows they did insert,
+and deletes run with the per-row receivers muted. Counters and cache
+versions are updated here once per batch instead of once per item, by the
+rows actually written, and the timeline and trending jobs the signals would
+queue are queued here too.
+"""
+from collections import defaultdict
+
+import django
+from django.db import connections, router, transaction
+from django.db.models.constants import OnConflict
+from django.utils import timezone
+
+from .models import UserProfile, Review, Like
+from . import counters, responsecache, signals, timelines, trending
+
+LIKED = 'liked'
+ALREADY_LIKED = 'already_liked'
+UNLIKED = 'unliked'
+NOT_LIKED = 'not_liked'
+FOLLOWED = 'followed'
+ALREADY_FOLLOWING = 'already_following'
+CANNOT_FOLLOW_SELF = 'cannot_follow_self'
+NOT_FOUND = 'not_found'
+
+# _insert_new calls the private QuerySet._insert, whose returning_fields and
+# on_conflict arguments have this shape from Django 4.1 (which added
+# OnConflict) through 4.2, the version in requirements.txt. Check the
+# signature before widening the range; other versions use bulk_create.
+INSERT_RETURNING_VERSIONS = ((4, 1), (5, 0))
+
+
+def _results(ids, statuses):
+    return [{'id': pk, 'status': statuses.get(pk, NOT_FOUND)} for pk in ids]
+
+
+def _insert_new(model, objs, field_name):
+    """
+    Insert ``objs``, skipping those that conflict with a unique constraint,
+    and return the ``field_name`` values of the rows actually inserted.
+
+    Rows another transaction inserted first are not returned. Backends that
+    cannot return rows from a bulk insert, and Django versions outside
+    ``INSERT_RETURNING_VERSIONS``, report every object as inserted.
+    """
+    if not objs:
+        return []
+    field = model._meta.get_field(field_name)
+    oldest, newest = INSERT_RETURNING_VERSIONS
+    if not (
+        oldest <= django.VERSION[:2] < newest
+        and connections[router.db_for_write(model)].features.can_return_rows_from_bulk_insert
+    ):
+        model.objects.bulk_create(objs, ignore_conflicts=True)
+        return [getattr(obj, field.attname) for obj in objs]
+    fields = [field for field in model._meta.concrete_fields if not field.primary_key]
+    # INSERT ... ON CONFLICT DO NOTHING RETURNING. bulk_create(ignore_conflicts=True)
+    # returns no rows, and selecting the rows afterwards cannot tell ours from
+    # those a concurrent request inserted, so their counters would move twice.
+    rows = model.objects._insert(objs, fields, returning_fields=[field], on_conflict=OnConflict.IGNORE)
+    return [row[0] for row in rows if row]
+
+
+def _bump_review_lists(movie_ids):
+    # Like counts are shown in the movies' review lists.
+    responsecache.bump(*[f'movie:{movie_id}:reviews' for movie_id in set(movie_ids)])
+
+
+def like_reviews(user, review_ids):
+    """
+    Like every review in ``review_ids`` not already liked by ``user``.
+    """
+    with transaction.atomic():
+        movies = dict(Review.objects.filter(pk__in=review_ids).values_list('pk', 'movie_id'))
+        found = set(movies)
+        already = set(
+            Like.objects.filter(user=user, review_id__in=found).values_list('review_id', flat=True)
+        )
+        new = set(_insert_new(
+            Like, [Like(user=user, review_id=review_id) for review_id in found - already], 'review',
+        ))
+        # Includes likes a concurrent request added after they were read.
+        already = found - new
+        if new:
+            counters.adjust(Review.objects.filter(pk__in=new), likes_count=1)
+            trending.record_activity.enqueue(
+                timezone.now(), movie_ids=[movies[review_id] for review_id in new], review_ids=sorted(new),
+                like_count=1,
+            )
+            _bump_review_lists(movies[review_id] for review_id in new)
+    statuses = {review_id: ALREADY_LIKED for review_id in already}
+    statuses.update({review_id: LIKED for review_id in new})
+    return _results(review_ids, statuses)
+
+
+def unlike_reviews(user, review_ids):
+    """
+    Remove ``user``'s likes from every review in ``review_ids``.
+    """
+    with transaction.atomic():
+        found = set(Review.objects.filter(pk__in=review_ids).values_list('pk', flat=True))
+        likes = Like.objects.filter(user=user, review_id__in=found)
+        # Locked where supported, so a concurrent unlike cannot count them too.
+        rows = list(
+            likes.select_for_update(of=('self',)).values_list('review_id', 'review__movie_id', 'timestamp')
+        )
+        liked = {review_id for review_id, _, _ in rows}
+        if liked:
+            # The per-like receivers' work is done below, once for the batch.
+            with signals.muted(Like):
+                likes.delete()
+            counters.adjust(Review.objects.filter(pk__in=liked), likes_count=-1)
+            by_hour = defaultdict(list)
+            for review_id, movie_id, timestamp in rows:
+                by_hour[trending.bucket_hour(timestamp)].append((review_id, movie_id))
+            for hour, pairs in by_hour.items():
+                trending.record_activity.enqueue(
+                    hour,
+                    movie_ids=[movie_id for _, movie_id in pairs],
+                    review_ids=[review_id for review_id, _ in pairs],
+                    like_count=-1,
+                )
+            _bump_review_lists(movie_id for _, movie_id, _ in rows)
+    statuses = {review_id: NOT_LIKED for review_id in found}
+    statuses.update({review_id: UNLIKED for review_id in liked})
+    return _results(review_ids, statuses)
+
+
+def follow_profiles(profile, profile_ids):
+    """
+    Make ``profile`` follow every profile in ``profile_ids``.
+    """
+    Follow = UserProfile.following.through
+    with transaction.atomic():
+        found = set(UserProfile.objects.filter(pk__in=profile_ids).values_list('pk', flat=True))
+        targets = found - {profile.pk}
+        already = set(
+            Follow.objects.filter(from_userprofile=profile, to_userprofile__in=targets)
+            .values_list('to_userprofile_id', flat=True)
+        )
+        new = set(_insert_new(
+            Follow,
+            [Follow(from_userprofile_id=profile.pk, to_userprofile_id=pk) for pk in targets - already],
+            'to_userprofile',
+        ))
+        already = targets - new
+        if new:
+            counters.adjust(UserProfile.objects.filter(pk=profile.pk), following_count=len(new))
+            counters.adjust(UserProfile.objects.filter(pk__in=new), follower_count=1)
+            timelines.sync_follow.enqueue_many((profile.pk, pk) for pk in sorted(new))
+    statuses = {pk: ALREADY_FOLLOWING for pk in already}
+    statuses.update({pk: FOLLOWED for pk in new})
+    if profile.pk in found:
+        statuses[profile.pk] = CANNOT_FOLLOW_SELF
+    return _results(profile_ids, statuses)
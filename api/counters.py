@@ -0,0 +1,198 @@
+"""
+Denormalized engagement counters.
+
+``Review.likes_count``/``comments_count`` and ``UserProfile.follower_count``/
+``following_count``/``review_count`` are adjusted in place with ``F()``
+expressions from the receivers in ``api/signals.py``, so serializers read a
+column instead of running a ``COUNT`` per row. ``reconcile_reviews`` and
+``reconcile_profiles`` recompute them from the source tables to repair drift.
+
+Per-movie rating aggregates (``MovieRatingStats``) are maintained the same way
+by ``apply_rating`` and rebuilt by ``reconcile_rating_stats``.
+"""
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, IntegerField, Max, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce
+from django.utils import timezone
+
+from .models import UserProfile, Movie, MovieRatingStats, Review, Comment, Like
+
+RECONCILE_BATCH_SIZE = 1000
+
+
+def adjust(queryset, **deltas):
+    """
+    Atomically add ``deltas`` to the counter columns of every row in ``queryset``.
+    """
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if deltas:
+        queryset.update(**{field: F(field) + delta for field, delta in deltas.items()})
+
+
+def _count_subquery(queryset, field):
+    counts = (
+        queryset.filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(total=Count('*'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+def _reconcile(queryset, actual, batch_size):
+    """
+    Recompute ``actual`` counters for ``queryset`` in primary key batches.
+
+    Only rows whose stored value drifted are written. Returns the number of
+    rows repaired.
+    """
+    fields = list(actual)
+    repaired = 0
+    last_pk = 0
+    while True:
+        batch = list(
+            queryset.filter(pk__gt=last_pk)
+            .order_by('pk')
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if not batch:
+            return repaired
+        last_pk = batch[-1]
+        drifted = (
+            queryset.model.objects.filter(pk__in=batch)
+            .annotate(**{f'actual_{field}': expression for field, expression in actual.items()})
+            .filter(Q(*[~Q(**{field: F(f'actual_{field}')}) for field in fields], _connector=Q.OR))
+            .values('pk', *[f'actual_{field}' for field in fields])
+        )
+        to_update = []
+        for row in drifted:
+            instance = queryset.model(pk=row['pk'])
+            for field in fields:
+                setattr(instance, field, row[f'actual_{field}'])
+            to_update.append(instance)
+        if to_update:
+            queryset.model.objects.bulk_update(to_update, fields)
+            repaired += len(to_update)
+
+
+def reconcile_reviews(queryset=None, batch_size=RECONCILE_BATCH_SIZE):
+    """
+    Repair ``likes_count`` and ``comments_count`` on reviews.
+    """
+    if queryset is None:
+        queryset = Review.objects.all()
+    return _reconcile(queryset, {
+        'likes_count': _count_subquery(Like.objects.all(), 'review'),
+        'comments_count': _count_subquery(Comment.objects.all(), 'review'),
+    }, batch_size)
+
+
+def reconcile_profiles(queryset=None, batch_size=RECONCILE_BATCH_SIZE):
+    """
+    Repair ``follower_count``, ``following_count`` and ``review_count`` on profiles.
+    """
+    if queryset is None:
+        queryset = UserProfile.objects.all()
+    follows = UserProfile.following.through.objects.all()
+    reviews = (
+        Review.objects.filter(user_id=OuterRef('user_id'))
+        .order_by()
+        .values('user_id')
+        .annotate(total=Count('*'))
+        .values('total')
+    )
+    return _reconcile(queryset, {
+        'follower_count': _count_subquery(follows, 'to_userprofile'),
+        'following_count': _count_subquery(follows, 'from_userprofile'),
+        'review_count': Coalesce(Subquery(reviews, output_field=IntegerField()), Value(0)),
+    }, batch_size)
+
+
+RATING_STATS_FIELDS = [
+    'rating_sum', 'rating_count',
+    'rating_1_count', 'rating_2_count', 'rating_3_count', 'rating_4_count', 'rating_5_count',
+    'average_rating',
+]
+
+
+def apply_rating(movie_id, rating, delta):
+    """
+    Add (``delta=1``) or remove (``delta=-1``) one rating from a movie's aggregate.
+
+    Also stamps ``ratings_changed_at`` so the movie's neighbours are refreshed.
+    """
+    stats = MovieRatingStats.objects.filter(movie_id=movie_id)
+    with transaction.atomic():
+        updated = stats.update(
+            rating_sum=F('rating_sum') + rating * delta,
+            rating_count=F('rating_count') + delta,
+            **{f'rating_{rating}_count': F(f'rating_{rating}_count') + delta},
+            ratings_changed_at=timezone.now(),
+        )
+        if not updated:
+            # Movies inserted without signals (e.g. bulk imports) have no row
+            # yet. Removals are skipped: the movie may be mid-cascade delete.
+            if delta > 0:
+                reconcile_rating_stats(Movie.objects.filter(pk=movie_id))
+            return
+        # Derived in a second statement so it sees the new sum and count on
+        # every backend, regardless of how SET clauses are evaluated.
+        stats.update(average_rating=Case(
+            When(rating_count__gt=0, then=Cast('rating_sum', FloatField()) / F('rating_count')),
+            default=Value(0.0),
+        ))
+
+
+def reconcile_rating_stats(queryset=None, batch_size=RECONCILE_BATCH_SIZE):
+    """
+    Recompute ``MovieRatingStats`` from ``Review`` for the movies in ``queryset``.
+
+    Missing rows are created, with ``ratings_changed_at`` set to the movie's
+    latest review. Returns the number of movies processed.
+    """
+    if queryset is None:
+        queryset = Movie.objects.all()
+    processed = 0
+    last_pk = 0
+    while True:
+        batch = list(
+            queryset.filter(pk__gt=last_pk)
+            .order_by('pk')
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if not batch:
+            return processed
+        last_pk = batch[-1]
+        aggregates = {
+            row['movie_id']: row
+            for row in Review.objects.filter(movie_id__in=batch)
+            .order_by()
+            .values('movie_id')
+            .annotate(
+                rating_sum=Sum('rating'),
+                rating_count=Count('*'),
+                latest_review=Max('timestamp'),
+                **{
+                    f'rating_{rating}_count': Count('pk', filter=Q(rating=rating))
+                    for rating in range(1, 6)
+                },
+            )
+        }
+        rows = []
+        for movie_id in batch:
+            row = aggregates.get(movie_id, {})
+            stats = MovieRatingStats(
+                movie_id=movie_id,
+                **{field: row.get(field, 0) for field in RATING_STATS_FIELDS[:-1]},
+                ratings_changed_at=row.get('latest_review'),
+            )
+            stats.average_rating = stats.rating_sum / stats.rating_count if stats.rating_count else 0
+            rows.append(stats)
+        MovieRatingStats.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['movie'],
+            update_fields=RATING_STATS_FIELDS,
+        )
+        processed += len(rows)
@@ -0,0 +1,295 @@
+"""
+Synthetic social graph for reproducing production scale locally.
+
+``generate`` writes users, movies, follows, reviews, likes and comments
+with ``bulk_create`` in chunks, then rebuilds the state that signals would
+normally maintain: counters, rating stats, timelines and trending buckets.
+The search index follows on its own through its triggers.
+
+The distributions are heavy-tailed like real activity: a few profiles
+collect most followers (follow targets are drawn with Zipf weights), a few
+movies collect most reviews, and per-user review counts and per-review
+like and comment counts are log-normal around their configured means.
+Everything is drawn from one seeded generator, so a seed reproduces the
+same graph on an empty database.
+"""
+import math
+from datetime import timedelta
+
+import numpy as np
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+from faker import Faker
+
+from .models import UserProfile, Movie, Review, Comment, Like
+from . import counters, timelines, trending
+
+CHUNK_SIZE = 5000
+# Star ratings 1-5 skew positive, as they do on most review sites.
+RATING_WEIGHTS = [0.06, 0.09, 0.2, 0.35, 0.3]
+# Pool of generated sentences texts are assembled from; Faker is slow per row.
+TEXT_POOL_SIZE = 500
+# Rows per backdating UPDATE; each one is a CASE over its rows' primary keys.
+BACKDATE_BATCH_SIZE = 500
+
+
+def heavy_tailed(rng, mean, size, sigma=1.0, cap=None):
+    """
+    Draw ``size`` non-negative integers, log-normal with roughly the given ``mean``.
+    """
+    if mean <= 0:
+        return np.zeros(size, dtype=np.int64)
+    values = np.floor(rng.lognormal(math.log(mean + 0.5) - sigma ** 2 / 2, sigma, size)).astype(np.int64)
+    return np.minimum(values, cap) if cap is not None else values
+
+
+def zipf_weights(size, exponent):
+    """
+    Return selection probabilities for ``size`` items ranked by ``rank ** -exponent``.
+    """
+    weights = np.arange(1, size + 1, dtype=np.float64) ** -exponent
+    return weights / weights.sum()
+
+
+def sample_distinct(rng, population, count, weights, exclude=()):
+    """
+    Draw up to ``count`` distinct items of ``population`` by ``weights``.
+    """
+    if count <= 0:
+        return []
+    # Oversample with replacement and dedupe; much cheaper than replace=False.
+    drawn = rng.choice(population, size=count * 2 + 10, p=weights)
+    chosen = []
+    seen = set(exclude)
+    for item in drawn.tolist():
+        if item not in seen:
+            seen.add(item)
+            chosen.append(item)
+            if len(chosen) == count:
+                break
+    return chosen
+
+
+def _bulk_create(model, objs, chunk_size, backdated=()):
+    """
+    Insert ``objs`` in chunks and return them with their primary keys set.
+
+    ``bulk_create`` stamps ``auto_now_add`` fields with the current time, so
+    the ``backdated`` fields are written back with the values the objects
+    were built with.
+    """
+    created = []
+    for start in range(0, len(objs), chunk_size):
+        chunk = objs[start:start + chunk_size]
+        values = [[getattr(obj, name) for name in backdated] for obj in chunk]
+        with transaction.atomic():
+            model.objects.bulk_create(chunk)
+            if backdated:
+                for obj, row in zip(chunk, values):
+                    for name, value in zip(backdated, row):
+                        setattr(obj, name, value)
+                model.objects.bulk_update(chunk, backdated, batch_size=BACKDATE_BATCH_SIZE)
+        created.extend(chunk)
+    return created
+
+
+class DatasetGenerator:
+    """
+    Generate one dataset; see ``generate`` for the parameters.
+    """
+
+    def __init__(self, users, movies, avg_following, avg_reviews, avg_likes, avg_comments,
+                 follow_exponent, days, prefix, password, seed, chunk_size, log):
+        self.counts = {'users': users, 'movies': movies}
+        self.avg_following = avg_following
+        self.avg_reviews = avg_reviews
+        self.avg_likes = avg_likes
+        self.avg_comments = avg_comments
+        self.follow_exponent = follow_exponent
+        self.days = days
+        self.prefix = prefix
+        self.password = password
+        self.chunk_size = chunk_size
+        self.log = log
+        self.rng = np.random.default_rng(seed)
+        self.faker = Faker()
+        self.faker.seed_instance(seed)
+        self.now = timezone.now()
+
+    def run(self):
+        texts = [self.faker.paragraph(nb_sentences=3) for _ in range(TEXT_POOL_SIZE)]
+        user_ids, profile_ids = self.create_users()
+        movie_ids = self.create_movies(texts)
+        follows = self.create_follows(profile_ids)
+        review_rows = self.create_reviews(user_ids, movie_ids, texts)
+        likes = self.create_likes(user_ids, review_rows)
+        comments = self.create_comments(user_ids, review_rows, texts)
+        self.rebuild_derived_state(profile_ids)
+        return {
+            'users': len(user_ids),
+            'movies': len(movie_ids),
+            'follows': follows,
+            'reviews': len(review_rows),
+            'likes': likes,
+            'comments': comments,
+        }
+
+    def random_times(self, size, after=None):
+        """
+        Return ``size`` timestamps in the last ``days`` days, later than ``after`` if given.
+        """
+        window = self.days * 86400
+        offsets = self.rng.random(size) ** 2 * window  # skewed towards recent activity
+        times = [self.now - timedelta(seconds=float(offset)) for offset in offsets]
+        if after is not None:
+            times = [max(time, after + timedelta(seconds=60)) for time in times]
+            times = [min(time, self.now) for time in times]
+        return times
+
+    def create_users(self):
+        self.log(f"Creating {self.counts['users']} users...")
+        start = User.objects.filter(username__startswith=self.prefix).count()
+        # Hashing once keeps this fast; every user shares the password.
+        password = make_password(self.password)
+        users = [
+            User(username=f'{self.prefix}{start + index}', email=f'{self.prefix}{start + index}@example.com',
+                 password=password, date_joined=self.now)
+            for index in range(self.counts['users'])
+        ]
+        users = _bulk_create(User, users, self.chunk_size)
+        profiles = _bulk_create(UserProfile, [UserProfile(user=user) for user in users], self.chunk_size)
+        return [user.pk for user in users], [profile.pk for profile in profiles]
+
+    def create_movies(self, texts):
+        self.log(f"Creating {self.counts['movies']} movies...")
+        genres = [key for key, _ in Movie.GENRE_CHOICES]
+        start = Movie.objects.count()
+        movies = [
+            Movie(
+                title=f"{self.faker.catch_phrase()} {start + index}",
+                genre=genres[int(self.rng.integers(len(genres)))],
+                release_year=int(self.rng.integers(1950, self.now.year + 1)),
+                description=texts[int(self.rng.integers(len(texts)))],
+            )
+            for index in range(self.counts['movies'])
+        ]
+        # Their MovieRatingStats rows are created by reconcile_rating_stats,
+        # stamped with their latest review for the recommendations refresh.
+        movies = _bulk_create(Movie, movies, self.chunk_size)
+        return [movie.pk for movie in movies]
+
+    def create_follows(self, profile_ids):
+        self.log("Creating follows...")
+        if len(profile_ids) < 2:
+            return 0
+        # Shuffle so popularity is unrelated to signup order.
+        popular = self.rng.permutation(profile_ids)
+        weights = zipf_weights(len(popular), self.follow_exponent)
+        degrees = heavy_tailed(self.rng, self.avg_following, len(profile_ids), cap=len(profile_ids) - 1)
+        through = UserProfile.following.through
+        batch = []
+        total = 0
+        for profile_id, degree in zip(profile_ids, degrees.tolist()):
+            for followee_id in sample_distinct(self.rng, popular, degree, weights, exclude=(profile_id,)):
+                batch.append(through(from_userprofile_id=profile_id, to_userprofile_id=followee_id))
+            if len(batch) >= self.chunk_size:
+                total += len(_bulk_create(through, batch, self.chunk_size))
+                batch = []
+        total += len(_bulk_create(through, batch, self.chunk_size))
+        return total
+
+    def create_reviews(self, user_ids, movie_ids, texts):
+        """
+        Return ``[(review id, author id, timestamp)]`` for the created reviews.
+        """
+        self.log("Creating reviews...")
+        if not movie_ids:
+            return []
+        popular = self.rng.permutation(movie_ids)
+        weights = zipf_weights(len(popular), 1.0)
+        counts = heavy_tailed(self.rng, self.avg_reviews, len(user_ids), cap=len(movie_ids))
+        rows = []
+        batch = []
+        for user_id, count in zip(user_ids, counts.tolist()):
+            chosen = sample_distinct(self.rng, popular, count, weights)
+            ratings = self.rng.choice(5, size=len(chosen), p=RATING_WEIGHTS) + 1
+            for movie_id, rating, timestamp in zip(chosen, ratings.tolist(), self.random_times(len(chosen))):
+                batch.append(Review(
+                    movie_id=movie_id, user_id=user_id, rating=rating, timestamp=timestamp,
+                    text=texts[int(self.rng.integers(len(texts)))],
+                ))
+            if len(batch) >= self.chunk_size:
+                rows.extend(self._insert_reviews(batch))
+                batch = []
+        rows.extend(self._insert_reviews(batch))
+        return rows
+
+    def _insert_reviews(self, batch):
+        reviews = _bulk_create(Review, batch, self.chunk_size, backdated=['timestamp'])
+        return [(review.pk, review.user_id, review.timestamp) for review in reviews]
+
+    def create_likes(self, user_ids, review_rows):
+        self.log("Creating likes...")
+        counts = heavy_tailed(self.rng, self.avg_likes, len(review_rows), sigma=1.3, cap=len(user_ids) - 1)
+        population = np.asarray(user_ids)
+        batch = []
+        total = 0
+        for (review_id, author_id, timestamp), count in zip(review_rows, counts.tolist()):
+            likers = sample_distinct(self.rng, population, count, None, exclude=(author_id,))
+            for user_id, liked_at in zip(likers, self.random_times(len(likers), after=timestamp)):
+                batch.append(Like(user_id=user_id, review_id=review_id, timestamp=liked_at))
+            if len(batch) >= self.chunk_size:
+                total += len(_bulk_create(Like, batch, self.chunk_size, backdated=['timestamp']))
+                batch = []
+        return total + len(_bulk_create(Like, batch, self.chunk_size, backdated=['timestamp']))
+
+    def create_comments(self, user_ids, review_rows, texts):
+        self.log("Creating comments...")
+        counts = heavy_tailed(self.rng, self.avg_comments, len(review_rows), sigma=1.3)
+        population = np.asarray(user_ids)
+        batch = []
+        total = 0
+        for (review_id, _, timestamp), count in zip(review_rows, counts.tolist()):
+            authors = self.rng.choice(population, size=count).tolist() if count else []
+            for author_id, written_at in zip(authors, self.random_times(count, after=timestamp)):
+                batch.append(Comment(
+                    review_id=review_id, author_id=author_id, timestamp=written_at,
+                    text=texts[int(self.rng.integers(len(texts)))],
+                ))
+            if len(batch) >= self.chunk_size:
+                total += len(_bulk_create(Comment, batch, self.chunk_size, backdated=['timestamp']))
+                batch = []
+        return total + len(_bulk_create(Comment, batch, self.chunk_size, backdated=['timestamp']))
+
+    def rebuild_derived_state(self, profile_ids):
+        """
+        Recompute what the signals in ``api/signals.py`` would have maintained.
+        """
+        self.log("Reconciling counters and rating stats...")
+        counters.reconcile_reviews()
+        counters.reconcile_profiles()
+        counters.reconcile_rating_stats()
+        self.log("Rebuilding timelines...")
+        for profile in UserProfile.objects.filter(pk__in=profile_ids).iterator(chunk_size=500):
+            timelines.rebuild(profile)
+        self.log("Rebuilding trending buckets...")
+        trending.rebuild()
+
+
+def generate(users=1000, movies=500, avg_following=20, avg_reviews=10, avg_likes=5, avg_comments=1,
+             follow_exponent=1.0, days=90, prefix='loaduser', password='loadtest123', seed=0,
+             chunk_size=CHUNK_SIZE, log=lambda message: None):
+    """
+    Generate a dataset and return the number of rows created per kind.
+
+    ``avg_*`` are per-user (following, reviews) or per-review (likes,
+    comments) means; ``follow_exponent`` is the Zipf exponent of follower
+    popularity, where higher values concentrate followers on fewer profiles.
+    Usernames are ``<prefix><n>`` and all share ``password``.
+    """
+    return DatasetGenerator(
+        users, movies, avg_following, avg_reviews, avg_likes, avg_comments,
+        follow_exponent, days, prefix, password, seed, chunk_size, log,
+    ).run()
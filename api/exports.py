@@ -0,0 +1,77 @@
+"""
+NDJSON exports of reviews, comments and likes for analytics jobs.
+
+Rows are read with ``.values().iterator(chunk_size=...)`` in primary key
+order, so the database streams them (a server-side cursor on PostgreSQL)
+and neither the ORM nor the response ever holds more than one chunk.
+Filtering on ``since`` lets incremental jobs read only rows newer than
+their last run; those rows come in ``(timestamp, id)`` order instead, so
+the timestamp index both finds and orders them, and the last row's
+timestamp is the next run's ``since``.
+"""
+import datetime
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Review, Comment, Like
+
+CHUNK_SIZE = 2000
+CONTENT_TYPE = 'application/x-ndjson'
+
+# kind -> (model, exported columns, {filter name: lookup})
+EXPORTS = {
+    'reviews': (
+        Review,
+        ['id', 'movie_id', 'user_id', 'text', 'rating', 'timestamp', 'likes_count', 'comments_count'],
+        {'movie': 'movie_id', 'user': 'user_id'},
+    ),
+    'comments': (
+        Comment,
+        ['id', 'review_id', 'review__movie_id', 'author_id', 'text', 'timestamp'],
+        {'movie': 'review__movie_id', 'user': 'author_id'},
+    ),
+    'likes': (
+        Like,
+        ['id', 'review_id', 'review__movie_id', 'user_id', 'timestamp'],
+        {'movie': 'review__movie_id', 'user': 'user_id'},
+    ),
+}
+
+
+class ExportEncoder(DjangoJSONEncoder):
+    """
+    Keep full microsecond precision, so an exported timestamp is a safe ``since``.
+    """
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def get_export_queryset(kind, movie=None, user=None, since=None):
+    """
+    Return the rows of ``kind`` to export as a ``.values()`` queryset.
+
+    ``since`` keeps rows whose timestamp is strictly after it, oldest first.
+    """
+    model, columns, lookups = EXPORTS[kind]
+    queryset = model.objects.order_by('pk')
+    if movie is not None:
+        queryset = queryset.filter(**{lookups['movie']: movie})
+    if user is not None:
+        queryset = queryset.filter(**{lookups['user']: user})
+    if since is not None:
+        queryset = queryset.filter(timestamp__gt=since).order_by('timestamp', 'pk')
+    return queryset.values(*columns)
+
+
+def iter_ndjson(queryset, chunk_size=CHUNK_SIZE):
+    """
+    Yield one encoded JSON line per row, one database chunk at a time.
+    """
+    for row in queryset.iterator(chunk_size=chunk_size):
+        if 'review__movie_id' in row:
+            row['movie_id'] = row.pop('review__movie_id')
+        yield json.dumps(row, cls=ExportEncoder).encode('utf-8') + b'\n'
@@ -0,0 +1,183 @@
+"""
+Compiled read-only serialization for large list pages.
+
+Building a model instance per row and running every DRF field's
+``get_attribute`` and ``to_representation`` costs far more than the
+queries behind a 100-row page. ``compile_serializer`` walks a serializer's
+fields once (after ``?fields=`` and ``?expand=`` have been applied) and
+returns a ``CompiledSerializer`` that reads the same values with
+``.values()``, joining nested serializers' columns, and builds each
+response dict with precomputed accessors. The output is the same JSON the
+serializer would produce.
+
+Serializers opt into the compiled path field by field:
+
+- model fields, foreign keys rendered as ids and queryset annotations are
+  read from the row;
+- nested serializers over a forward relation are compiled recursively;
+- a ``SerializerMethodField`` named ``<name>`` needs ``Meta.field_sources``
+  (see ``api/fieldsets.py``) and a ``get_<name>_from_values`` method that
+  takes those columns' values in order.
+
+Anything else (file fields, many-valued relations, model properties)
+makes ``compile_serializer`` return None, and the caller falls back to the
+serializer.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models.query import ModelIterable
+from rest_framework import serializers
+from rest_framework.fields import empty
+from rest_framework.relations import PrimaryKeyRelatedField
+from rest_framework.response import Response
+
+from . import profiling
+
+# Fields whose to_representation is exactly this builtin.
+BUILTIN_CONVERTERS = {
+    serializers.IntegerField: int,
+    serializers.FloatField: float,
+    serializers.CharField: str,
+    serializers.EmailField: str,
+    serializers.URLField: str,
+}
+
+
+class NotCompilable(Exception):
+    pass
+
+
+def _converter(field):
+    if type(field) in BUILTIN_CONVERTERS:
+        return BUILTIN_CONVERTERS[type(field)]
+    if isinstance(field, PrimaryKeyRelatedField) and field.pk_field is None:
+        # The row already holds the id.
+        return None
+    if isinstance(field, (serializers.FileField, serializers.RelatedField, serializers.ManyRelatedField)):
+        raise NotCompilable(field.field_name)
+    return field.to_representation
+
+
+def _compile(serializer, prefix, annotations, paths):
+    """
+    Return ``[(name, getter)]`` for ``serializer``'s readable fields, adding the row keys read to ``paths``.
+    """
+    if not isinstance(serializer, serializers.ModelSerializer):
+        raise NotCompilable(type(serializer).__name__)
+    model = serializer.Meta.model
+    field_sources = getattr(serializer.Meta, 'field_sources', {})
+    accessors = []
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if isinstance(field, serializers.SerializerMethodField):
+            method = getattr(serializer, f'get_{name}_from_values', None)
+            if method is None or name not in field_sources:
+                raise NotCompilable(name)
+            keys = [prefix + path for path in field_sources[name]]
+            paths.update(keys)
+            accessors.append((name, lambda row, method=method, keys=keys: method(*[row[key] for key in keys])))
+            continue
+        if field.source == '*' or '.' in field.source:
+            raise NotCompilable(name)
+        key = prefix + field.source
+        try:
+            model_field = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            model_field = None
+
+        if isinstance(field, serializers.BaseSerializer):
+            if model_field is None or not (model_field.many_to_one or model_field.one_to_one) \
+                    or not model_field.concrete:
+                raise NotCompilable(name)
+            nested = _compile(field, key + '__', annotations, paths)
+            paths.add(key)
+            accessors.append((name, lambda row, key=key, nested=nested: (
+                None if row[key] is None else {field_name: getter(row) for field_name, getter in nested}
+            )))
+            continue
+
+        if model_field is None:
+            if not prefix and field.source in annotations:
+                paths.add(key)
+            elif hasattr(model, field.source):
+                # A property or method on the model.
+                raise NotCompilable(name)
+            elif field.default is not empty or field.allow_null or field.required:
+                raise NotCompilable(name)
+            else:
+                # Missing attribute on a read-only field: DRF leaves the key out.
+                continue
+        elif not model_field.concrete or model_field.many_to_many:
+            raise NotCompilable(name)
+        else:
+            paths.add(key)
+        convert = _converter(field)
+        if convert is None:
+            accessors.append((name, lambda row, key=key: row[key]))
+        else:
+            accessors.append((name, lambda row, key=key, convert=convert: (
+                None if row[key] is None else convert(row[key])
+            )))
+    return accessors
+
+
+class CompiledSerializer:
+    """
+    A serializer's read path, compiled against one queryset's annotations.
+    """
+
+    def __init__(self, accessors, paths):
+        self.accessors = accessors
+        self.paths = paths
+
+    def rows(self, queryset, extra=()):
+        """
+        Return ``queryset`` as ``.values()`` rows holding the compiled fields and ``extra`` columns.
+        """
+        return queryset.values(*sorted(self.paths | set(extra)))
+
+    def represent(self, rows):
+        with profiling.timed('serialize'):
+            accessors = self.accessors
+            return [{name: getter(row) for name, getter in accessors} for row in rows]
+
+
+def compile_serializer(serializer, queryset):
+    """
+    Compile ``serializer`` for rows of ``queryset``, or return None if it cannot be compiled.
+    """
+    if queryset._iterable_class is not ModelIterable:
+        return None
+    paths = set()
+    try:
+        accessors = _compile(serializer, '', set(queryset.query.annotations), paths)
+    except NotCompilable:
+        return None
+    return CompiledSerializer(accessors, paths)
+
+
+class CompiledListMixin:
+    """
+    Serve list pages through ``compile_serializer`` when the serializer allows it.
+
+    ``list()`` and actions calling ``get_list_response`` answer with the
+    same data as the serializer; other responses are unaffected.
+    """
+
+    def list(self, request, *args, **kwargs):
+        return self.get_list_response(self.filter_queryset(self.get_queryset()))
+
+    def get_list_response(self, queryset):
+        compiled = compile_serializer(self.get_serializer(), queryset)
+        if compiled is None:
+            page = self.paginate_queryset(queryset)
+            if page is not None:
+                return self.get_paginated_response(self.get_serializer(page, many=True).data)
+            return Response(self.get_serializer(queryset, many=True).data)
+        # Keyset pagination reads its ordering columns from the last row.
+        ordering = getattr(self.paginator, 'ordering', None) or ()
+        rows = compiled.rows(queryset, extra=[name.lstrip('-') for name in ordering])
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(compiled.represent(page))
+        return Response(compiled.represent(rows))
@@ -0,0 +1,188 @@
+"""
+Sparse fieldsets (``?fields=``) and opt-in expansion (``?expand=``).
+
+``?fields=id,rating,user.username`` limits a response to the listed fields;
+dotted paths select inside nested serializers, and a nested field listed
+without a path keeps all of its fields. Fields that were not asked for are
+dropped from the serializer, so their ``SerializerMethodField`` and nested
+serializers never run.
+
+``?expand=movie`` replaces a related object's id with the serializer named
+in ``Meta.expandable_fields``; expansions nest with dots
+(``?expand=review.movie``), and selecting subfields of an expandable field
+(``?fields=movie.title``) expands it too.
+
+``optimize_queryset`` then loads only what the remaining fields read:
+``select_related`` for nested objects and ``only()`` for columns.
+``SparseFieldsViewMixin`` applies it to the querysets viewsets list.
+``Meta.field_sources`` lists the columns read by fields that are not model
+fields, such as ``SerializerMethodField``. Both parameters apply to the
+responses of safe requests; writes always validate every field.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import QuerySet
+from django.db.models.query import ModelIterable
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+
+FIELDS_PARAM = 'fields'
+EXPAND_PARAM = 'expand'
+
+
+def parse_paths(value):
+    """
+    Turn ``'id,user.username,user.id'`` into ``{'id': {}, 'user': {'username': {}, 'id': {}}}``.
+    """
+    tree = {}
+    for path in value.split(','):
+        node = tree
+        for name in path.strip().split('.'):
+            if name:
+                node = node.setdefault(name, {})
+    return tree
+
+
+def _nested(field):
+    """
+    Return the serializer a field renders with, or None for plain fields.
+    """
+    field = getattr(field, 'child', field)
+    return field if isinstance(field, serializers.BaseSerializer) else None
+
+
+class SparseFieldsMixin:
+    """
+    Let the request choose the serializer's fields and expansions.
+
+    ``fields`` and ``expand`` may also be passed to the constructor, as a
+    string in the query parameter syntax or as a ``parse_paths`` tree.
+    """
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._requested_fields = parse_paths(fields) if isinstance(fields, str) else fields
+        self._requested_expand = parse_paths(expand) if isinstance(expand, str) else expand
+
+    def _is_root(self):
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        return parent is None
+
+    def _get_requested(self):
+        requested, expand = self._requested_fields, self._requested_expand
+        request = self.context.get('request')
+        if (
+            requested is None and expand is None and self._is_root()
+            and request is not None and request.method in SAFE_METHODS
+        ):
+            params = getattr(request, 'query_params', request.GET)
+            requested = parse_paths(params.get(FIELDS_PARAM, '')) or None
+            expand = parse_paths(params.get(EXPAND_PARAM, ''))
+        return requested, expand or {}
+
+    def get_fields(self):
+        fields = super().get_fields()
+        requested, expand = self._get_requested()
+        expandable = getattr(self.Meta, 'expandable_fields', {})
+
+        to_expand = dict(expand)
+        for name, subfields in (requested or {}).items():
+            if subfields and name in expandable:
+                to_expand.setdefault(name, {})
+        for name, subexpand in to_expand.items():
+            if name not in expandable:
+                raise ValidationError({EXPAND_PARAM: [f"'{name}' cannot be expanded."]})
+            fields[name] = expandable[name](
+                source=fields[name].source, read_only=True, expand=subexpand,
+            )
+
+        if requested is not None:
+            unknown = [name for name in requested if name not in fields]
+            if unknown:
+                raise ValidationError({FIELDS_PARAM: [f"Unknown field '{name}'." for name in unknown]})
+            fields = {name: field for name, field in fields.items() if name in requested}
+
+        for name, field in fields.items():
+            nested = _nested(field)
+            subfields = (requested or {}).get(name)
+            if nested is None:
+                if subfields:
+                    raise ValidationError({FIELDS_PARAM: [f"'{name}' has no subfields."]})
+            elif isinstance(nested, SparseFieldsMixin):
+                nested._requested_fields = subfields or None
+                if name not in to_expand:
+                    nested._requested_expand = expand.get(name)
+        return fields
+
+
+def _query_plan(serializer, prefix, only, related):
+    model = serializer.Meta.model
+    field_sources = getattr(serializer.Meta, 'field_sources', {})
+    for name, field in serializer.fields.items():
+        if name in field_sources:
+            for path in field_sources[name]:
+                only.add(prefix + path)
+                parts = path.split('__')
+                for end in range(1, len(parts)):
+                    related.add(prefix + '__'.join(parts[:end]))
+            continue
+        if field.source == '*' or '.' in field.source:
+            continue
+        try:
+            model_field = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            # Annotations, properties and methods.
+            continue
+        nested = _nested(field)
+        if nested is None:
+            if model_field.concrete:
+                only.add(prefix + field.source)
+        elif not model_field.many_to_many and not model_field.one_to_many and nested is field:
+            related.add(prefix + field.source)
+            _query_plan(nested, f'{prefix}{field.source}__', only, related)
+
+
+def optimize_queryset(queryset, serializer, extra=()):
+    """
+    Load only the relations and columns ``serializer``'s fields read.
+
+    ``extra`` names further columns needed, e.g. the pagination ordering.
+    """
+    only = {queryset.model._meta.pk.name, *extra}
+    related = set()
+    _query_plan(serializer, '', only, related)
+    queryset = queryset.select_related(None)
+    if related:
+        # select_related() without arguments would follow every foreign key.
+        queryset = queryset.select_related(*sorted(related))
+    return queryset.only(*sorted(only))
+
+
+class SparseFieldsViewMixin:
+    """
+    Run ``optimize_queryset`` on the querysets a viewset paginates or lists.
+    """
+
+    def optimize_queryset(self, queryset):
+        if (
+            self.request.method not in SAFE_METHODS or not isinstance(queryset, QuerySet)
+            or queryset._iterable_class is not ModelIterable
+        ):
+            return queryset
+        serializer = self.get_serializer()
+        if not isinstance(serializer, SparseFieldsMixin):
+            return queryset
+        # Keyset pagination reads its ordering columns from the last row.
+        ordering = getattr(self.paginator, 'ordering', None) or ()
+        return optimize_queryset(queryset, serializer, extra=[name.lstrip('-') for name in ordering])
+
+    def paginate_queryset(self, queryset):
+        return super().paginate_queryset(self.optimize_queryset(queryset))
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        if kwargs.get('many') and isinstance(serializer.instance, QuerySet):
+            serializer.instance = self.optimize_queryset(serializer.instance)
+        return serializer
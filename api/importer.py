@@ -0,0 +1,187 @@
+"""
+Streaming movie catalog import.
+
+Records are read lazily from CSV or JSON Lines files, validated, and
+upserted in fixed-size chunks on the ``(title, release_year)`` natural key,
+so memory use does not depend on the size of the input. Each chunk is one
+transaction; ``bulk_create`` skips the Movie signals, so the rating stats
+rows and response cache versions they maintain are handled per chunk here.
+
+Progress is recorded in a small JSON checkpoint after every committed chunk,
+including the byte offset just past its last record. An interrupted import
+seeks straight to that offset instead of re-reading the records before it;
+re-running a chunk that committed before its checkpoint was written is
+harmless because upserts are idempotent.
+"""
+import csv
+import itertools
+import json
+import os
+
+from django.core.exceptions import ValidationError
+from django.core.validators import URLValidator
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Movie, MovieRatingStats
+from . import responsecache
+
+FORMATS = ('csv', 'jsonl')
+CHUNK_SIZE = 1000
+MIN_RELEASE_YEAR = 1888
+# Announced titles may be catalogued a few years ahead of release.
+MAX_YEARS_AHEAD = 10
+
+UPDATE_FIELDS = ['genre', 'description', 'poster_url']
+
+_genres = {}
+for _key, _label in Movie.GENRE_CHOICES:
+    _genres[_key.lower()] = _key
+    _genres[_label.lower()] = _key
+
+
+def detect_format(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        return 'csv'
+    if extension in ('.jsonl', '.ndjson'):
+        return 'jsonl'
+    raise ValueError(f"Cannot tell the format of {path}; pass csv or jsonl explicitly.")
+
+
+def read_records(path, format=None, offset=0):
+    """
+    Yield ``(record, end)`` for each input record from byte ``offset`` on,
+    where ``end`` is the offset just past the record, without reading the
+    whole file.
+
+    ``offset`` must be an ``end`` returned earlier; CSV headers are still
+    read from the start of the file.
+    """
+    format = format or detect_format(path)
+    position = 0
+
+    def lines(file):
+        # Text files cannot tell() while iterated, so count the bytes read.
+        nonlocal position
+        for line in file:
+            position += len(line)
+            yield line.decode('utf-8')
+
+    with open(path, 'rb') as file:
+        if format == 'csv':
+            header = next(csv.reader(lines(file)), None)
+            if header is None:
+                return
+            if offset > position:
+                file.seek(offset)
+                position = offset
+            for record in csv.DictReader(lines(file), fieldnames=header):
+                yield record, position
+        else:
+            file.seek(offset)
+            position = offset
+            for line in lines(file):
+                if line.strip():
+                    yield json.loads(line), position
+
+
+def clean_record(record):
+    """
+    Return the Movie field values for ``record`` or raise ``ValidationError``.
+    """
+    if not isinstance(record, dict):
+        raise ValidationError("Record is not an object.")
+    errors = {}
+    title = str(record.get('title') or '').strip()
+    if not title:
+        errors['title'] = "This field is required."
+    elif len(title) > Movie._meta.get_field('title').max_length:
+        errors['title'] = "Title is too long."
+
+    genre = _genres.get(str(record.get('genre') or '').strip().lower())
+    if genre is None:
+        errors['genre'] = f"Unknown genre {record.get('genre')!r}."
+
+    release_year = None
+    try:
+        release_year = int(str(record.get('release_year')).strip())
+    except (TypeError, ValueError):
+        errors['release_year'] = f"Invalid year {record.get('release_year')!r}."
+    else:
+        max_year = timezone.now().year + MAX_YEARS_AHEAD
+        if not MIN_RELEASE_YEAR <= release_year <= max_year:
+            errors['release_year'] = f"Year must be between {MIN_RELEASE_YEAR} and {max_year}."
+
+    poster_url = str(record.get('poster_url') or '').strip() or None
+    if poster_url:
+        try:
+            URLValidator()(poster_url)
+        except ValidationError:
+            errors['poster_url'] = "Enter a valid URL."
+
+    if errors:
+        raise ValidationError(errors)
+    return {
+        'title': title,
+        'genre': genre,
+        'release_year': release_year,
+        'description': str(record.get('description') or ''),
+        'poster_url': poster_url,
+    }
+
+
+def upsert_chunk(values):
+    """
+    Insert or update one chunk of cleaned records and return the number written.
+    """
+    # Later records win; one INSERT cannot touch the same row twice.
+    by_key = {(row['title'], row['release_year']): row for row in values}
+    if not by_key:
+        return 0
+    with transaction.atomic():
+        Movie.objects.bulk_create(
+            [Movie(**row) for row in by_key.values()],
+            update_conflicts=True,
+            unique_fields=['title', 'release_year'],
+            update_fields=UPDATE_FIELDS,
+        )
+        rows = Movie.objects.filter(title__in={title for title, _ in by_key}).values_list(
+            'pk', 'title', 'release_year', 'rating_stats'
+        )
+        movie_ids = []
+        missing_stats = []
+        for pk, title, release_year, stats in rows:
+            if (title, release_year) in by_key:
+                movie_ids.append(pk)
+                if stats is None:
+                    missing_stats.append(MovieRatingStats(movie_id=pk))
+        MovieRatingStats.objects.bulk_create(missing_stats, ignore_conflicts=True)
+        responsecache.bump('movies', *[f'movie:{pk}' for pk in movie_ids])
+    return len(by_key)
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
+
+def fingerprint(path):
+    return {'source': os.path.abspath(path), 'size': os.path.getsize(path)}
+
+
+def load_checkpoint(checkpoint_path):
+    try:
+        with open(checkpoint_path, encoding='utf-8') as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+
+def save_checkpoint(checkpoint_path, state):
+    # Write then rename, so a crash never leaves a truncated checkpoint.
+    temporary_path = f'{checkpoint_path}.tmp'
+    with open(temporary_path, 'w', encoding='utf-8') as file:
+        json.dump(state, file)
+    os.replace(temporary_path, checkpoint_path)
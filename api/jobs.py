@@ -0,0 +1,401 @@
+"""
+A background job queue stored in the database.
+
+Side effects that need not finish inside the request (timeline fan-out,
+follow backfills, trending activity, thumbnails) are registered as tasks
+and enqueued from the write path::
+
+    @jobs.task(key='{0}')
+    def deliver_review(review_id):
+        ...
+
+    deliver_review.enqueue(review.pk)
+
+A ``Job`` row is inserted once the current transaction commits, so a
+rolled-back write enqueues nothing and the worker never claims a job for
+rows it cannot read yet. Arguments must be JSON-serializable; datetimes
+arrive as ISO 8601 strings.
+
+``manage.py run_jobs`` claims due jobs in batches, runs them on a thread or
+process pool, each in its own transaction unless its task opts out, and
+marks a batch's successes done in one update. A failing job is retried
+after ``BACKOFF_SECONDS * 2 ** (attempts - 1)`` seconds (capped and
+jittered) until it has used ``max_attempts``, then left failed. A claim is a lease: jobs held by a
+worker that died are queued again after ``LEASE_SECONDS``.
+
+A task's ``key`` deduplicates its jobs: while a job is queued, enqueueing
+the same key adds nothing, and jobs sharing a key never run concurrently.
+A key enqueued while its job runs is run again afterwards, so tasks must be
+idempotent and read the current state rather than trust their arguments.
+
+With ``EAGER`` a task runs inline when it is enqueued, as the write path
+did before the queue; tests use it to see side effects immediately.
+``metrics`` reports queue depth, lag and throughput for ``run_jobs
+--stats`` and ``/api/jobs/stats/``.
+"""
+import functools
+import json
+import logging
+import os
+import random
+import socket
+import traceback
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import timedelta
+
+import django
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, close_old_connections, connection, connections, transaction
+from django.db.models import Count, F, Min
+from django.utils import timezone
+
+# api/models.py imports api/thumbnails.py, which registers tasks here, so
+# the Job model is imported where it is used.
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SETTINGS = {
+    # Run tasks inline when they are enqueued instead of queueing them.
+    'EAGER': False,
+    # Jobs claimed per round trip.
+    'BATCH_SIZE': 50,
+    # Jobs run at once; 1 runs them in the worker process itself.
+    'CONCURRENCY': 4,
+    # 'thread', or 'process' for CPU-bound tasks such as thumbnails.
+    'POOL': 'thread',
+    # Seconds an idle worker waits before looking for due jobs again.
+    'POLL_SECONDS': 1.0,
+    # A claimed job not finished within this many seconds is queued again.
+    'LEASE_SECONDS': 300,
+    'MAX_ATTEMPTS': 5,
+    'BACKOFF_SECONDS': 2,
+    'MAX_BACKOFF_SECONDS': 3600,
+    # Done jobs are deleted after this many hours; failed jobs are kept.
+    'RETENTION_HOURS': 24,
+    # Throughput is averaged over this many seconds.
+    'METRICS_WINDOW_SECONDS': 300,
+}
+
+LEASE_EXPIRED = "The worker running this job stopped before it finished."
+
+registry = {}
+
+
+class LeaseLost(Exception):
+    pass
+
+
+def get_settings():
+    return {**DEFAULT_SETTINGS, **getattr(settings, 'JOBS', {})}
+
+
+class Task:
+    """
+    A function run by the job queue; calling it runs it directly.
+    """
+
+    def __init__(self, func, name, key=None, max_attempts=None, atomic=True):
+        functools.update_wrapper(self, func)
+        self.func = func
+        self.name = name
+        self.key = key
+        self.max_attempts = max_attempts
+        self.atomic = atomic
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def get_key(self, args, kwargs):
+        if self.key is None:
+            return None
+        return f'{self.name}:{self.key.format(*args, **kwargs)}'
+
+    def enqueue(self, *args, **kwargs):
+        """
+        Run the task with these arguments after the current transaction commits.
+        """
+        self._enqueue([(args, kwargs)])
+
+    def enqueue_many(self, args_list):
+        """
+        Enqueue one job per argument tuple in ``args_list`` with a single insert.
+        """
+        self._enqueue([(args, {}) for args in args_list])
+
+    def _enqueue(self, calls):
+        # Round-tripped through JSON so eager runs see what the worker would.
+        calls = json.loads(json.dumps([[list(args), kwargs] for args, kwargs in calls], cls=DjangoJSONEncoder))
+        if not calls:
+            return
+        if get_settings()['EAGER']:
+            for args, kwargs in calls:
+                self.func(*args, **kwargs)
+            return
+        transaction.on_commit(functools.partial(_insert, self, calls), robust=True)
+
+
+def task(name=None, key=None, max_attempts=None, atomic=True):
+    """
+    Register the decorated function as a task named ``name`` (default: its dotted path).
+
+    ``key`` is a ``str.format`` template over the task's arguments that
+    deduplicates its jobs, e.g. ``'{0}'`` for one job per first argument.
+    Idempotent tasks doing slow work outside the database can pass
+    ``atomic=False`` to run without holding a transaction open.
+    """
+    def decorator(func):
+        registered = Task(func, name or f'{func.__module__}.{func.__qualname__}', key, max_attempts, atomic)
+        registry[registered.name] = registered
+        return registered
+    return decorator
+
+
+def _insert(task, calls):
+    from .models import Job
+
+    max_attempts = task.max_attempts or get_settings()['MAX_ATTEMPTS']
+    # Jobs whose key is already queued are skipped by the partial unique index.
+    Job.objects.bulk_create(
+        [
+            Job(task=task.name, args=args, kwargs=kwargs, key=task.get_key(args, kwargs), max_attempts=max_attempts)
+            for args, kwargs in calls
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def backoff(attempts):
+    """
+    Return the delay before retrying a job that has failed ``attempts`` times.
+    """
+    config = get_settings()
+    delay = min(config['BACKOFF_SECONDS'] * 2 ** (attempts - 1), config['MAX_BACKOFF_SECONDS'])
+    # Jitter spreads out the retries of jobs that failed together.
+    return timedelta(seconds=delay * random.uniform(0.5, 1))
+
+
+def _requeue(pk, locked_by, run_at, error):
+    from .models import Job
+
+    try:
+        with transaction.atomic():
+            Job.objects.filter(pk=pk, locked_by=locked_by).update(
+                status=Job.QUEUED, run_at=run_at, locked_by='', locked_until=None, last_error=error,
+            )
+    except IntegrityError:
+        # A newer job with the same key is queued and will do the same work.
+        Job.objects.filter(pk=pk, locked_by=locked_by).delete()
+
+
+def expire(now=None):
+    """
+    Queue again the jobs whose lease ran out, failing those without attempts left.
+    """
+    from .models import Job
+
+    now = now or timezone.now()
+    stale = Job.objects.filter(status=Job.RUNNING, locked_until__lt=now)
+    stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED, finished_at=now, locked_by='', locked_until=None, last_error=LEASE_EXPIRED,
+    )
+    for pk, locked_by in stale.values_list('pk', 'locked_by'):
+        _requeue(pk, locked_by, now, LEASE_EXPIRED)
+
+
+def claim(worker, limit):
+    """
+    Lease up to ``limit`` due jobs to ``worker``; returns their rows.
+    """
+    from .models import Job
+
+    config = get_settings()
+    now = timezone.now()
+    expire(now)
+    token = f'{worker}:{uuid.uuid4().hex[:12]}'
+    running_keys = Job.objects.filter(status=Job.RUNNING, key__isnull=False).values('key')
+    due = (
+        Job.objects.filter(status=Job.QUEUED, run_at__lte=now)
+        .exclude(key__in=running_keys)
+        .order_by('run_at', 'pk')
+        .values_list('pk', flat=True)
+    )
+
+    def take(ids):
+        # The status is re-checked, so racing workers never lease the same job.
+        Job.objects.filter(pk__in=ids, status=Job.QUEUED).update(
+            status=Job.RUNNING, locked_by=token, locked_until=now + timedelta(seconds=config['LEASE_SECONDS']),
+            started_at=now, attempts=F('attempts') + 1,
+        )
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            take(list(due.select_for_update(skip_locked=True)[:limit]))
+    else:
+        # SQLite: a read-then-write transaction could fail to upgrade its lock.
+        take(list(due[:limit]))
+    return list(
+        Job.objects.filter(status=Job.RUNNING, locked_by=token)
+        .order_by('run_at', 'pk')
+        .values('pk', 'task', 'args', 'kwargs', 'attempts', 'max_attempts', 'locked_by')
+    )
+
+
+def _renew(pk, locked_by):
+    from .models import Job
+
+    lease = timedelta(seconds=get_settings()['LEASE_SECONDS'])
+    if not Job.objects.filter(pk=pk, locked_by=locked_by).update(locked_until=timezone.now() + lease):
+        raise LeaseLost(f"Job {pk} was claimed by another worker.")
+
+
+def execute(pk, locked_by, name, args, kwargs):
+    """
+    Run one claimed job, in its own transaction unless its task opts out.
+
+    Returns None, or the traceback if it raised.
+    """
+    try:
+        task = registry[name]
+        if not task.atomic:
+            _renew(pk, locked_by)
+            task.func(*args, **kwargs)
+            return None
+        with transaction.atomic():
+            # Renewing the lease first also makes this a write transaction
+            # from the start: SQLite fails, rather than waits, when another
+            # writer commits while a transaction upgrades from reading.
+            _renew(pk, locked_by)
+            task.func(*args, **kwargs)
+    except Exception:
+        return traceback.format_exc()
+    return None
+
+
+def _execute_pooled(*call):
+    # As around a request: drop broken or expired connections of this thread or process.
+    close_old_connections()
+    try:
+        return execute(*call)
+    finally:
+        close_old_connections()
+
+
+def finish(jobs, errors):
+    """
+    Record the outcome of claimed ``jobs``; ``errors`` holds each one's traceback or None.
+
+    Returns how many were ``(done, retried, failed)``.
+    """
+    from .models import Job
+
+    now = timezone.now()
+    done = [job['pk'] for job, error in zip(jobs, errors) if error is None]
+    if done:
+        # Fenced by the lease, in case it ran out and another worker took over.
+        Job.objects.filter(pk__in=done, locked_by=jobs[0]['locked_by']).update(
+            status=Job.DONE, finished_at=now, locked_by='', locked_until=None, last_error='',
+        )
+    retried = failed = 0
+    for job, error in zip(jobs, errors):
+        if error is None:
+            continue
+        logger.warning("Job %s (%s) failed on attempt %s:\n%s", job['pk'], job['task'], job['attempts'], error)
+        if job['attempts'] >= job['max_attempts'] or job['task'] not in registry:
+            Job.objects.filter(pk=job['pk'], locked_by=job['locked_by']).update(
+                status=Job.FAILED, finished_at=now, locked_by='', locked_until=None, last_error=error,
+            )
+            failed += 1
+        else:
+            _requeue(job['pk'], job['locked_by'], now + backoff(job['attempts']), error)
+            retried += 1
+    return len(done), retried, failed
+
+
+class Worker:
+    """
+    Claims due jobs in batches and runs them on a thread or process pool.
+    """
+
+    def __init__(self, concurrency=None, batch_size=None, pool=None):
+        config = get_settings()
+        self.concurrency = concurrency or config['CONCURRENCY']
+        self.batch_size = batch_size or config['BATCH_SIZE']
+        self.pool = pool or config['POOL']
+        self.name = f'{socket.gethostname()}:{os.getpid()}'
+        self.executor = None
+
+    def start(self):
+        if self.concurrency > 1 and self.executor is None:
+            if self.pool == 'process':
+                self.executor = ProcessPoolExecutor(self.concurrency, initializer=django.setup)
+            else:
+                self.executor = ThreadPoolExecutor(self.concurrency, thread_name_prefix='jobs')
+
+    def stop(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def run_batch(self):
+        """
+        Claim and run one batch of due jobs; returns how many were ``(done, retried, failed)``.
+        """
+        jobs = claim(self.name, self.batch_size)
+        if not jobs:
+            return 0, 0, 0
+        calls = [(job['pk'], job['locked_by'], job['task'], job['args'], job['kwargs']) for job in jobs]
+        if self.executor is None:
+            errors = [execute(*call) for call in calls]
+        else:
+            if self.pool == 'process':
+                # Forked children must not inherit this process's connections.
+                connections.close_all()
+            errors = list(self.executor.map(_execute_pooled, *zip(*calls)))
+        return finish(jobs, errors)
+
+
+def prune(now=None):
+    """
+    Delete done jobs older than ``RETENTION_HOURS``; returns how many.
+    """
+    from .models import Job
+
+    now = now or timezone.now()
+    cutoff = now - timedelta(hours=get_settings()['RETENTION_HOURS'])
+    deleted, _ = Job.objects.filter(status=Job.DONE, finished_at__lt=cutoff).delete()
+    return deleted
+
+
+def metrics(now=None):
+    """
+    Return queue depth, lag and recent throughput.
+
+    ``lag_seconds`` is how long the oldest due job has waited past its
+    ``run_at``; ``throughput`` is jobs done per second over the last
+    ``METRICS_WINDOW_SECONDS``.
+    """
+    from .models import Job
+
+    now = now or timezone.now()
+    window = get_settings()['METRICS_WINDOW_SECONDS']
+    counts = dict(Job.objects.order_by().values_list('status').annotate(total=Count('pk')))
+    due = Job.objects.filter(status=Job.QUEUED, run_at__lte=now)
+    oldest = due.aggregate(oldest=Min('run_at'))['oldest']
+    finished = dict(
+        Job.objects.filter(finished_at__gte=now - timedelta(seconds=window))
+        .order_by().values_list('status').annotate(total=Count('pk'))
+    )
+    return {
+        'queued': counts.get(Job.QUEUED, 0),
+        'due': due.count(),
+        'retrying': Job.objects.filter(status=Job.QUEUED, attempts__gt=0).count(),
+        'running': counts.get(Job.RUNNING, 0),
+        'failed': counts.get(Job.FAILED, 0),
+        'lag_seconds': round((now - oldest).total_seconds(), 3) if oldest else 0.0,
+        'window_seconds': window,
+        'done_in_window': finished.get(Job.DONE, 0),
+        'failed_in_window': finished.get(Job.FAILED, 0),
+        'throughput': round(finished.get(Job.DONE, 0) / window, 3),
+    }
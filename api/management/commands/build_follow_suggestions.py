@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api import suggestions
+
+
+class Command(BaseCommand):
+    help = "Recompute \"people you may know\" suggestions from the follow graph."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top-n', type=int, default=suggestions.TOP_N,
+            help="Number of suggestions stored per profile.",
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=suggestions.CHUNK_SIZE,
+            help="Number of profiles whose suggestions are replaced per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        stored = suggestions.build(top_n=options['top_n'], chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored {stored} follow suggestion(s) in {time.monotonic() - started:.1f}s."
+        ))
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api import recommendations
+
+
+class Command(BaseCommand):
+    help = "Recompute item-item movie neighbours from review ratings."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true',
+            help="Recompute every movie instead of only those whose ratings changed since the last build.",
+        )
+        parser.add_argument(
+            '--top-k', type=int, default=recommendations.TOP_K,
+            help="Number of neighbours stored per movie.",
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=recommendations.CHUNK_SIZE,
+            help="Number of movies whose similarities are computed at once.",
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        refreshed = recommendations.build(
+            full=options['full'], top_k=options['top_k'], chunk_size=options['chunk_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Refreshed neighbours for {refreshed} movie(s) in {time.monotonic() - started:.1f}s."
+        ))
@@ -0,0 +1,45 @@
+import re
+
+from django.core.management.base import BaseCommand
+
+from api import thumbnails
+from api.models import UserProfile
+
+CONTENT_ADDRESSED = re.compile(r'^[0-9a-f]{64}$')
+
+
+class Command(BaseCommand):
+    help = "Build missing profile picture variants, moving older uploads to content-addressed names first."
+
+    def handle(self, *args, **options):
+        storage = thumbnails.picture_storage()
+        names = (
+            UserProfile.objects.exclude(profile_picture='').exclude(profile_picture__isnull=True)
+            .values_list('profile_picture', flat=True).distinct()
+        )
+        moved = built = failed = 0
+        expected = thumbnails.all_variants()
+        for name in list(names):
+            if not CONTENT_ADDRESSED.match(thumbnails.picture_key(name)):
+                if not storage.exists(name):
+                    self.stderr.write(f"{name} is missing from storage.")
+                    failed += 1
+                    continue
+                with storage.open(name, 'rb') as file:
+                    new_name = storage.save(name, file)
+                UserProfile.objects.filter(profile_picture=name).update(
+                    profile_picture=new_name, profile_picture_variants=[],
+                )
+                name = new_name
+                moved += 1
+            if UserProfile.objects.filter(profile_picture=name).exclude(profile_picture_variants=expected).exists():
+                try:
+                    thumbnails.record_variants(name, thumbnails.generate_variants(name))
+                except (OSError, ValueError) as exc:
+                    self.stderr.write(f"Could not build thumbnails for {name}: {exc}")
+                    failed += 1
+                    continue
+                built += 1
+        self.stdout.write(self.style.SUCCESS(
+            f"Moved {moved} picture(s) to content-addressed names and built variants for {built}; {failed} failed."
+        ))
@@ -0,0 +1,48 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from api import exports
+
+
+class Command(BaseCommand):
+    help = "Stream reviews, comments or likes as NDJSON to stdout or a file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(exports.EXPORTS))
+        parser.add_argument('--movie', type=int, help="Only rows for this movie id.")
+        parser.add_argument('--user', type=int, help="Only rows by this user id.")
+        parser.add_argument('--since', help="Only rows with a timestamp after this ISO 8601 value.")
+        parser.add_argument('--output', help="File to write; defaults to stdout.")
+        parser.add_argument(
+            '--chunk-size', type=int, default=exports.CHUNK_SIZE,
+            help="Number of rows fetched from the database at a time.",
+        )
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            since = parse_datetime(options['since'])
+            if since is None:
+                raise CommandError("--since must be an ISO 8601 timestamp.")
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+        queryset = exports.get_export_queryset(
+            options['kind'], movie=options['movie'], user=options['user'], since=since,
+        )
+        lines = exports.iter_ndjson(queryset, chunk_size=options['chunk_size'])
+        if options['output']:
+            with open(options['output'], 'wb') as file:
+                count = self._write(file, lines)
+            self.stderr.write(self.style.SUCCESS(f"Exported {count} {options['kind']} to {options['output']}."))
+        else:
+            self._write(sys.stdout.buffer, lines)
+
+    def _write(self, file, lines):
+        count = 0
+        for line in lines:
+            file.write(line)
+            count += 1
+        return count
@@ -0,0 +1,62 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api import dataset
+
+
+class Command(BaseCommand):
+    help = "Generate a synthetic social graph of users, movies, follows, reviews, likes and comments."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000, help="Number of users to create.")
+        parser.add_argument('--movies', type=int, default=500, help="Number of movies to create.")
+        parser.add_argument(
+            '--avg-following', type=float, default=20,
+            help="Mean number of profiles each user follows.",
+        )
+        parser.add_argument(
+            '--avg-reviews', type=float, default=10,
+            help="Mean number of reviews per user.",
+        )
+        parser.add_argument('--avg-likes', type=float, default=5, help="Mean number of likes per review.")
+        parser.add_argument('--avg-comments', type=float, default=1, help="Mean number of comments per review.")
+        parser.add_argument(
+            '--follow-exponent', type=float, default=1.0,
+            help="Zipf exponent of follower popularity; higher values make bigger celebrities.",
+        )
+        parser.add_argument(
+            '--days', type=int, default=90,
+            help="Spread reviews, likes and comments over this many past days.",
+        )
+        parser.add_argument('--prefix', default='loaduser', help="Username prefix of the generated users.")
+        parser.add_argument('--password', default='loadtest123', help="Password of every generated user.")
+        parser.add_argument('--seed', type=int, default=0, help="Random seed.")
+        parser.add_argument(
+            '--chunk-size', type=int, default=dataset.CHUNK_SIZE,
+            help="Number of rows inserted per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        for name in ('users', 'movies', 'chunk_size'):
+            if options[name] < 1:
+                raise CommandError(f"--{name.replace('_', '-')} must be at least 1.")
+        started = time.monotonic()
+        created = dataset.generate(
+            users=options['users'],
+            movies=options['movies'],
+            avg_following=options['avg_following'],
+            avg_reviews=options['avg_reviews'],
+            avg_likes=options['avg_likes'],
+            avg_comments=options['avg_comments'],
+            follow_exponent=options['follow_exponent'],
+            days=options['days'],
+            prefix=options['prefix'],
+            password=options['password'],
+            seed=options['seed'],
+            chunk_size=options['chunk_size'],
+            log=self.stdout.write if options['verbosity'] > 0 else lambda message: None,
+        )
+        elapsed = time.monotonic() - started
+        summary = ', '.join(f"{count} {kind}" for kind, count in created.items())
+        self.stdout.write(self.style.SUCCESS(f"Created {summary} in {elapsed:.1f}s."))
@@ -0,0 +1,93 @@
+import os
+import time
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from api import importer
+
+
+class Command(BaseCommand):
+    help = "Stream movies from a CSV or JSON Lines file and upsert them on (title, release_year)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV or JSON Lines file with title, genre, release_year, description and poster_url.")
+        parser.add_argument(
+            '--format', choices=importer.FORMATS,
+            help="Input format; guessed from the file extension by default.",
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=importer.CHUNK_SIZE,
+            help="Number of records upserted per transaction.",
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help="Checkpoint file used to resume an interrupted import (default: <path>.checkpoint).",
+        )
+        parser.add_argument(
+            '--restart', action='store_true',
+            help="Ignore an existing checkpoint and import from the first record.",
+        )
+        parser.add_argument(
+            '--max-errors-shown', type=int, default=20,
+            help="Number of invalid records described on stderr.",
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f"{path} does not exist.")
+        if options['chunk_size'] < 1:
+            raise CommandError("--chunk-size must be at least 1.")
+        try:
+            format = options['format'] or importer.detect_format(path)
+        except ValueError as exc:
+            raise CommandError(exc)
+        checkpoint_path = options['checkpoint'] or f'{path}.checkpoint'
+
+        state = {**importer.fingerprint(path), 'records': 0, 'offset': 0, 'written': 0, 'invalid': 0}
+        checkpoint = None if options['restart'] else importer.load_checkpoint(checkpoint_path)
+        if checkpoint is not None:
+            if any(checkpoint.get(key) != value for key, value in importer.fingerprint(path).items()):
+                raise CommandError(
+                    f"{checkpoint_path} belongs to a different version of the input; use --restart."
+                )
+            state = checkpoint
+            self.stdout.write(f"Resuming after record {state['records']}.")
+
+        records = importer.read_records(path, format, offset=state['offset'])
+        errors_shown = 0
+        started = time.monotonic()
+        processed = 0
+        try:
+            for chunk in importer.chunked(records, options['chunk_size']):
+                values = []
+                for number, (record, _) in enumerate(chunk, start=state['records'] + 1):
+                    try:
+                        values.append(importer.clean_record(record))
+                    except ValidationError as exc:
+                        state['invalid'] += 1
+                        if errors_shown < options['max_errors_shown']:
+                            errors_shown += 1
+                            self.stderr.write(f"Record {number}: {' '.join(exc.messages)}")
+                state['written'] += importer.upsert_chunk(values)
+                state['records'] += len(chunk)
+                state['offset'] = chunk[-1][1]
+                processed += len(chunk)
+                importer.save_checkpoint(checkpoint_path, state)
+                rate = processed / max(time.monotonic() - started, 1e-9)
+                self.stdout.write(
+                    f"{state['records']} records read, {state['written']} upserted, "
+                    f"{state['invalid']} invalid ({rate:,.0f} records/s)"
+                )
+        except ValueError as exc:
+            # Malformed JSON or CSV; the checkpoint points at the last good chunk.
+            raise CommandError(f"Could not parse {path} after record {state['records']}: {exc}")
+
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {state['written']} movie(s) from {state['records']} record(s), "
+            f"skipped {state['invalid']} invalid, in {elapsed:.1f}s."
+        ))
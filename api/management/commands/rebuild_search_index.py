@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from api import search
+
+
+class Command(BaseCommand):
+    help = "Create the full-text search indexes if needed and repopulate them."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database', default=DEFAULT_DB_ALIAS,
+            help="Database alias to rebuild (default: %(default)s).",
+        )
+
+    def handle(self, *args, **options):
+        using = options['database']
+        search.rebuild(using)
+        if not search.is_available(using):
+            raise CommandError(f"Full-text search is not supported on database '{using}'.")
+        self.stdout.write(self.style.SUCCESS("Rebuilt full-text search indexes."))
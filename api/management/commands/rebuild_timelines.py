@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from api import timelines
+from api.models import UserProfile
+
+
+class Command(BaseCommand):
+    help = "Rebuild materialized feed timelines from the current follow graph."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'usernames', nargs='*',
+            help="Only rebuild the timelines of these users (default: all users).",
+        )
+        parser.add_argument(
+            '--limit', type=int, default=None,
+            help="Number of recent reviews to keep per timeline (default: FEED_BACKFILL_LIMIT).",
+        )
+
+    def handle(self, *args, **options):
+        profiles = UserProfile.objects.select_related('user').order_by('pk')
+        if options['usernames']:
+            profiles = profiles.filter(user__username__in=options['usernames'])
+
+        rebuilt = 0
+        for profile in profiles.iterator(chunk_size=500):
+            timelines.rebuild(profile, limit=options['limit'])
+            rebuilt += 1
+            if options['verbosity'] > 1:
+                self.stdout.write(f"Rebuilt timeline for {profile.user.username}")
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rebuilt} timeline(s)."))
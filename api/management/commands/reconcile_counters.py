@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from api import counters
+
+
+class Command(BaseCommand):
+    help = "Recompute denormalized like, comment, follow and review counters and movie rating stats."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=counters.RECONCILE_BATCH_SIZE,
+            help="Number of rows checked per batch.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        repaired_reviews = counters.reconcile_reviews(batch_size=batch_size)
+        repaired_profiles = counters.reconcile_profiles(batch_size=batch_size)
+        rebuilt_movies = counters.reconcile_rating_stats(batch_size=batch_size)
+        self.stdout.write(self.style.SUCCESS(
+            f"Repaired {repaired_reviews} review(s) and {repaired_profiles} profile(s); "
+            f"rebuilt rating stats for {rebuilt_movies} movie(s)."
+        ))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api import trending
+
+
+class Command(BaseCommand):
+    help = "Rebuild the trending movie and review leaderboards from recent activity."
+
+    def handle(self, *args, **options):
+        movies, reviews = trending.refresh()
+        self.stdout.write(self.style.SUCCESS(f"Ranked {movies} trending movie(s) and {reviews} review(s)."))
@@ -0,0 +1,65 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api import jobs
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs until interrupted."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int, default=None,
+            help="Jobs run at once (default: JOBS['CONCURRENCY']); 1 runs them in this process.",
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=None,
+            help="Jobs claimed per round trip (default: JOBS['BATCH_SIZE']).",
+        )
+        parser.add_argument(
+            '--pool', choices=['thread', 'process'], default=None,
+            help="Run jobs on threads or processes (default: JOBS['POOL']).",
+        )
+        parser.add_argument(
+            '--burst', action='store_true',
+            help="Exit once no job is due instead of waiting for more.",
+        )
+        parser.add_argument(
+            '--stats', action='store_true',
+            help="Print queue depth, lag and throughput, then exit.",
+        )
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            for name, value in jobs.metrics().items():
+                self.stdout.write(f"{name}: {value}")
+            return
+        worker = jobs.Worker(
+            concurrency=options['concurrency'], batch_size=options['batch_size'], pool=options['pool'],
+        )
+        poll = jobs.get_settings()['POLL_SECONDS']
+        totals = [0, 0, 0]
+        worker.start()
+        try:
+            while True:
+                started = time.perf_counter()
+                outcome = worker.run_batch()
+                if any(outcome):
+                    totals = [total + count for total, count in zip(totals, outcome)]
+                    done, retried, failed = outcome
+                    self.stdout.write(
+                        f"{done} done, {retried} retried, {failed} failed in {time.perf_counter() - started:.2f}s."
+                    )
+                    continue
+                jobs.prune()
+                if options['burst']:
+                    break
+                time.sleep(poll)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            worker.stop()
+        self.stdout.write(self.style.SUCCESS(
+            f"Ran {sum(totals)} job(s): {totals[0]} done, {totals[1]} retried, {totals[2]} failed."
+        ))
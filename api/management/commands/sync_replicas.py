@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from api import replicas
+
+
+class Command(BaseCommand):
+    help = "Copy the primary SQLite database into its SQLite replicas, for testing replica reads locally."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'aliases', nargs='*',
+            help="Replica aliases to refresh (default: every configured replica).",
+        )
+        parser.add_argument(
+            '--interval', type=float, default=None,
+            help="Keep copying every this many seconds, simulating replication lag.",
+        )
+
+    def handle(self, *args, **options):
+        aliases = options['aliases'] or replicas.get_replicas()
+        if not aliases:
+            raise CommandError("No replicas configured; set DATABASE_REPLICAS.")
+        primary = connections[DEFAULT_DB_ALIAS].settings_dict
+        for alias in aliases:
+            if alias not in connections or alias == DEFAULT_DB_ALIAS:
+                raise CommandError(f"'{alias}' is not a replica alias.")
+            if connections[alias].vendor != 'sqlite' or connections[DEFAULT_DB_ALIAS].vendor != 'sqlite':
+                raise CommandError("sync_replicas only copies SQLite databases.")
+
+        while True:
+            for alias in aliases:
+                replicas.copy_sqlite(primary['NAME'], connections[alias].settings_dict['NAME'])
+            self.stdout.write(self.style.SUCCESS(f"Copied the primary into {', '.join(aliases)}."))
+            if options['interval'] is None:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,232 @@
+import logging
+import random
+import time
+from contextlib import AsyncExitStack, ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from . import profiling, replicas
+from .querybudget import QueryCounter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUERY_BUDGET = {
+    # Warn when a single request runs more queries than this.
+    'MAX_QUERIES': 20,
+    # Warn when one SQL template runs this many times (an N+1 pattern).
+    'MAX_DUPLICATES': 5,
+    # Raise instead of logging, to make budget violations impossible to miss.
+    'RAISE': False,
+}
+
+
+class QueryBudgetMiddleware:
+    """
+    Development-only middleware that counts the queries each request runs.
+
+    Adds ``X-Query-Count`` to every response and warns (or raises, with
+    ``QUERY_BUDGET['RAISE']``) when a request exceeds its budget or repeats a
+    statement per row. Disabled unless ``DEBUG`` is on.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.DEBUG:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.budget = {**DEFAULT_QUERY_BUDGET, **getattr(settings, 'QUERY_BUDGET', {})}
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with QueryCounter() as counter:
+            response = self.get_response(request)
+        return self.check(request, response, counter)
+
+    async def __acall__(self, request):
+        async with QueryCounter() as counter:
+            response = await self.get_response(request)
+        return self.check(request, response, counter)
+
+    def check(self, request, response, counter):
+        response['X-Query-Count'] = str(counter.count)
+        problems = []
+        if counter.count > self.budget['MAX_QUERIES']:
+            problems.append(f"{counter.count} queries (budget {self.budget['MAX_QUERIES']})")
+        for sql, times in counter.duplicates(self.budget['MAX_DUPLICATES']).items():
+            problems.append(f"{times}x duplicated query: {sql}")
+        if problems:
+            message = f"Query budget exceeded for {request.method} {request.path}: " + '; '.join(problems)
+            if self.budget['RAISE']:
+                raise AssertionError(message)
+            logger.warning(message)
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Break each request's time down into db, auth, view, serialize and render.
+
+    Adds the breakdown as a ``Server-Timing`` header and, for sampled or
+    slow requests, writes a cProfile dump and the captured SQL to
+    ``PROFILING['DUMP_DIR']``; see ``api/profiling.py``. Belongs near the
+    top of ``MIDDLEWARE`` so ``total`` covers the other middleware.
+    Disabled unless ``PROFILING['ENABLED']``, which defaults to ``DEBUG``.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.config = profiling.get_settings()
+        if not self.config['ENABLED']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+            # Sync hooks would be run on a thread under an async handler.
+            self.process_view = self.aprocess_view
+            self.process_template_response = self.aprocess_template_response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        profile, sampled, token, counters = self.start(request)
+        try:
+            with ExitStack() as stack:
+                for counter in counters:
+                    stack.enter_context(counter)
+                self.start_profiler(profile, sampled, stack)
+                response = self.get_response(request)
+        finally:
+            profiling.deactivate(token)
+        return self.finish(request, response, profile, sampled, counters)
+
+    async def __acall__(self, request):
+        profile, sampled, token, counters = self.start(request)
+        try:
+            async with AsyncExitStack() as stack:
+                for counter in counters:
+                    await stack.enter_async_context(counter)
+                # cProfile only sees the event loop's thread, not the queries
+                # run by sync_to_async; those are in the db metric.
+                self.start_profiler(profile, sampled, stack)
+                response = await self.get_response(request)
+        finally:
+            profiling.deactivate(token)
+        return self.finish(request, response, profile, sampled, counters)
+
+    def start(self, request):
+        """
+        Activate a profile for ``request`` and return it with one query counter per connection.
+        """
+        profile = profiling.RequestProfile()
+        request._profile = profile
+        sampled = random.random() < self.config['SAMPLE_RATE']
+        token = profiling.activate(profile)
+        counters = [QueryCounter(alias) for alias in connections]
+        request._profile_start = time.perf_counter()
+        return profile, sampled, token, counters
+
+    def start_profiler(self, profile, sampled, stack):
+        if sampled or self.config['PROFILE_ALL']:
+            profile.profiler = profiling.start_profiler()
+            if profile.profiler is not None:
+                stack.callback(profile.profiler.disable)
+
+    def finish(self, request, response, profile, sampled, counters):
+        config = self.config
+        start = request._profile_start
+        end = time.perf_counter()
+        profile.add('total', end - start)
+        if 'view' not in profile.durations and hasattr(request, '_profile_view_start'):
+            # Not a template response (e.g. streaming): the view ran until now.
+            profile.add('view', end - request._profile_view_start)
+
+        queries = [(counter.using, sql, duration) for counter in counters for sql, duration in counter.queries]
+        profile.add('db', sum(duration for _, _, duration in queries), description=f'{len(queries)} queries')
+        if config['SERVER_TIMING']:
+            response['Server-Timing'] = profile.server_timing()
+
+        threshold = config['SLOW_THRESHOLD_MS']
+        if sampled or (threshold is not None and profile.durations['total'] >= threshold):
+            try:
+                profiling.write_dump(config['DUMP_DIR'], request, response, profile, queries)
+            except OSError:
+                logger.exception("Could not write the profile of %s %s", request.method, request.path)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._profile_view_start = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        # DRF responses render after this hook, once every middleware has seen them.
+        now = time.perf_counter()
+        profile = request._profile
+        profile.add('view', now - request._profile_view_start)
+
+        def rendered(response):
+            profile.add('render', time.perf_counter() - now)
+
+        response.add_post_render_callback(rendered)
+        return response
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        return ProfilingMiddleware.process_view(self, request, view_func, view_args, view_kwargs)
+
+    async def aprocess_template_response(self, request, response):
+        return ProfilingMiddleware.process_template_response(self, request, response)
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Let ``ReplicaRouter`` serve safe requests from read replicas.
+
+    Reads of GET, HEAD and OPTIONS requests may use a replica unless the
+    client wrote recently; a successful write pins the client's reads to
+    the primary. Disabled when no replicas are configured; see
+    ``api/replicas.py``.
+    """
+    SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not replicas.get_replicas():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        key, safe, token = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            replicas.reset_replica_reads(token)
+        return self.finish(key, safe, response)
+
+    async def __acall__(self, request):
+        key, safe, token = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            replicas.reset_replica_reads(token)
+        return self.finish(key, safe, response)
+
+    def start(self, request):
+        key = replicas.client_key(request)
+        safe = request.method in self.SAFE_METHODS
+        return key, safe, replicas.allow_replica_reads(safe and not replicas.is_pinned(key))
+
+    def finish(self, key, safe, response):
+        if not safe and response.status_code < 400:
+            replicas.pin(key)
+        return response
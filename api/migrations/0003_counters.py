@@ -0,0 +1,70 @@
+# Generated by Django 4.2.10 on 2026-10-16 22:22
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def _count(queryset, field, outer='pk'):
+    counts = (
+        queryset.filter(**{field: OuterRef(outer)})
+        .order_by()
+        .values(field)
+        .annotate(total=Count('*'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+def populate_counters(apps, schema_editor):
+    Review = apps.get_model('api', 'Review')
+    UserProfile = apps.get_model('api', 'UserProfile')
+    Like = apps.get_model('api', 'Like')
+    Comment = apps.get_model('api', 'Comment')
+    Follow = UserProfile.following.through
+
+    Review.objects.update(
+        likes_count=_count(Like.objects.all(), 'review'),
+        comments_count=_count(Comment.objects.all(), 'review'),
+    )
+    UserProfile.objects.update(
+        follower_count=_count(Follow.objects.all(), 'to_userprofile'),
+        following_count=_count(Follow.objects.all(), 'from_userprofile'),
+        review_count=_count(Review.objects.all(), 'user', outer='user'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_timelineentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='review',
+            name='comments_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='likes_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='follower_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='following_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='review_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
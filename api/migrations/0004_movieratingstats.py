@@ -0,0 +1,60 @@
+# Generated by Django 4.2.10 on 2026-10-16 22:24
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+import django.db.models.deletion
+
+
+def populate_rating_stats(apps, schema_editor):
+    Movie = apps.get_model('api', 'Movie')
+    Review = apps.get_model('api', 'Review')
+    MovieRatingStats = apps.get_model('api', 'MovieRatingStats')
+
+    aggregates = {
+        row['movie_id']: row
+        for row in Review.objects.order_by().values('movie_id').annotate(
+            rating_sum=Sum('rating'),
+            rating_count=Count('*'),
+            **{f'rating_{rating}_count': Count('pk', filter=Q(rating=rating)) for rating in range(1, 6)},
+        )
+    }
+    rows = []
+    for movie_id in Movie.objects.values_list('pk', flat=True).iterator():
+        row = aggregates.get(movie_id, {})
+        rows.append(MovieRatingStats(
+            movie_id=movie_id,
+            rating_sum=row.get('rating_sum', 0),
+            rating_count=row.get('rating_count', 0),
+            **{f'rating_{rating}_count': row.get(f'rating_{rating}_count', 0) for rating in range(1, 6)},
+            average_rating=row['rating_sum'] / row['rating_count'] if row else 0,
+        ))
+    MovieRatingStats.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovieRatingStats',
+            fields=[
+                ('movie', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rating_stats', serialize=False, to='api.movie')),
+                ('rating_sum', models.IntegerField(default=0)),
+                ('rating_count', models.IntegerField(default=0)),
+                ('rating_1_count', models.IntegerField(default=0)),
+                ('rating_2_count', models.IntegerField(default=0)),
+                ('rating_3_count', models.IntegerField(default=0)),
+                ('rating_4_count', models.IntegerField(default=0)),
+                ('rating_5_count', models.IntegerField(default=0)),
+                ('average_rating', models.FloatField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'movie rating stats',
+                'indexes': [models.Index(fields=['average_rating', 'movie'], name='rating_stats_avg_idx'), models.Index(fields=['rating_count', 'movie'], name='rating_stats_count_idx')],
+            },
+        ),
+        migrations.RunPython(populate_rating_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.10 on 2026-10-16 22:34
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_movieratingstats'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='movie',
+            unique_together={('title', 'release_year')},
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.10 on 2026-10-16 22:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_movie_natural_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovieSimilarity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('computed_at', models.DateTimeField()),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='neighbours', to='api.movie')),
+                ('similar_movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='neighbour_of', to='api.movie')),
+            ],
+            options={
+                'verbose_name_plural': 'movie similarities',
+                'indexes': [models.Index(fields=['movie', '-score'], name='similarity_movie_score_idx')],
+                'unique_together': {('movie', 'similar_movie')},
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.10 on 2026-10-16 22:39
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_moviesimilarity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FollowSuggestion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('mutual_count', models.IntegerField(default=0)),
+                ('co_reviewed_count', models.IntegerField(default=0)),
+                ('computed_at', models.DateTimeField()),
+                ('profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='follow_suggestions', to='api.userprofile')),
+                ('suggested', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='suggested_to', to='api.userprofile')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['profile', '-score'], name='suggestion_profile_score_idx')],
+                'unique_together': {('profile', 'suggested')},
+            },
+        ),
+    ]
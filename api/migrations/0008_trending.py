@@ -0,0 +1,52 @@
+# Generated by Django 4.2.10 on 2026-10-16 22:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_followsuggestion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingReview',
+            fields=[
+                ('review', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trending', serialize=False, to='api.review')),
+                ('score', models.FloatField()),
+                ('rank', models.IntegerField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['rank'], name='trending_review_rank_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='TrendingMovie',
+            fields=[
+                ('movie', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trending', serialize=False, to='api.movie')),
+                ('score', models.FloatField()),
+                ('rank', models.IntegerField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['rank'], name='trending_movie_rank_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='TrendingBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('review_count', models.IntegerField(default=0)),
+                ('like_count', models.IntegerField(default=0)),
+                ('comment_count', models.IntegerField(default=0)),
+                ('movie', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.movie')),
+                ('review', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.review')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['hour'], name='trending_bucket_hour_idx')],
+                'unique_together': {('movie', 'hour'), ('review', 'hour')},
+            },
+        ),
+    ]
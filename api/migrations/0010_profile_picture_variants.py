@@ -0,0 +1,24 @@
+# Generated by Django 4.2.10 on 2026-10-16 23:17
+
+import api.thumbnails
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='profile_picture_variants',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='userprofile',
+            name='profile_picture',
+            field=models.ImageField(blank=True, null=True, storage=api.thumbnails.picture_storage, upload_to='profile_pics/'),
+        ),
+    ]
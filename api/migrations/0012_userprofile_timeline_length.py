@@ -0,0 +1,31 @@
+# Generated by Django 4.2.10 on 2026-10-16 23:40
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_timelines(apps, schema_editor):
+    UserProfile = apps.get_model('api', 'UserProfile')
+    TimelineEntry = apps.get_model('api', 'TimelineEntry')
+    lengths = (
+        TimelineEntry.objects.filter(user_id=OuterRef('user_id'))
+        .order_by().values('user_id').annotate(total=Count('*')).values('total')
+    )
+    UserProfile.objects.update(timeline_length=Coalesce(Subquery(lengths), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='timeline_length',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_timelines, migrations.RunPython.noop),
+    ]
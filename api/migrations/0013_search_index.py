@@ -0,0 +1,59 @@
+from django.db import migrations
+
+
+class RunSQLiteSQL(migrations.RunSQL):
+    """
+    ``RunSQL`` applied only on SQLite; other backends have no FTS5 and search
+    falls back to ORM filtering.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'sqlite':
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'sqlite':
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+def index_sql(index, table, columns):
+    """
+    The FTS5 external-content index over ``table`` and its sync triggers, as in api/search.py.
+    """
+    column_list = ', '.join(columns)
+    new_values = ', '.join(f'new.{column}' for column in columns)
+    old_values = ', '.join(f'old.{column}' for column in columns)
+    # IF NOT EXISTS: search.install() may already have built the index on a
+    # database that was created without migrations and migrated later.
+    forwards = [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {index} USING fts5("
+        f"{column_list}, content='{table}', content_rowid='id', "
+        f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+        f"CREATE TRIGGER IF NOT EXISTS {index}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {index}(rowid, {column_list}) VALUES (new.id, {new_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {index}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {index}({index}, rowid, {column_list}) VALUES ('delete', old.id, {old_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {index}_au AFTER UPDATE OF {column_list} ON {table} BEGIN "
+        f"INSERT INTO {index}({index}, rowid, {column_list}) VALUES ('delete', old.id, {old_values}); "
+        f"INSERT INTO {index}(rowid, {column_list}) VALUES (new.id, {new_values}); END",
+        f"INSERT INTO {index}({index}) VALUES ('rebuild')",
+    ]
+    backwards = [
+        f"DROP TRIGGER IF EXISTS {index}_au",
+        f"DROP TRIGGER IF EXISTS {index}_ad",
+        f"DROP TRIGGER IF EXISTS {index}_ai",
+        f"DROP TABLE IF EXISTS {index}",
+    ]
+    return RunSQLiteSQL(forwards, backwards)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_userprofile_timeline_length'),
+    ]
+
+    operations = [
+        index_sql('api_movie_fts', 'api_movie', ('title', 'description')),
+        index_sql('api_review_fts', 'api_review', ('text',)),
+    ]
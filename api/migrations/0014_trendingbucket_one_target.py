@@ -0,0 +1,17 @@
+# Generated by Django 4.2.10 on 2026-10-16 23:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_search_index'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='trendingbucket',
+            constraint=models.CheckConstraint(check=models.Q(models.Q(('movie__isnull', False), ('review__isnull', True)), models.Q(('movie__isnull', True), ('review__isnull', False)), _connector='OR'), name='trending_bucket_one_target'),
+        ),
+    ]
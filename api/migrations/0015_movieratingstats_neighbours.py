@@ -0,0 +1,42 @@
+# Generated by Django 4.2.10 on 2026-10-17 00:10
+
+from django.db import migrations, models
+from django.db.models import Max, OuterRef, Subquery
+
+
+def backfill_timestamps(apps, schema_editor):
+    MovieRatingStats = apps.get_model('api', 'MovieRatingStats')
+    Review = apps.get_model('api', 'Review')
+    MovieSimilarity = apps.get_model('api', 'MovieSimilarity')
+    latest_review = (
+        Review.objects.filter(movie_id=OuterRef('movie_id'))
+        .order_by().values('movie_id').annotate(latest=Max('timestamp')).values('latest')
+    )
+    latest_build = (
+        MovieSimilarity.objects.filter(movie_id=OuterRef('movie_id'))
+        .order_by().values('movie_id').annotate(latest=Max('computed_at')).values('latest')
+    )
+    MovieRatingStats.objects.update(
+        ratings_changed_at=Subquery(latest_review), neighbours_computed_at=Subquery(latest_build),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_trendingbucket_one_target'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movieratingstats',
+            name='ratings_changed_at',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='movieratingstats',
+            name='neighbours_computed_at',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_timestamps, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.10 on 2026-10-17 00:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_movieratingstats_neighbours'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='like',
+            index=models.Index(fields=['timestamp', 'id'], name='like_ts_idx'),
+        ),
+    ]
@@ -1,45 +1,79 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.utils import timezone
+from .thumbnails import picture_storage
 
-class UserProfile(models.Model):
+class CounterFieldsMixin:
+    """
+    Keep ``save()`` from writing back stale denormalized counters.
+
+    Counter columns are only changed with ``F()`` updates, so a full save of an
+    instance loaded earlier must not overwrite them.
+    """
+    counter_fields = ()
+    
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
+
+class UserProfile(CounterFieldsMixin, models.Model):
     """
     Extension of the User model with additional fields for social features.
     """
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
     bio = models.TextField(max_length=500, blank=True)
-    profile_picture = models.ImageField(upload_to='profile_pics/', blank=True, null=True)
+    # Stored under the SHA-256 of the file; resized variants by api/thumbnails.py.
+    profile_picture = models.ImageField(upload_to='profile_pics/', storage=picture_storage, blank=True, null=True)
+    # Variants built so far, as '<variant>.<format>' (e.g. 'small.webp').
+    profile_picture_variants = models.JSONField(default=list, blank=True, editable=False)
     following = models.ManyToManyField('self', symmetrical=False, related_name='followers', blank=True)
+    # Denormalized counters maintained by api/counters.py; see reconcile_counters.
+    follower_count = models.IntegerField(default=0, editable=False)
+    following_count = models.IntegerField(default=0, editable=False)
+    review_count = models.IntegerField(default=0, editable=False)
+    # Approximate number of TimelineEntry rows; only decides when api/timelines.py trims.
+    timeline_length = models.IntegerField(default=0, editable=False)
+    
+    counter_fields = ('follower_count', 'following_count', 'review_count', 'timeline_length')
     
     def __str__(self):
         return f"{self.user.username}'s profile"
     
-    # TODO: Add methods for follow/unfollow functionality
     def follow(self, user_profile):
         """
-        Follow another user profile
+        Follow another user profile.
+
+        Timeline backfill is handled by the ``m2m_changed`` receiver in
+        ``api/signals.py`` so that every write path to ``following`` is covered.
         """
-        pass
+        if user_profile.pk == self.pk:
+            raise ValueError("A profile cannot follow itself.")
+        self.following.add(user_profile)
     
     def unfollow(self, user_profile):
         """
         Unfollow another user profile
         """
-        pass
+        self.following.remove(user_profile)
     
-    # TODO: Add method to get follower count
     def get_follower_count(self):
         """
         Return the number of followers
         """
-        pass
+        return self.follower_count
     
-    # TODO: Add method to get following count
     def get_following_count(self):
         """
         Return the number of users this profile is following
         """
-        pass
+        return self.following_count
 
 class Movie(models.Model):
     """
@@ -64,17 +98,81 @@ class Movie(models.Model):
     poster_url = models.URLField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    class Meta:
+        unique_together = ['title', 'release_year']  # Natural key used by import_movies
+        indexes = [
+            # ?genre=&release_year= filters, in primary key order.
+            models.Index(fields=['genre', 'release_year'], name='movie_genre_year_idx'),
+        ]
+    
     def __str__(self):
         return f"{self.title} ({self.release_year})"
     
-    # TODO: Add method to get average rating
     def get_average_rating(self):
         """
-        Calculate and return the average rating from all reviews
+        Return the average rating from all reviews.
+
+        Read from the incrementally maintained ``MovieRatingStats`` row.
+        """
+        try:
+            return self.rating_stats.average_rating
+        except ObjectDoesNotExist:
+            return 0
+    
+    def get_review_count(self):
+        """
+        Return the number of reviews this movie has received.
+        """
+        try:
+            return self.rating_stats.rating_count
+        except ObjectDoesNotExist:
+            return 0
+    
+    def get_rating_histogram(self):
+        """
+        Return the number of reviews per star rating, keyed 1 to 5.
         """
-        pass
+        try:
+            return self.rating_stats.get_histogram()
+        except ObjectDoesNotExist:
+            return {rating: 0 for rating in range(1, 6)}
 
-class Review(models.Model):
+class MovieRatingStats(models.Model):
+    """
+    Rating aggregate for a movie, updated incrementally as reviews change.
+
+    Holds the sum, count and a 1-5 histogram so that averages and histograms
+    never require scanning ``Review``. ``average_rating`` is stored so movie
+    lists can be sorted and filtered through an index.
+    """
+    movie = models.OneToOneField(Movie, on_delete=models.CASCADE, primary_key=True, related_name='rating_stats')
+    rating_sum = models.IntegerField(default=0)
+    rating_count = models.IntegerField(default=0)
+    rating_1_count = models.IntegerField(default=0)
+    rating_2_count = models.IntegerField(default=0)
+    rating_3_count = models.IntegerField(default=0)
+    rating_4_count = models.IntegerField(default=0)
+    rating_5_count = models.IntegerField(default=0)
+    average_rating = models.FloatField(default=0)
+    # api/recommendations.py refreshes the neighbours of movies whose ratings
+    # changed after their neighbours were last computed.
+    ratings_changed_at = models.DateTimeField(null=True, editable=False)
+    neighbours_computed_at = models.DateTimeField(null=True, editable=False)
+    
+    class Meta:
+        verbose_name_plural = 'movie rating stats'
+        indexes = [
+            models.Index(fields=['average_rating', 'movie'], name='rating_stats_avg_idx'),
+            models.Index(fields=['rating_count', 'movie'], name='rating_stats_count_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Rating stats for {self.movie}"
+    
+    def get_histogram(self):
+        return {rating: getattr(self, f'rating_{rating}_count') for rating in range(1, 6)}
+
+class Review(CounterFieldsMixin, models.Model):
     """
     Review model for movie reviews with ratings.
     """
@@ -85,19 +183,30 @@ class Review(models.Model):
         validators=[MinValueValidator(1), MaxValueValidator(5)]
     )
     timestamp = models.DateTimeField(auto_now_add=True)
+    # Denormalized counters maintained by api/counters.py; see reconcile_counters.
+    likes_count = models.IntegerField(default=0, editable=False)
+    comments_count = models.IntegerField(default=0, editable=False)
+    
+    counter_fields = ('likes_count', 'comments_count')
     
     class Meta:
         unique_together = ['movie', 'user']  # One review per movie per user
+        # Newest-first keyset pages: all reviews, a movie's reviews and an
+        # author's reviews (read-time merged into feeds).
+        indexes = [
+            models.Index(fields=['-timestamp', '-id'], name='review_ts_idx'),
+            models.Index(fields=['movie', '-timestamp', '-id'], name='review_movie_ts_idx'),
+            models.Index(fields=['user', '-timestamp', '-id'], name='review_user_ts_idx'),
+        ]
     
     def __str__(self):
         return f"Review by {self.user.username} for {self.movie.title}"
     
-    # TODO: Add method to get likes count
     def get_likes_count(self):
         """
         Return the number of likes this review has received
         """
-        pass
+        return self.likes_count
 
 class Comment(models.Model):
     """
@@ -108,6 +217,13 @@ class Comment(models.Model):
     text = models.TextField()
     timestamp = models.DateTimeField(auto_now_add=True)
     
+    class Meta:
+        # Oldest-first keyset pages: all comments and a review's comments.
+        indexes = [
+            models.Index(fields=['timestamp', 'id'], name='comment_ts_idx'),
+            models.Index(fields=['review', 'timestamp', 'id'], name='comment_review_ts_idx'),
+        ]
+    
     def __str__(self):
         return f"Comment by {self.author.username} on {self.review}"
 
@@ -121,6 +237,206 @@ class Like(models.Model):
     
     class Meta:
         unique_together = ['user', 'review']  # Prevent multiple likes by same user
+        indexes = [
+            # A review's likes, newest first.
+            models.Index(fields=['review', '-timestamp'], name='like_review_ts_idx'),
+            # Incremental exports read likes newer than ``since``.
+            models.Index(fields=['timestamp', 'id'], name='like_ts_idx'),
+        ]
     
     def __str__(self):
         return f"Like by {self.user.username} on {self.review}"
+
+
+class TimelineEntry(models.Model):
+    """
+    Materialized feed row: a review pushed into a follower's timeline.
+
+    Rows are written when a review is created (fan-out on write) and when a
+    profile follows someone (backfill), so reading a feed is a range scan on
+    ``(user, timestamp)``. ``timestamp`` and ``author`` are copied from the
+    review so the feed can be ordered and pruned without joining ``Review``.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='timeline_entries')
+    review = models.ForeignKey(Review, on_delete=models.CASCADE, related_name='timeline_entries')
+    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    timestamp = models.DateTimeField()
+    
+    class Meta:
+        unique_together = ['user', 'review']
+        indexes = [
+            models.Index(fields=['user', '-timestamp', '-review'], name='timeline_user_ts_idx'),
+            models.Index(fields=['user', 'author'], name='timeline_user_author_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.review} in {self.user.username}'s timeline"
+
+class MovieSimilarity(models.Model):
+    """
+    Precomputed item-item neighbour: ``similar_movie`` is one of the ``movie``'s
+    top-K most similar movies by cosine similarity of their review ratings.
+
+    Built by ``manage.py build_recommendations`` and refreshed by a job
+    queued when ratings change; see ``api/recommendations.py``.
+    """
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='neighbours')
+    similar_movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='neighbour_of')
+    score = models.FloatField()
+    computed_at = models.DateTimeField()
+    
+    class Meta:
+        verbose_name_plural = 'movie similarities'
+        unique_together = ['movie', 'similar_movie']
+        indexes = [
+            models.Index(fields=['movie', '-score'], name='similarity_movie_score_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.similar_movie} is similar to {self.movie} ({self.score:.2f})"
+
+class FollowSuggestion(models.Model):
+    """
+    Precomputed "people you may know" entry for a profile.
+
+    ``mutual_count`` is how many of the profile's followees already follow
+    ``suggested``; ``co_reviewed_count`` is how many movies both reviewed.
+    Built offline by ``manage.py build_follow_suggestions``; see
+    ``api/suggestions.py``.
+    """
+    profile = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='follow_suggestions')
+    suggested = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='suggested_to')
+    score = models.FloatField()
+    mutual_count = models.IntegerField(default=0)
+    co_reviewed_count = models.IntegerField(default=0)
+    computed_at = models.DateTimeField()
+    
+    class Meta:
+        unique_together = ['profile', 'suggested']
+        indexes = [
+            models.Index(fields=['profile', '-score'], name='suggestion_profile_score_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.suggested} suggested to {self.profile} ({self.score:.1f})"
+
+class TrendingBucket(models.Model):
+    """
+    Activity on one movie or one review during one hour.
+
+    Write paths add to the current hour's bucket (see ``api/trending.py``);
+    a movie's buckets also count the likes and comments on its reviews.
+    Exactly one of ``movie`` and ``review`` is set.
+    """
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    review = models.ForeignKey(Review, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    hour = models.DateTimeField()
+    review_count = models.IntegerField(default=0)
+    like_count = models.IntegerField(default=0)
+    comment_count = models.IntegerField(default=0)
+    
+    class Meta:
+        unique_together = [['movie', 'hour'], ['review', 'hour']]
+        indexes = [
+            models.Index(fields=['hour'], name='trending_bucket_hour_idx'),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                check=(
+                    models.Q(movie__isnull=False, review__isnull=True)
+                    | models.Q(movie__isnull=True, review__isnull=False)
+                ),
+                name='trending_bucket_one_target',
+            ),
+        ]
+    
+    def __str__(self):
+        target = f"movie {self.movie_id}" if self.movie_id else f"review {self.review_id}"
+        return f"Activity on {target} at {self.hour:%Y-%m-%d %H:00}"
+
+class TrendingMovie(models.Model):
+    """
+    Leaderboard row: a movie's time-decayed activity score and its rank.
+
+    Rebuilt from ``TrendingBucket`` by ``manage.py refresh_trending``.
+    """
+    movie = models.OneToOneField(Movie, on_delete=models.CASCADE, primary_key=True, related_name='trending')
+    score = models.FloatField()
+    rank = models.IntegerField()
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['rank'], name='trending_movie_rank_idx'),
+        ]
+    
+    def __str__(self):
+        return f"#{self.rank} {self.movie}"
+
+class TrendingReview(models.Model):
+    """
+    Leaderboard row: a review's time-decayed activity score and its rank.
+    """
+    review = models.OneToOneField(Review, on_delete=models.CASCADE, primary_key=True, related_name='trending')
+    score = models.FloatField()
+    rank = models.IntegerField()
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['rank'], name='trending_review_rank_idx'),
+        ]
+    
+    def __str__(self):
+        return f"#{self.rank} {self.review}"
+
+class Job(models.Model):
+    """
+    A deferred side effect, run after commit by ``manage.py run_jobs``.
+
+    ``task`` names a function registered with ``api.jobs.task``. Jobs with a
+    ``key`` are deduplicated: while one is queued, enqueueing the same key
+    again adds nothing, and jobs sharing a key never run concurrently.
+    Finished jobs are kept for ``RETENTION_HOURS`` to compute throughput;
+    see ``api/jobs.py``.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+    
+    task = models.CharField(max_length=200)
+    args = models.JSONField(default=list, encoder=DjangoJSONEncoder)
+    kwargs = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    key = models.CharField(max_length=200, null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=5)
+    # Not before this time; pushed back by the retry backoff.
+    run_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # The claim holding a running job, and when its lease runs out.
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['key'], condition=models.Q(status='queued'), name='job_queued_key_uniq'
+            ),
+        ]
+        indexes = [
+            # The worker's claim: due queued jobs in order.
+            models.Index(fields=['status', 'run_at'], name='job_status_run_at_idx'),
+            models.Index(fields=['finished_at'], name='job_finished_at_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.task} ({self.status})"
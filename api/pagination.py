@@ -0,0 +1,352 @@
+"""
+Keyset (seek) pagination for the large, append-mostly tables.
+
+``PageNumberPagination`` runs a ``COUNT(*)`` and an ``OFFSET`` that grows with
+the page number. The paginators here instead remember the ``(timestamp, id)``
+of the last row they returned in an opaque cursor and continue with
+``WHERE (timestamp, id) < (...)``, which is an index seek on every page.
+"""
+import heapq
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage, Page
+from django.db import DatabaseError, connections
+from django.db.models import Max, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from . import timelines
+
+
+def _table_row_estimate(queryset):
+    """
+    Return the planner's row estimate for the queryset's table, if any.
+    """
+    connection = connections[queryset.db]
+    table = queryset.model._meta.db_table
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute("SELECT reltuples FROM pg_class WHERE relname = %s", [table])
+                row = cursor.fetchone()
+                if row and row[0] >= 0:
+                    return int(row[0])
+            elif connection.vendor == 'sqlite':
+                # Populated by ANALYZE; the first number is the table's row count.
+                cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s AND idx IS NULL", [table])
+                row = cursor.fetchone()
+                if row is None:
+                    cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s", [table])
+                    row = cursor.fetchone()
+                if row:
+                    return int(row[0].split()[0])
+    except DatabaseError:
+        pass
+    return None
+
+
+def estimate_count(queryset, cap=1000):
+    """
+    Return ``(estimate, capped)``, a cheap approximation of ``queryset.count()``.
+
+    Unfiltered querysets use the database statistics, falling back to the
+    highest primary key. Filtered querysets are counted exactly up to ``cap``
+    rows; ``capped`` is true when more rows exist, and ``estimate`` is then
+    only a lower bound.
+    """
+    if not queryset.query.where:
+        estimate = _table_row_estimate(queryset)
+        if estimate is None:
+            estimate = queryset.aggregate(max_pk=Max('pk'))['max_pk'] or 0
+        return estimate, False
+    count = queryset.order_by()[:cap + 1].count()
+    return min(count, cap), count > cap
+
+
+class KeysetCursorPagination(CursorPagination):
+    """
+    Cursor pagination that seeks on every column of ``ordering``.
+
+    Unlike DRF's ``CursorPagination``, the cursor stores the full ordering key
+    (e.g. ``timestamp`` and ``id``), so rows sharing a timestamp never need an
+    offset. Clients may pass ``?total=estimate`` to get an ``estimated_total``
+    computed by ``estimate_count`` instead of an exact count, with
+    ``estimated_total_is_capped`` set when it stopped counting at the cap.
+    """
+    ordering = ('-timestamp', '-id')
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    total_query_param = 'total'
+    estimate_cap = 1000
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self._prepare(queryset, request)
+        if queryset is None:
+            return None
+        if request.query_params.get(self.total_query_param) == 'estimate':
+            self.total, self.total_is_capped = estimate_count(self._unsliced, cap=self.estimate_cap)
+        return self._finish(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        ``paginate_queryset`` for async views, fetching the page with the async ORM.
+        """
+        queryset = self._prepare(queryset, request)
+        if queryset is None:
+            return None
+        if request.query_params.get(self.total_query_param) == 'estimate':
+            self.total, self.total_is_capped = await sync_to_async(estimate_count)(
+                self._unsliced, cap=self.estimate_cap,
+            )
+        return self._finish([row async for row in queryset])
+
+    def _prepare(self, queryset, request):
+        """
+        Return the sliced queryset for the requested page, without running it.
+        """
+        if not self._setup(queryset, request):
+            return None
+        self._unsliced = queryset
+        return self._seek(queryset, self.fields)
+
+    def _setup(self, queryset, request):
+        """
+        Read the page size and cursor from ``request``; False if not paginating.
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return False
+
+        self.base_url = request.build_absolute_uri()
+        self.model = queryset.model
+        self.fields = [(name.lstrip('-'), name.startswith('-')) for name in self.ordering]
+        self.total = None
+        self.total_is_capped = False
+
+        self.cursor = self.decode_cursor(request)
+        self.reverse = bool(self.cursor and self.cursor[1])
+        return True
+
+    def _seek(self, queryset, fields):
+        """
+        Order ``queryset`` on ``fields`` and slice it to the rows of the page after the cursor.
+        """
+        queryset = queryset.order_by(*self._get_ordering(self.reverse, fields))
+        if self.cursor:
+            queryset = queryset.filter(self._get_seek_filter(self.cursor[0], self.reverse, fields))
+        return queryset[:self.page_size + 1]
+
+    def _finish(self, results):
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if self.reverse:
+            results.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor is not None
+
+        self.page = results
+        return results
+
+    def _get_ordering(self, reverse, fields=None):
+        fields = fields or self.fields
+        return [f'-{name}' if descending != reverse else name for name, descending in fields]
+
+    def _get_seek_filter(self, values, reverse, fields=None):
+        """
+        Build ``(a, b) < (x, y)`` as ``a <= x AND (a < x OR (a = x AND b < y))``.
+
+        The leading range predicate lets the database seek on the index.
+        """
+        fields = fields or self.fields
+        seek = Q()
+        equal = Q()
+        for (name, descending), value in zip(fields, values):
+            lookup = 'lt' if descending != reverse else 'gt'
+            seek |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        first_name, first_descending = fields[0]
+        bound = 'lte' if first_descending != reverse else 'gte'
+        return Q(**{f'{first_name}__{bound}': values[0]}) & seek
+
+    def _get_key(self, instance):
+        if isinstance(instance, dict):
+            return [instance[name] for name, _ in self.fields]
+        return [getattr(instance, name) for name, _ in self.fields]
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if self.page:
+            return self.encode_cursor((self._get_key(self.page[-1]), False))
+        # Walked backwards off the start of the results: resume from the cursor.
+        return self.encode_cursor((self.cursor[0], False))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if self.page:
+            return self.encode_cursor((self._get_key(self.page[0]), True))
+        return self.encode_cursor((self.cursor[0], True))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            payload = json.loads(urlsafe_b64decode(padded.encode('ascii')))
+            raw_values = payload['k']
+            if len(raw_values) != len(self.fields):
+                raise ValueError
+            values = [
+                self.model._meta.get_field(name).to_python(value)
+                for (name, _), value in zip(self.fields, raw_values)
+            ]
+            return values, bool(payload.get('r'))
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, cursor):
+        values, reverse = cursor
+        payload = {'k': [value.isoformat() if hasattr(value, 'isoformat') else value for value in values]}
+        if reverse:
+            payload['r'] = 1
+        encoded = urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode('ascii'))
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded.decode('ascii').rstrip('='))
+
+    def get_paginated_response(self, data):
+        payload = OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+        ])
+        if self.total is not None:
+            payload['estimated_total'] = self.total
+            payload['estimated_total_is_capped'] = self.total_is_capped
+        payload['results'] = data
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['estimated_total'] = {
+            'type': 'integer',
+            'nullable': True,
+        }
+        response_schema['properties']['estimated_total_is_capped'] = {
+            'type': 'boolean',
+        }
+        return response_schema
+
+
+class ReviewCursorPagination(KeysetCursorPagination):
+    """
+    Newest reviews first.
+    """
+    ordering = ('-timestamp', '-id')
+
+
+class FeedCursorPagination(ReviewCursorPagination):
+    """
+    Newest reviews first from a user's feed sources (see ``api/timelines.py``).
+
+    The view passes the queryset the page's reviews are loaded from. Each
+    source is seeked past the cursor on its own index and cut to one page;
+    the merged keys pick the page, whose reviews are then fetched by
+    primary key.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self._setup(queryset, request):
+            return None
+        sources = timelines.get_feed_sources(request.user)
+        if request.query_params.get(self.total_query_param) == 'estimate':
+            self.total, self.total_is_capped = self._estimate(sources)
+        keys = self._merge([list(self._seek_source(source)) for source in sources])
+        ids = [review_id for _, review_id in keys]
+        return self._finish(self._load(list(queryset.filter(pk__in=ids).order_by()), ids))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        if not self._setup(queryset, request):
+            return None
+        sources = await timelines.aget_feed_sources(request.user)
+        if request.query_params.get(self.total_query_param) == 'estimate':
+            self.total, self.total_is_capped = await sync_to_async(self._estimate)(sources)
+        keys = self._merge([[key async for key in self._seek_source(source)] for source in sources])
+        ids = [review_id for _, review_id in keys]
+        return self._finish(self._load([row async for row in queryset.filter(pk__in=ids).order_by()], ids))
+
+    def _seek_source(self, source):
+        queryset, names = source
+        fields = [(name, descending) for name, (_, descending) in zip(names, self.fields)]
+        return self._seek(queryset, fields).values_list(*names)
+
+    def _merge(self, pages):
+        """
+        Merge the sources' pages in walk order, dropping reviews found in several.
+        """
+        keys = []
+        for key in heapq.merge(*pages, reverse=not self.reverse):
+            if not keys or key != keys[-1]:
+                keys.append(key)
+            if len(keys) > self.page_size:
+                break
+        return keys
+
+    def _load(self, rows, ids):
+        by_id = {row['id'] if isinstance(row, dict) else row.pk: row for row in rows}
+        # A review deleted since its key was read is left out of the page.
+        return [by_id[review_id] for review_id in ids if review_id in by_id]
+
+    def _estimate(self, sources):
+        """
+        Sum the sources' estimates; a review in several sources is counted once per source.
+        """
+        estimates = [estimate_count(queryset, cap=self.estimate_cap) for queryset, _ in sources]
+        total = sum(estimate for estimate, _ in estimates)
+        capped = total > self.estimate_cap or any(capped for _, capped in estimates)
+        return min(total, self.estimate_cap), capped
+
+
+class CommentCursorPagination(KeysetCursorPagination):
+    """
+    Comments in the order they were written.
+    """
+    ordering = ('timestamp', 'id')
+
+
+class AsyncPageNumberPagination(PageNumberPagination):
+    """
+    ``PageNumberPagination`` whose count and page are fetched with the async ORM.
+    """
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        paginator = self.django_paginator_class(queryset, page_size)
+        # Prime Paginator.count so validating the page number runs no query.
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            number = paginator.validate_number(page_number)
+        except InvalidPage as exc:
+            msg = self.invalid_page_message.format(page_number=page_number, message=str(exc))
+            raise NotFound(msg)
+
+        bottom = (number - 1) * page_size
+        results = [obj async for obj in queryset[bottom:bottom + page_size]]
+        self.page = Page(results, number, paginator)
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+        return results
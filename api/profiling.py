@@ -0,0 +1,157 @@
+"""
+Per-request timing breakdown and sampled cProfile dumps.
+
+``ProfilingMiddleware`` (in ``api/middleware.py``) activates a
+``RequestProfile`` for each request. Time is attributed to:
+
+- ``db``: every query, on every connection, through ``QueryCounter``;
+- ``auth``: ``CachedJWTAuthentication.authenticate``;
+- ``serialize``: the outermost ``to_representation`` of serializers built
+  on ``TimedSerializerMixin``;
+- ``view``: from the view being called to it returning a response;
+- ``render``: rendering the response body;
+- ``total``: the whole middleware chain below the profiling middleware.
+
+The metrics overlap (queries run inside the view and during
+serialization), so they are reported side by side in ``Server-Timing``
+rather than summed.
+"""
+import cProfile
+import os
+import re
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+DEFAULT_SETTINGS = {
+    # None follows DEBUG: Server-Timing exposes query counts and timings.
+    'ENABLED': None,
+    # Add a Server-Timing header to every response.
+    'SERVER_TIMING': True,
+    # Fraction of requests run under cProfile and dumped to DUMP_DIR.
+    'SAMPLE_RATE': 0.0,
+    # Requests slower than this many milliseconds are dumped too (None: never).
+    'SLOW_THRESHOLD_MS': None,
+    # Run every request under cProfile, so slow ones always have a profile.
+    # Roughly doubles the CPU cost of a request; meant for staging.
+    'PROFILE_ALL': False,
+    'DUMP_DIR': os.path.join(settings.BASE_DIR, 'profiles'),
+}
+
+_current = ContextVar('request_profile', default=None)
+
+
+def get_settings():
+    config = {**DEFAULT_SETTINGS, **getattr(settings, 'PROFILING', {})}
+    if config['ENABLED'] is None:
+        config['ENABLED'] = settings.DEBUG
+    return config
+
+
+class RequestProfile:
+    """
+    Accumulated milliseconds per metric for one request.
+    """
+
+    def __init__(self):
+        self.durations = defaultdict(float)
+        self.depth = defaultdict(int)
+        self.descriptions = {}
+        self.profiler = None
+
+    def add(self, name, seconds, description=None):
+        self.durations[name] += seconds * 1000
+        if description is not None:
+            self.descriptions[name] = description
+
+    def server_timing(self):
+        entries = []
+        for name, duration in self.durations.items():
+            entry = f'{name};dur={duration:.1f}'
+            if name in self.descriptions:
+                entry += f';desc="{self.descriptions[name]}"'
+            entries.append(entry)
+        return ', '.join(entries)
+
+
+def activate(profile):
+    return _current.set(profile)
+
+
+def deactivate(token):
+    _current.reset(token)
+
+
+def current():
+    return _current.get()
+
+
+@contextmanager
+def timed(name):
+    """
+    Add the time spent in the block to ``name``; nested blocks of the same name count once.
+    """
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    profile.depth[name] += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.depth[name] -= 1
+        if not profile.depth[name]:
+            profile.add(name, time.perf_counter() - start)
+
+
+class TimedSerializerMixin:
+    """
+    Report serializer output time under the ``serialize`` metric.
+    """
+
+    def to_representation(self, instance):
+        with timed('serialize'):
+            return super().to_representation(instance)
+
+
+def start_profiler():
+    """
+    Return an enabled ``cProfile.Profile``, or None if another profiler is active.
+    """
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Python 3.12+ allows one active profiler per process.
+        return None
+    return profiler
+
+
+def _slug(path):
+    return re.sub(r'[^A-Za-z0-9]+', '-', path).strip('-')[:80] or 'root'
+
+
+def write_dump(directory, request, response, profile, queries):
+    """
+    Write ``<name>.sql`` (timings and captured SQL) and, if profiled, ``<name>.prof``.
+
+    Returns the path without extension; load the profile with ``pstats.Stats``.
+    """
+    os.makedirs(directory, exist_ok=True)
+    stamp = time.strftime('%Y%m%dT%H%M%S')
+    total = profile.durations.get('total', 0)
+    base = os.path.join(
+        directory, f'{stamp}-{os.getpid()}-{request.method}-{_slug(request.path)}-{total:.0f}ms'
+    )
+    if profile.profiler is not None:
+        profile.profiler.dump_stats(base + '.prof')
+    with open(base + '.sql', 'w') as file:
+        file.write(f'{request.method} {request.get_full_path()} -> {response.status_code}\n')
+        file.write(f'Server-Timing: {profile.server_timing()}\n\n')
+        for index, (alias, sql, duration) in enumerate(queries, start=1):
+            file.write(f'-- {index}. {alias} {duration * 1000:.2f} ms\n{sql};\n\n')
+    return base
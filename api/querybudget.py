@@ -0,0 +1,159 @@
+"""
+Query budgets: count the SQL an endpoint runs and fail when it grows.
+
+``QueryCounter`` records every statement on a connection through
+``connection.execute_wrapper``; use it with ``async with`` in async code. The helpers below turn it into assertions for
+tests, and ``api.middleware.QueryBudgetMiddleware`` reports the same numbers on
+each response while ``DEBUG`` is on.
+
+``assert_indexed`` checks how the statements run rather than how many: it
+asks SQLite for each ``SELECT``'s query plan and fails on full table scans
+and temporary sort B-trees.
+"""
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from asgiref.sync import sync_to_async
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class QueryCounter:
+    """
+    Record the SQL executed on one connection while used as a context manager.
+    """
+
+    def __init__(self, using=DEFAULT_DB_ALIAS):
+        self.using = using
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - start))
+
+    def __enter__(self):
+        self._wrapper = connections[self.using].execute_wrapper(self)
+        self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._wrapper.__exit__(*exc_info)
+
+    async def __aenter__(self):
+        # Connections are per thread, and async code runs its queries through
+        # sync_to_async on the thread-sensitive executor: wrap that connection,
+        # not the event loop's.
+        await sync_to_async(self.__enter__, thread_sensitive=True)()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await sync_to_async(self.__exit__, thread_sensitive=True)(*exc_info)
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def duration(self):
+        return sum(duration for _, duration in self.queries)
+
+    def duplicates(self, threshold=2):
+        """
+        Return ``{sql: times}`` for statements run at least ``threshold`` times.
+
+        Django passes parameters separately, so the same template repeated
+        once per row is the signature of an N+1 query.
+        """
+        counts = Counter(sql for sql, _ in self.queries)
+        return {sql: times for sql, times in counts.items() if times >= threshold}
+
+    def format(self):
+        return '\n'.join(f'{index}. {sql}' for index, (sql, _) in enumerate(self.queries, start=1))
+
+
+@contextmanager
+def query_budget(max_queries, using=DEFAULT_DB_ALIAS):
+    """
+    Fail with ``AssertionError`` if the block runs more than ``max_queries`` queries.
+    """
+    with QueryCounter(using) as counter:
+        yield counter
+    if counter.count > max_queries:
+        raise AssertionError(
+            f"{counter.count} queries executed, budget is {max_queries}:\n{counter.format()}"
+        )
+
+
+def assert_queries_do_not_scale(fetch, grow, using=DEFAULT_DB_ALIAS):
+    """
+    Fail if ``fetch()`` runs more queries after ``grow()`` adds rows to its result.
+
+    ``fetch`` should request a page that is not yet full, so growing the data
+    grows the page. Returns the ``(before, after)`` query counters.
+    """
+    with QueryCounter(using) as before:
+        fetch()
+    grow()
+    with QueryCounter(using) as after:
+        fetch()
+    if after.count > before.count:
+        raise AssertionError(
+            f"Query count grew from {before.count} to {after.count} with page size.\n"
+            f"Before:\n{before.format()}\nAfter:\n{after.format()}"
+        )
+    return before, after
+
+
+# Query plan lines for a full table scan (``SCAN t`` / ``SCAN TABLE t`` without
+# ``USING ... INDEX``) or an ORDER BY / GROUP BY that sorts rows in memory.
+_FULL_SCAN_RE = re.compile(r'^SCAN (TABLE )?\S+( AS \S+)?$')
+_TEMP_SORT_RE = re.compile(r'USE TEMP B-TREE')
+
+
+def explain(sql, params=(), using=DEFAULT_DB_ALIAS):
+    """
+    Return the ``EXPLAIN QUERY PLAN`` detail lines of a statement on SQLite.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        raise NotImplementedError("Query plans are only checked on SQLite.")
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def plan_problems(plan):
+    """
+    Return the lines of ``plan`` that scan a whole table or sort in a temp B-tree.
+    """
+    return [line for line in plan if _FULL_SCAN_RE.match(line) or _TEMP_SORT_RE.search(line)]
+
+
+@contextmanager
+def assert_indexed(using=DEFAULT_DB_ALIAS, allow=()):
+    """
+    Fail with ``AssertionError`` if a ``SELECT`` in the block is not index-driven.
+
+    ``allow`` lists plan line prefixes that are expected, e.g.
+    ``'USE TEMP B-TREE FOR ORDER BY'`` for a sort known to be bounded.
+    """
+    statements = []
+
+    def record(execute, sql, params, many, context):
+        if sql.lstrip().upper().startswith('SELECT'):
+            statements.append((sql, params))
+        return execute(sql, params, many, context)
+
+    with connections[using].execute_wrapper(record):
+        yield statements
+    failures = []
+    for sql, params in statements:
+        problems = [line for line in plan_problems(explain(sql, params, using)) if not line.startswith(tuple(allow))]
+        if problems:
+            failures.append(f"{sql}\n  " + '\n  '.join(problems))
+    if failures:
+        raise AssertionError("Statements not served by an index:\n" + '\n'.join(failures))
@@ -0,0 +1,211 @@
+"""
+Item-item recommendations from review ratings.
+
+``build`` loads every ``Review.rating`` into a sparse movie x user matrix,
+normalizes each movie's row, and multiplies blocks of rows against the
+whole matrix to get cosine similarities. Only one block of the similarity
+matrix exists at a time, so memory is bounded by the rating matrix plus
+``chunk_size`` rows of co-ratings. The top-K neighbours of each movie are
+stored as ``MovieSimilarity`` rows.
+
+An incremental build recomputes the movies whose ratings changed after
+their neighbours were last computed (``MovieRatingStats.ratings_changed_at``
+against ``neighbours_computed_at``), and the movies whose lists those
+changes can alter: every movie that lists a changed movie, and every movie
+a changed movie now scores above its weakest stored neighbour. Review
+writes queue ``refresh``, one keyed job that runs an incremental build, so
+bursts of reviews share one pass over the ratings. A full build recomputes
+everything.
+
+Reads never touch NumPy: ``similar_movies`` and ``recommended_movies``
+are single queries over the stored neighbours.
+"""
+from array import array
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, F, Min, Q, Sum
+from django.utils import timezone
+from scipy import sparse
+
+from . import jobs
+from .models import Movie, MovieRatingStats, MovieSimilarity, Review
+
+TOP_K = 20
+CHUNK_SIZE = 500
+READ_CHUNK_SIZE = 10000
+# Ratings above this lift a movie's neighbours in a user's recommendations;
+# ratings below it push them down.
+NEUTRAL_RATING = 3
+
+
+def load_ratings(chunk_size=READ_CHUNK_SIZE):
+    """
+    Return ``(user_ids, movie_ids, ratings)`` arrays for every review.
+    """
+    user_ids, movie_ids, ratings = array('q'), array('q'), array('f')
+    rows = Review.objects.order_by().values_list('user_id', 'movie_id', 'rating')
+    for user_id, movie_id, rating in rows.iterator(chunk_size=chunk_size):
+        user_ids.append(user_id)
+        movie_ids.append(movie_id)
+        ratings.append(rating)
+    return (
+        np.frombuffer(user_ids, dtype=np.int64),
+        np.frombuffer(movie_ids, dtype=np.int64),
+        np.frombuffer(ratings, dtype=np.float32),
+    )
+
+
+def build_item_matrix(user_ids, movie_ids, ratings):
+    """
+    Return ``(movie ids, matrix)``: one L2-normalized CSR row per movie.
+
+    Movie ids are sorted, so row ``i`` belongs to ``movie_ids[i]``.
+    """
+    users, user_index = np.unique(user_ids, return_inverse=True)
+    movies, movie_index = np.unique(movie_ids, return_inverse=True)
+    matrix = sparse.csr_matrix(
+        (ratings, (movie_index, user_index)), shape=(len(movies), len(users)), dtype=np.float32
+    )
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return movies, sparse.diags(1 / norms).dot(matrix).tocsr()
+
+
+def top_k_neighbours(matrix, matrix_t, rows, top_k):
+    """
+    Yield ``(row, neighbour rows, scores)`` for each row, best first.
+    """
+    block = matrix[rows].dot(matrix_t).tocsr()
+    for offset, row in enumerate(rows):
+        start, end = block.indptr[offset], block.indptr[offset + 1]
+        columns, scores = block.indices[start:end], block.data[start:end]
+        keep = (columns != row) & (scores > 0)
+        columns, scores = columns[keep], scores[keep]
+        if len(scores) > top_k:
+            best = np.argpartition(-scores, top_k)[:top_k]
+            columns, scores = columns[best], scores[best]
+        order = np.argsort(-scores, kind='stable')
+        yield row, columns[order], scores[order]
+
+
+def stale_movie_ids():
+    """
+    Return the ids of movies whose ratings changed since their neighbours were computed.
+    """
+    return set(
+        MovieRatingStats.objects.filter(ratings_changed_at__isnull=False)
+        .filter(Q(neighbours_computed_at__isnull=True) | Q(ratings_changed_at__gt=F('neighbours_computed_at')))
+        .values_list('movie_id', flat=True)
+    )
+
+
+def affected_rows(movies, matrix, matrix_t, stale_ids, top_k, chunk_size=CHUNK_SIZE):
+    """
+    Return the rows whose top-K lists a change to the ``stale_ids`` movies can alter.
+
+    Those are the stale movies themselves, the movies that list one of them,
+    and the movies a stale movie now scores above the weakest neighbour they
+    keep (or that keep fewer than ``top_k``).
+    """
+    stale_rows = np.flatnonzero(np.isin(movies, list(stale_ids)))
+    listing = MovieSimilarity.objects.filter(similar_movie_id__in=stale_ids).values_list('movie_id', flat=True)
+    rows = set(stale_rows.tolist())
+    rows.update(np.flatnonzero(np.isin(movies, list(listing))).tolist())
+
+    best = np.zeros(len(movies), dtype=np.float32)
+    for start in range(0, len(stale_rows), chunk_size):
+        block = matrix[stale_rows[start:start + chunk_size]].dot(matrix_t)
+        best = np.maximum(best, block.max(axis=0).toarray().ravel())
+    kept = {
+        movie_id: (count, floor)
+        for movie_id, count, floor in MovieSimilarity.objects.order_by().values('movie_id')
+        .annotate(count=Count('*'), floor=Min('score')).values_list('movie_id', 'count', 'floor')
+    }
+    for row in np.flatnonzero(best > 0).tolist():
+        count, floor = kept.get(int(movies[row]), (0, 0))
+        if count < top_k or best[row] > floor:
+            rows.add(row)
+    return np.array(sorted(rows), dtype=np.int64)
+
+
+def build(full=False, top_k=TOP_K, chunk_size=CHUNK_SIZE):
+    """
+    Recompute stored neighbours and return the number of movies refreshed.
+    """
+    # Taken before reading, so ratings changed during the build stay stale.
+    computed_at = timezone.now()
+    stale_ids = None if full else stale_movie_ids()
+    if stale_ids is not None and not stale_ids:
+        return 0
+    movies, matrix = build_item_matrix(*load_ratings())
+    matrix_t = matrix.T.tocsr()
+    if full:
+        rows = np.arange(len(movies))
+    else:
+        rows = affected_rows(movies, matrix, matrix_t, stale_ids, top_k, chunk_size)
+
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        neighbours = [
+            MovieSimilarity(
+                movie_id=int(movies[row]),
+                similar_movie_id=int(movies[column]),
+                score=float(score),
+                computed_at=computed_at,
+            )
+            for row, columns, scores in top_k_neighbours(matrix, matrix_t, chunk, top_k)
+            for column, score in zip(columns, scores)
+        ]
+        with transaction.atomic():
+            MovieSimilarity.objects.filter(movie_id__in=movies[chunk].tolist()).delete()
+            MovieSimilarity.objects.bulk_create(neighbours, batch_size=1000)
+    with transaction.atomic():
+        if full:
+            # Movies that lost all their reviews keep no neighbours.
+            MovieSimilarity.objects.filter(computed_at__lt=computed_at).delete()
+            MovieRatingStats.objects.update(neighbours_computed_at=computed_at)
+        else:
+            MovieSimilarity.objects.filter(movie_id__in=stale_ids, computed_at__lt=computed_at).delete()
+            MovieRatingStats.objects.filter(movie_id__in=stale_ids).update(neighbours_computed_at=computed_at)
+    return len(rows)
+
+
+@jobs.task(key='stale', atomic=False)
+def refresh():
+    """
+    Run an incremental ``build``; queued whenever a review's rating is written or removed.
+    """
+    build()
+
+
+def similar_movies(movie_id, limit=TOP_K):
+    """
+    Return the stored neighbours of a movie, most similar first, annotated with ``score``.
+    """
+    return (
+        Movie.objects.select_related('rating_stats')
+        .filter(neighbour_of__movie_id=movie_id)
+        .annotate(score=F('neighbour_of__score'))
+        .order_by('-score', 'pk')[:limit]
+    )
+
+
+def recommended_movies(user, limit=TOP_K):
+    """
+    Blend the neighbours of every movie ``user`` reviewed into one ranking.
+
+    Each neighbour scores the sum of its similarity to the user's reviewed
+    movies weighted by how far each rating is from ``NEUTRAL_RATING``.
+    Movies the user already reviewed are left out.
+    """
+    return (
+        Movie.objects.select_related('rating_stats')
+        .filter(neighbour_of__movie__reviews__user=user)
+        .exclude(reviews__user=user)
+        .annotate(score=Sum(
+            F('neighbour_of__score') * (F('neighbour_of__movie__reviews__rating') - NEUTRAL_RATING)
+        ))
+        .filter(score__gt=0)
+        .order_by('-score', 'pk')[:limit]
+    )
@@ -0,0 +1,205 @@
+"""
+Read replicas: route safe requests' reads away from the primary.
+
+``ReplicaRouter`` sends every write to ``default``. Reads go to a replica
+only while ``ReplicaRoutingMiddleware`` has allowed it for the current
+request, which it does for GET, HEAD and OPTIONS requests; management
+commands, signal receivers run by writes and reads inside a transaction
+all stay on the primary.
+
+Replicas trail the primary, so after a client's successful write its
+reads are pinned to the primary for ``PIN_SECONDS``, which is how a new
+like or review shows up on the very next request. Pins are kept in a
+Django cache keyed by the JWT's user id (or the session cookie); use a
+shared cache when running several processes. Replicas lagging more than
+``MAX_LAG_SECONDS`` behind are skipped until they catch up.
+
+For local testing, list extra SQLite files in ``DATABASE_REPLICAS`` and
+copy the primary into them with ``manage.py sync_replicas``.
+"""
+import os
+import random
+import sqlite3
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from rest_framework_simplejwt.authentication import AUTH_HEADER_TYPE_BYTES
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+DEFAULT_SETTINGS = {
+    # Replica aliases; None means every alias in DATABASES but 'default'.
+    'REPLICAS': None,
+    # Seconds a client's reads stay on the primary after it writes.
+    'PIN_SECONDS': 5,
+    # Replicas further behind than this are not read from.
+    'MAX_LAG_SECONDS': 10,
+    # Seconds a measured lag is reused before measuring again.
+    'LAG_CHECK_INTERVAL': 1,
+    'CACHE_ALIAS': 'default',
+}
+
+PIN_KEY_PREFIX = 'replica-pin:'
+
+_replica_reads = ContextVar('replica_reads', default=False)
+_lags = {}
+
+
+def get_settings():
+    return {**DEFAULT_SETTINGS, **getattr(settings, 'REPLICA_ROUTING', {})}
+
+
+def get_replicas():
+    replicas = get_settings()['REPLICAS']
+    if replicas is None:
+        replicas = [alias for alias in settings.DATABASES if alias != DEFAULT_DB_ALIAS]
+    return list(replicas)
+
+
+def allow_replica_reads(allowed):
+    """
+    Allow or forbid replica reads in the current context; returns a reset token.
+    """
+    return _replica_reads.set(allowed)
+
+
+def reset_replica_reads(token):
+    _replica_reads.reset(token)
+
+
+def client_key(request):
+    """
+    Identify the client behind ``request`` without touching the database.
+    """
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    scheme, _, raw_token = header.partition(' ')
+    if scheme.encode() in AUTH_HEADER_TYPE_BYTES and raw_token:
+        try:
+            return f'user:{AccessToken(raw_token)[jwt_settings.USER_ID_CLAIM]}'
+        except (TokenError, KeyError):
+            return None
+    session_key = request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    return f'session:{session_key}' if session_key else None
+
+
+def pin(key):
+    """
+    Keep ``key``'s reads on the primary for ``PIN_SECONDS``.
+    """
+    config = get_settings()
+    if key is not None and config['PIN_SECONDS'] > 0:
+        caches[config['CACHE_ALIAS']].set(PIN_KEY_PREFIX + key, True, config['PIN_SECONDS'])
+
+
+def is_pinned(key):
+    return key is not None and bool(caches[get_settings()['CACHE_ALIAS']].get(PIN_KEY_PREFIX + key))
+
+
+def _sqlite_mtime(path):
+    # With WAL, commits land in the -wal file until a checkpoint.
+    return max((os.path.getmtime(name) for name in (path, f'{path}-wal') if os.path.exists(name)), default=0)
+
+
+def measure_lag(alias):
+    """
+    Return how many seconds ``alias`` trails the primary, or None if unknown.
+
+    SQLite replicas are file copies: one older than the primary's last
+    write is behind by its age. PostgreSQL standbys report the age of
+    the last replayed transaction. Other backends are assumed current.
+    """
+    connection = connections[alias]
+    if connection.vendor == 'sqlite':
+        replica = _sqlite_mtime(connection.settings_dict['NAME'])
+        primary = _sqlite_mtime(connections[DEFAULT_DB_ALIAS].settings_dict['NAME'])
+        return 0.0 if replica >= primary else time.time() - replica
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+                "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+            )
+            lag = cursor.fetchone()[0]
+        return None if lag is None else float(lag)
+    return 0.0
+
+
+def get_lag(alias):
+    """
+    Return ``measure_lag(alias)``, remeasured at most every ``LAG_CHECK_INTERVAL`` seconds.
+    """
+    now = time.monotonic()
+    checked_at, lag = _lags.get(alias, (None, None))
+    if checked_at is None or now - checked_at >= get_settings()['LAG_CHECK_INTERVAL']:
+        try:
+            lag = measure_lag(alias)
+        except (OSError, DatabaseError):
+            lag = None
+        _lags[alias] = (now, lag)
+    return lag
+
+
+def choose_replica():
+    """
+    Return a random replica within ``MAX_LAG_SECONDS`` of the primary, or None.
+    """
+    max_lag = get_settings()['MAX_LAG_SECONDS']
+    candidates = []
+    for alias in get_replicas():
+        lag = get_lag(alias)
+        if lag is not None and lag <= max_lag:
+            candidates.append(alias)
+    return random.choice(candidates) if candidates else None
+
+
+class ReplicaRouter:
+    """
+    Writes to the primary; reads to a current replica when the request allows it.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not _replica_reads.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return choose_replica() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema from the primary.
+        return False if db in get_replicas() else None
+
+
+def configure_connection(connection):
+    """
+    Apply the alias's ``PRAGMAS`` to a new SQLite connection.
+    """
+    pragmas = connection.settings_dict.get('PRAGMAS')
+    if connection.vendor != 'sqlite' or not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def copy_sqlite(source, target):
+    """
+    Copy the SQLite database ``source`` over ``target`` with the online backup API.
+
+    Open connections to ``target`` see the new contents on their next read.
+    """
+    with sqlite3.connect(source) as primary, sqlite3.connect(target) as replica:
+        replica.execute('PRAGMA busy_timeout = 5000')
+        primary.backup(replica)
+    primary.close()
+    replica.close()
+    # The backup may leave the file's mtime untouched if no page changed.
+    os.utime(target)
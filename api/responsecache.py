@@ -0,0 +1,202 @@
+"""
+Versioned read-through cache for catalog responses.
+
+Every cached response is keyed by its URL, query parameters, negotiated media
+type and the current version of each resource it depends on (e.g. ``movies``
+for the movie list, ``movie:<id>`` for one movie and ``movie:<id>:reviews``
+for its reviews). Writes never delete cache entries; the receivers in
+``api/signals.py`` bump the affected versions instead, so stale entries
+simply stop being addressed.
+
+Some dependencies are only known from the response itself: a movie list
+page shows the rating aggregates of the movies on it, and a review list
+nests its authors. Their versions (``movie:<id>``, ``user:<id>``) are
+stored with the entry and checked on every hit, so a new review or a
+renamed user invalidates only the pages showing them. A write committed
+while a missed page is being rendered can leave that page stale until
+``TIMEOUT``.
+
+The key and the stored versions make a strong ETag: a request whose
+``If-None-Match`` matches gets a 304 before the ORM or any serializer runs.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+DEFAULT_SETTINGS = {
+    'ALIAS': 'default',
+    'TIMEOUT': 300,
+    'ENABLED': True,
+}
+
+VERSION_KEY_PREFIX = 'response-cache:version:'
+RESPONSE_KEY_PREFIX = 'response-cache:entry:'
+
+
+def get_settings():
+    return {**DEFAULT_SETTINGS, **getattr(settings, 'RESPONSE_CACHE', {})}
+
+
+def get_cache():
+    return caches[get_settings()['ALIAS']]
+
+
+def get_versions(resources):
+    """
+    Return the current version of each resource, initializing missing ones.
+
+    Versions start at the current time in milliseconds, so a version evicted
+    from the cache never comes back with a value that was already used.
+    """
+    cache = get_cache()
+    keys = [VERSION_KEY_PREFIX + resource for resource in resources]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, int(time.time() * 1000), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def _bump(resources):
+    cache = get_cache()
+    for resource in resources:
+        key = VERSION_KEY_PREFIX + resource
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, int(time.time() * 1000), timeout=None)
+
+
+def bump(*resources):
+    """
+    Invalidate every cached response depending on ``resources``.
+
+    Bumps immediately and again on commit, so responses cached from
+    uncommitted reads during the transaction are discarded as well.
+    """
+    if not resources:
+        return
+    _bump(resources)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: _bump(resources))
+
+
+def _build_key(request, resources):
+    versions = get_versions(resources)
+    media_type = getattr(request, 'accepted_media_type', '')
+    query = sorted(request.query_params.lists())
+    raw = repr((request.path, query, media_type, list(zip(resources, versions))))
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def _build_etag(digest, members, versions):
+    if not members:
+        return f'"{digest}"'
+    raw = repr((digest, list(zip(members, versions))))
+    return f'"{hashlib.sha256(raw.encode("utf-8")).hexdigest()}"'
+
+
+def cached_response(resources, members=None):
+    """
+    Cache the data of successful GET responses for a viewset method.
+
+    ``resources`` is a callable receiving ``(view, request, *args, **kwargs)``
+    and returning the names of the resource versions the response depends on.
+    ``members``, if given, receives ``(view, request, data)`` after a miss and
+    returns the resources read from the response data, or None when the
+    response cannot be cached.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            config = get_settings()
+            if not config['ENABLED'] or request.method not in ('GET', 'HEAD'):
+                return method(self, request, *args, **kwargs)
+
+            digest = _build_key(request, resources(self, request, *args, **kwargs))
+            cache = get_cache()
+            entry = cache.get(RESPONSE_KEY_PREFIX + digest)
+            if entry is not None and get_versions(entry[1]) != entry[2]:
+                entry = None
+            if entry is not None:
+                data, member_resources, member_versions = entry
+                etag = _build_etag(digest, member_resources, member_versions)
+            elif members is None:
+                # Known without the entry, so a 304 survives its eviction.
+                etag = _build_etag(digest, [], [])
+            else:
+                etag = None
+            if etag is not None and etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+            if entry is not None:
+                response = Response(data)
+            else:
+                response = method(self, request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                member_resources = members(self, request, response.data) if members else []
+                if member_resources is None:
+                    return response
+                member_versions = get_versions(member_resources)
+                cache.set(
+                    RESPONSE_KEY_PREFIX + digest,
+                    (response.data, member_resources, member_versions),
+                    config['TIMEOUT'],
+                )
+                etag = _build_etag(digest, member_resources, member_versions)
+            response['ETag'] = etag
+            return response
+        return wrapper
+    return decorator
+
+
+def _results(data):
+    return data['results'] if isinstance(data, dict) else data
+
+
+def movie_list_resources(view, request, *args, **kwargs):
+    params = request.query_params
+    # Rating filters and orderings pick a page by the ratings of every movie.
+    if params.get('min_rating') or params.get('min_reviews') or params.get('ordering'):
+        return ['movies', 'ratings']
+    return ['movies']
+
+
+def movie_list_members(view, request, data):
+    # Each movie listed with its rating aggregate.
+    resources = []
+    for movie in _results(data):
+        if 'average_rating' in movie or 'review_count' in movie:
+            if 'id' not in movie:
+                return None
+            resources.append(f'movie:{movie["id"]}')
+    return resources
+
+
+def movie_detail_resources(view, request, pk=None, *args, **kwargs):
+    return [f'movie:{pk}']
+
+
+def movie_reviews_resources(view, request, pk=None, *args, **kwargs):
+    return [f'movie:{pk}', f'movie:{pk}:reviews']
+
+
+def review_list_members(view, request, data):
+    # Reviews nest their authors.
+    resources = set()
+    for review in _results(data):
+        user = review.get('user')
+        if user:
+            if 'id' not in user:
+                return None
+            resources.add(f'user:{user["id"]}')
+    return sorted(resources)
@@ -0,0 +1,239 @@
+"""
+Full-text search over movies and reviews.
+
+On SQLite the index is an FTS5 external-content table per model, kept in sync
+by triggers on the base tables so that every insert, update and delete is
+covered, including ``bulk_create`` and queryset updates that bypass signals.
+Queries are ranked with ``bm25`` and can return highlighted snippets. Genre and
+release year filters are applied in the same statement as the ``MATCH``.
+
+The indexes are created by migration ``0013_search_index``; ``install`` creates
+them where migrations did not run, such as test databases.
+
+On other backends ``is_available`` is False and callers fall back to plain
+ORM filtering.
+"""
+import html
+import re
+from collections import namedtuple
+
+from django.db import connections
+from django.db.models import Case, CharField, IntegerField, Value, When
+
+MOVIE_INDEX = 'api_movie_fts'
+REVIEW_INDEX = 'api_review_fts'
+HIGHLIGHT_START = '<mark>'
+HIGHLIGHT_END = '</mark>'
+# Control characters FTS5 wraps matches in, swapped for the tags only after
+# the snippet is escaped so indexed text cannot inject markup.
+_START_SENTINEL = '\x02'
+_END_SENTINEL = '\x03'
+MAX_RESULTS = 200
+
+SearchHit = namedtuple('SearchHit', ['id', 'rank', 'snippet'])
+
+
+class SearchResults(list):
+    """
+    Hits in rank order; ``truncated`` is True if more rows matched than the limit.
+    """
+
+    def __init__(self, hits=(), truncated=False):
+        super().__init__(hits)
+        self.truncated = truncated
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+_INDEXES = {
+    # index table: (content table, indexed columns)
+    MOVIE_INDEX: ('api_movie', ('title', 'description')),
+    REVIEW_INDEX: ('api_review', ('text',)),
+}
+
+
+def _index_sql(index, table, columns):
+    column_list = ', '.join(columns)
+    new_values = ', '.join(f'new.{column}' for column in columns)
+    old_values = ', '.join(f'old.{column}' for column in columns)
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {index} USING fts5("
+        f"{column_list}, content='{table}', content_rowid='id', "
+        f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+        f"CREATE TRIGGER IF NOT EXISTS {index}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {index}(rowid, {column_list}) VALUES (new.id, {new_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {index}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {index}({index}, rowid, {column_list}) VALUES ('delete', old.id, {old_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {index}_au AFTER UPDATE OF {column_list} ON {table} BEGIN "
+        f"INSERT INTO {index}({index}, rowid, {column_list}) VALUES ('delete', old.id, {old_values}); "
+        f"INSERT INTO {index}(rowid, {column_list}) VALUES (new.id, {new_values}); END",
+        f"INSERT INTO {index}({index}) VALUES ('rebuild')",
+    ]
+
+
+def install(using='default'):
+    """
+    Create any missing FTS5 indexes and their sync triggers, then populate them.
+
+    Migrations do this; call it for databases created without them. Safe to
+    call repeatedly; existing indexes are left untouched.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        existing = set(connection.introspection.table_names(cursor))
+        for index, (table, columns) in _INDEXES.items():
+            if index in existing or table not in existing:
+                continue
+            for statement in _index_sql(index, table, columns):
+                cursor.execute(statement)
+
+
+def rebuild(using='default'):
+    """
+    Repopulate every FTS5 index from its content table.
+    """
+    install(using)
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for index in _INDEXES:
+            cursor.execute(f"INSERT INTO {index}({index}) VALUES ('rebuild')")
+
+
+def is_available(using='default'):
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name IN (%s, %s)",
+            [MOVIE_INDEX, REVIEW_INDEX],
+        )
+        return cursor.fetchone()[0] == len(_INDEXES)
+
+
+def build_match(query, prefix=False, column=None):
+    """
+    Turn free text into a safe FTS5 query, or return None if it has no terms.
+
+    Every word is quoted so user input cannot inject FTS5 syntax. With
+    ``prefix=True`` the last word also matches longer words, for autocomplete.
+    """
+    terms = _TOKEN_RE.findall(query or '')
+    if not terms:
+        return None
+    phrases = ['"%s"' % term for term in terms]
+    if prefix:
+        phrases[-1] += '*'
+    expression = ' '.join(phrases)
+    if column:
+        expression = f'{column} : ({expression})'
+    return expression
+
+
+def highlight(snippet):
+    """
+    HTML-escape an FTS5 snippet, then mark its matches with ``<mark>`` tags.
+    """
+    return (
+        html.escape(snippet)
+        .replace(_START_SENTINEL, HIGHLIGHT_START)
+        .replace(_END_SENTINEL, HIGHLIGHT_END)
+    )
+
+
+def _search(sql, params, limit, using):
+    if limit is None:
+        limit = MAX_RESULTS
+    # One extra row tells whether the results were cut off at the limit.
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'{sql} LIMIT %s', [*params, limit + 1])
+        rows = cursor.fetchall()
+    return SearchResults(
+        [SearchHit(pk, rank, highlight(snippet)) for pk, rank, snippet in rows[:limit]],
+        truncated=len(rows) > limit,
+    )
+
+
+def search_movies(query='', title='', genre=None, release_year=None, limit=None,
+                  using='default'):
+    """
+    Return movie hits as ``SearchResults``, best match first.
+
+    ``query`` is matched against title and description, with title matches
+    weighing ten times as much. ``title`` is matched against the title only
+    and its last word as a prefix, for autocomplete. Both must match when
+    both are given. ``limit`` defaults to ``MAX_RESULTS``.
+    """
+    expressions = [
+        expression for expression in (
+            build_match(query),
+            build_match(title, prefix=True, column='title'),
+        )
+        if expression is not None
+    ]
+    if not expressions:
+        return SearchResults()
+    match = ' AND '.join(f'({expression})' for expression in expressions)
+    sql = [
+        f"SELECT m.id, bm25({MOVIE_INDEX}, 10.0, 1.0) AS rank, "
+        f"snippet({MOVIE_INDEX}, -1, %s, %s, '…', 16) "
+        f"FROM {MOVIE_INDEX} JOIN api_movie m ON m.id = {MOVIE_INDEX}.rowid "
+        f"WHERE {MOVIE_INDEX} MATCH %s"
+    ]
+    params = [_START_SENTINEL, _END_SENTINEL, match]
+    if genre:
+        sql.append("AND m.genre = %s")
+        params.append(genre)
+    if release_year is not None:
+        sql.append("AND m.release_year = %s")
+        params.append(release_year)
+    sql.append("ORDER BY rank")
+    return _search(' '.join(sql), params, limit, using)
+
+
+def search_reviews(query, movie_id=None, prefix=False, limit=None, using='default'):
+    """
+    Return review hits for ``query`` as ``SearchResults``, best match first.
+
+    ``limit`` defaults to ``MAX_RESULTS``.
+    """
+    match = build_match(query, prefix=prefix)
+    if match is None:
+        return SearchResults()
+    sql = [
+        f"SELECT r.id, bm25({REVIEW_INDEX}) AS rank, "
+        f"snippet({REVIEW_INDEX}, 0, %s, %s, '…', 24) "
+        f"FROM {REVIEW_INDEX} JOIN api_review r ON r.id = {REVIEW_INDEX}.rowid "
+        f"WHERE {REVIEW_INDEX} MATCH %s"
+    ]
+    params = [_START_SENTINEL, _END_SENTINEL, match]
+    if movie_id is not None:
+        sql.append("AND r.movie_id = %s")
+        params.append(movie_id)
+    sql.append("ORDER BY rank")
+    return _search(' '.join(sql), params, limit, using)
+
+
+def apply_hits(queryset, hits):
+    """
+    Restrict ``queryset`` to ``hits`` in rank order, annotating ``search_snippet``.
+    """
+    if not hits:
+        return queryset.none()
+    return (
+        queryset.filter(pk__in=[hit.id for hit in hits])
+        .annotate(
+            search_position=Case(
+                *[When(pk=hit.id, then=Value(position)) for position, hit in enumerate(hits)],
+                output_field=IntegerField(),
+            ),
+            search_snippet=Case(
+                *[When(pk=hit.id, then=Value(hit.snippet)) for hit in hits],
+                output_field=CharField(),
+            ),
+        )
+        .order_by('search_position')
+    )
@@ -1,76 +1,146 @@
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
 from rest_framework import serializers
 from django.contrib.auth.models import User
 from .models import UserProfile, Movie, Review, Comment, Like
+from .fieldsets import SparseFieldsMixin
+from .profiling import TimedSerializerMixin
+from . import thumbnails
 
-class UserSerializer(serializers.ModelSerializer):
+class AvatarFieldMixin:
+    """
+    Render ``avatar``, the profile picture's variant URLs; see api/thumbnails.py.
+    """
+    
+    def get_avatar_from_values(self, name, variants):
+        return thumbnails.avatar_urls(name, variants, self.context.get('request'))
+
+class UserSerializer(AvatarFieldMixin, SparseFieldsMixin, TimedSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for the User model.
     """
+    avatar = serializers.SerializerMethodField()
+    
     class Meta:
         model = User
-        fields = ['id', 'username', 'email', 'first_name', 'last_name']
+        fields = ['id', 'username', 'email', 'first_name', 'last_name', 'avatar']
         # TODO: Implement proper user serialization with password handling
+        field_sources = {'avatar': ['profile__profile_picture', 'profile__profile_picture_variants']}
+    
+    def get_avatar(self, obj):
+        try:
+            profile = obj.profile
+        except ObjectDoesNotExist:
+            return None
+        return self.get_avatar_from_values(profile.profile_picture.name, profile.profile_picture_variants)
 
-class UserProfileSerializer(serializers.ModelSerializer):
+class UserProfileSerializer(AvatarFieldMixin, SparseFieldsMixin, TimedSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for the UserProfile model.
     """
     user = UserSerializer(read_only=True)
-    follower_count = serializers.SerializerMethodField()
-    following_count = serializers.SerializerMethodField()
+    avatar = serializers.SerializerMethodField()
+    # Why a profile was suggested, only present on follow suggestions.
+    mutual_count = serializers.IntegerField(read_only=True)
+    co_reviewed_count = serializers.IntegerField(read_only=True)
     
     class Meta:
         model = UserProfile
-        fields = ['id', 'user', 'bio', 'profile_picture', 'follower_count', 'following_count']
+        fields = ['id', 'user', 'bio', 'profile_picture', 'avatar', 'follower_count', 'following_count',
+                  'review_count', 'mutual_count', 'co_reviewed_count']
+        # Counts are stored columns maintained by api/counters.py.
+        read_only_fields = ['follower_count', 'following_count', 'review_count']
+        field_sources = {'avatar': ['profile_picture', 'profile_picture_variants']}
     
-    def get_follower_count(self, obj):
-        # TODO: Implement method to get follower count
-        return 0
-    
-    def get_following_count(self, obj):
-        # TODO: Implement method to get following count
-        return 0
+    def get_avatar(self, obj):
+        return self.get_avatar_from_values(obj.profile_picture.name, obj.profile_picture_variants)
     
     # TODO: Add additional methods for handling follow/unfollow actions
 
-class MovieSerializer(serializers.ModelSerializer):
+class MovieSerializer(SparseFieldsMixin, TimedSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for the Movie model.
     """
     average_rating = serializers.SerializerMethodField()
+    review_count = serializers.SerializerMethodField()
+    # Highlighted match, only present on full-text search results.
+    search_snippet = serializers.CharField(read_only=True)
+    # Similarity or recommendation strength, only present on recommendations.
+    score = serializers.FloatField(read_only=True)
     
     class Meta:
         model = Movie
         fields = ['id', 'title', 'genre', 'release_year', 'description', 
-                  'poster_url', 'created_at', 'average_rating']
+                  'poster_url', 'created_at', 'average_rating', 'review_count', 'search_snippet', 'score']
+        # Columns read by the method fields; see api/fieldsets.py.
+        field_sources = {
+            'average_rating': ['rating_stats__average_rating'],
+            'review_count': ['rating_stats__rating_count'],
+        }
     
     def get_average_rating(self, obj):
-        # TODO: Implement method to calculate average rating
-        return 0
+        # Read from MovieRatingStats; select_related('rating_stats') avoids a query per movie.
+        return round(obj.get_average_rating(), 2)
+    
+    def get_review_count(self, obj):
+        return obj.get_review_count()
+    
+    # Compiled list path (api/fastserializers.py): the field_sources values,
+    # None when the movie has no stats row yet.
+    def get_average_rating_from_values(self, average_rating):
+        return round(average_rating if average_rating is not None else 0, 2)
+    
+    def get_review_count_from_values(self, review_count):
+        return review_count if review_count is not None else 0
+
+class MovieDetailSerializer(MovieSerializer):
+    """
+    Movie serializer for detail views, adding the 1-5 rating histogram.
+    """
+    rating_histogram = serializers.SerializerMethodField()
+    
+    class Meta(MovieSerializer.Meta):
+        fields = MovieSerializer.Meta.fields + ['rating_histogram']
+        field_sources = {
+            **MovieSerializer.Meta.field_sources,
+            'rating_histogram': [f'rating_stats__rating_{rating}_count' for rating in range(1, 6)],
+        }
+    
+    def get_rating_histogram(self, obj):
+        return {str(rating): count for rating, count in obj.get_rating_histogram().items()}
 
-class ReviewSerializer(serializers.ModelSerializer):
+class ReviewSerializer(SparseFieldsMixin, TimedSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for the Review model.
     """
     user = UserSerializer(read_only=True)
-    likes_count = serializers.SerializerMethodField()
+    # Highlighted match, only present on full-text search results.
+    search_snippet = serializers.CharField(read_only=True)
     
     class Meta:
         model = Review
-        fields = ['id', 'movie', 'user', 'text', 'rating', 'timestamp', 'likes_count']
-        read_only_fields = ['user']
+        fields = ['id', 'movie', 'user', 'text', 'rating', 'timestamp', 'likes_count',
+                  'comments_count', 'search_snippet']
+        read_only_fields = ['user', 'likes_count', 'comments_count']
+        # ?expand=movie nests the movie instead of its id; see api/fieldsets.py.
+        expandable_fields = {'movie': MovieSerializer}
     
-    def get_likes_count(self, obj):
-        # TODO: Implement method to get likes count
-        return 0
+    def validate(self, attrs):
+        # ``user`` is read-only, so DRF adds no UniqueTogetherValidator for (movie, user).
+        movie = attrs.get('movie', getattr(self.instance, 'movie', None))
+        user = self.instance.user if self.instance is not None else self.context['request'].user
+        reviews = Review.objects.filter(movie=movie, user=user)
+        if self.instance is not None:
+            reviews = reviews.exclude(pk=self.instance.pk)
+        if movie is not None and reviews.exists():
+            raise serializers.ValidationError("You have already reviewed this movie.")
+        return attrs
     
     def create(self, validated_data):
-        # TODO: Implement proper creation logic with current user
-        pass
-    
-    # TODO: Add validation to check if user has already reviewed this movie
+        validated_data.setdefault('user', self.context['request'].user)
+        return super().create(validated_data)
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(SparseFieldsMixin, TimedSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for the Comment model.
     """
@@ -80,12 +150,13 @@ class CommentSerializer(serializers.ModelSerializer):
         model = Comment
         fields = ['id', 'review', 'author', 'text', 'timestamp']
         read_only_fields = ['author']
+        expandable_fields = {'review': ReviewSerializer}
     
     def create(self, validated_data):
-        # TODO: Implement proper creation logic with current user
-        pass
+        validated_data.setdefault('author', self.context['request'].user)
+        return super().create(validated_data)
 
-class LikeSerializer(serializers.ModelSerializer):
+class LikeSerializer(SparseFieldsMixin, TimedSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for the Like model.
     """
@@ -95,9 +166,33 @@ class LikeSerializer(serializers.ModelSerializer):
         model = Like
         fields = ['id', 'user', 'review', 'timestamp']
         read_only_fields = ['user']
+        expandable_fields = {'review': ReviewSerializer}
+    
+    def validate(self, attrs):
+        # As on ReviewSerializer: ``user`` is read-only, so (user, review) is checked here.
+        review = attrs.get('review', getattr(self.instance, 'review', None))
+        user = self.instance.user if self.instance is not None else self.context['request'].user
+        likes = Like.objects.filter(user=user, review=review)
+        if self.instance is not None:
+            likes = likes.exclude(pk=self.instance.pk)
+        if review is not None and likes.exists():
+            raise serializers.ValidationError("You have already liked this review.")
+        return attrs
     
     def create(self, validated_data):
-        # TODO: Implement proper creation logic with current user
-        pass
+        validated_data.setdefault('user', self.context['request'].user)
+        return super().create(validated_data)
+
+
+class BatchIdsSerializer(serializers.Serializer):
+    """
+    Validates the ``ids`` list posted to the batch action endpoints.
+    """
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False)
     
-    # TODO: Add validation to check if user has already liked this review 
\ No newline at end of file
+    def validate_ids(self, value):
+        max_items = getattr(settings, 'BATCH_ACTION_MAX_ITEMS', 100)
+        if len(value) > max_items:
+            raise serializers.ValidationError(f"At most {max_items} ids can be sent in one batch.")
+        # Drop repeats but keep the client's order for the per-item results.
+        return list(dict.fromkeys(value))
@@ -1,7 +1,39 @@
-from django.db.models.signals import post_save
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.backends.signals import connection_created
+from django.db.models import F
+from django.db.models.signals import pre_save, post_save, post_delete, pre_delete, m2m_changed
 from django.dispatch import receiver
 from django.contrib.auth.models import User
-from .models import UserProfile
+from .models import UserProfile, Movie, MovieRatingStats, Review, Comment, Like
+from .serializers import UserSerializer
+from . import authentication, counters, recommendations, replicas, responsecache, thumbnails, timelines, trending
+
+# Models whose per-row receivers below are skipped; see muted().
+_muted_models = ContextVar('muted_models', default=frozenset())
+
+# User columns nested in cached review lists; the avatar is read from the profile.
+NESTED_USER_FIELDS = frozenset(UserSerializer.Meta.fields) - {'id', 'avatar'}
+
+@contextmanager
+def muted(*models):
+    """
+    Skip the counter, activity and cache receivers for ``models`` inside the
+    block, for callers that do their work once for many rows.
+    """
+    token = _muted_models.set(_muted_models.get() | frozenset(models))
+    try:
+        yield
+    finally:
+        _muted_models.reset(token)
+
+@receiver(connection_created)
+def configure_connection(sender, connection, **kwargs):
+    """
+    Apply per-alias connection settings such as SQLite pragmas.
+    """
+    replicas.configure_connection(connection)
 
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
@@ -11,4 +43,221 @@ def create_user_profile(sender, instance, created, **kwargs):
     if created:
         UserProfile.objects.create(user=instance)
 
-# TODO: Add any additional signals needed for the application 
\ No newline at end of file
+@receiver(post_save, sender=User)
+def invalidate_user_responses(sender, instance, created, update_fields, **kwargs):
+    """
+    Cached review lists nest user details; new users appear in none yet, and
+    saves of other columns (e.g. ``last_login`` on every login) change none.
+    """
+    if created or (update_fields is not None and not NESTED_USER_FIELDS.intersection(update_fields)):
+        return
+    responsecache.bump(f'user:{instance.pk}')
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    """
+    Drop the user from the authentication cache after any change, including
+    deactivation and password changes.
+    """
+    authentication.user_cache.invalidate(instance.pk)
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def invalidate_cached_profile(sender, instance, **kwargs):
+    authentication.user_cache.invalidate(instance.user_id)
+
+@receiver(pre_save, sender=UserProfile)
+def remember_profile_picture(sender, instance, **kwargs):
+    """
+    Note whether the picture is being replaced, dropping the old picture's variants.
+    """
+    previous = None
+    if not instance._state.adding:
+        previous = UserProfile.objects.filter(pk=instance.pk).values_list('profile_picture', flat=True).first()
+    current = instance.profile_picture
+    # An uncommitted file is a new upload, even under a name already stored.
+    instance._picture_changed = (current.name or None) != (previous or None) or (current and not current._committed)
+    if instance._picture_changed:
+        instance.profile_picture_variants = []
+
+@receiver(post_save, sender=UserProfile)
+def build_profile_picture_variants(sender, instance, **kwargs):
+    """
+    Build the resized variants of a new picture off the request path.
+    """
+    if getattr(instance, '_picture_changed', False):
+        # Review and comment lists nest the authors' avatars.
+        responsecache.bump(f'user:{instance.user_id}')
+        if instance.profile_picture:
+            thumbnails.build.enqueue(instance.profile_picture.name)
+
+@receiver(post_save, sender=Movie)
+def create_movie_rating_stats(sender, instance, created, **kwargs):
+    if created:
+        MovieRatingStats.objects.get_or_create(movie=instance)
+
+@receiver(post_save, sender=Movie)
+@receiver(post_delete, sender=Movie)
+def invalidate_movie_responses(sender, instance, **kwargs):
+    responsecache.bump('movies', f'movie:{instance.pk}')
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def invalidate_review_responses(sender, instance, signal, created=False, **kwargs):
+    """
+    Reviews are listed under their movie, and adding, removing or re-rating
+    one changes its movie's rating aggregate, shown in lists and detail.
+    """
+    movie_ids = [instance.movie_id]
+    previous = instance.__dict__.get('_previous_rating')
+    if previous and previous[0] != instance.movie_id:
+        movie_ids.append(previous[0])
+    resources = [f'movie:{movie_id}:reviews' for movie_id in movie_ids]
+    if signal is post_delete or created or (previous and previous != (instance.movie_id, instance.rating)):
+        # Pages filtered or ordered by rating may now list other movies.
+        resources += [f'movie:{movie_id}' for movie_id in movie_ids] + ['ratings']
+    responsecache.bump(*resources)
+
+@receiver(post_save, sender=Like)
+@receiver(post_delete, sender=Like)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_engagement_responses(sender, instance, **kwargs):
+    """
+    Like and comment counts are part of a movie's cached review list.
+    """
+    if sender in _muted_models.get():
+        return
+    movie_id = Review.objects.filter(pk=instance.review_id).values_list('movie_id', flat=True).first()
+    if movie_id is not None:
+        responsecache.bump(f'movie:{movie_id}:reviews')
+
+@receiver(pre_save, sender=Review)
+def remember_review_rating(sender, instance, **kwargs):
+    """
+    Capture the stored movie and rating of an edited review before it is saved.
+    """
+    if not instance._state.adding:
+        instance._previous_rating = (
+            Review.objects.filter(pk=instance.pk).values_list('movie_id', 'rating').first()
+        )
+
+@receiver(post_save, sender=Review)
+def review_saved(sender, instance, created, **kwargs):
+    """
+    Count the review and update its movie's rating aggregate, then queue
+    pushing new reviews into the followers' materialized timelines,
+    recording them as trending activity and refreshing recommendations.
+    """
+    if created:
+        counters.adjust(UserProfile.objects.filter(user_id=instance.user_id), review_count=1)
+        counters.apply_rating(instance.movie_id, instance.rating, 1)
+        timelines.deliver_review.enqueue(instance.pk)
+        trending.record_activity.enqueue(instance.timestamp, movie_ids=[instance.movie_id], review_count=1)
+        recommendations.refresh.enqueue()
+        return
+    previous = instance.__dict__.get('_previous_rating')
+    if previous and previous != (instance.movie_id, instance.rating):
+        counters.apply_rating(previous[0], previous[1], -1)
+        counters.apply_rating(instance.movie_id, instance.rating, 1)
+        recommendations.refresh.enqueue()
+
+@receiver(post_delete, sender=Review)
+def review_deleted(sender, instance, **kwargs):
+    counters.adjust(UserProfile.objects.filter(user_id=instance.user_id), review_count=-1)
+    counters.apply_rating(instance.movie_id, instance.rating, -1)
+    trending.record_activity.enqueue(instance.timestamp, movie_ids=[instance.movie_id], review_count=-1)
+    recommendations.refresh.enqueue()
+
+def _record_engagement(instance, **deltas):
+    """
+    Queue recording a like or comment as trending activity on its review and movie.
+    """
+    # Looked up now: a cascading review delete removes it before the job runs.
+    movie_id = Review.objects.filter(pk=instance.review_id).values_list('movie_id', flat=True).first()
+    if movie_id is not None:
+        trending.record_activity.enqueue(
+            instance.timestamp, movie_ids=[movie_id], review_ids=[instance.review_id], **deltas
+        )
+
+@receiver(post_save, sender=Like)
+def like_created(sender, instance, created, **kwargs):
+    if created:
+        counters.adjust(Review.objects.filter(pk=instance.review_id), likes_count=1)
+        _record_engagement(instance, like_count=1)
+
+@receiver(post_delete, sender=Like)
+def like_deleted(sender, instance, **kwargs):
+    if sender in _muted_models.get():
+        return
+    counters.adjust(Review.objects.filter(pk=instance.review_id), likes_count=-1)
+    _record_engagement(instance, like_count=-1)
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    if created:
+        counters.adjust(Review.objects.filter(pk=instance.review_id), comments_count=1)
+        _record_engagement(instance, comment_count=1)
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.adjust(Review.objects.filter(pk=instance.review_id), comments_count=-1)
+    _record_engagement(instance, comment_count=-1)
+
+@receiver(pre_delete, sender=UserProfile)
+def profile_deleted(sender, instance, **kwargs):
+    """
+    Release the follow counts held by a profile whose follow rows are cascaded.
+
+    Cascading deletes of the ``following`` through table do not send
+    ``m2m_changed``, so the other side of each edge is adjusted here.
+    """
+    UserProfile.objects.filter(following=instance).update(following_count=F('following_count') - 1)
+    followees = UserProfile.objects.filter(followers=instance)
+    followees.update(follower_count=F('follower_count') - 1)
+    timelines.deliver_author.enqueue_many((pk,) for pk in timelines.demoted_authors(followees, 1))
+
+@receiver(m2m_changed, sender=UserProfile.following.through)
+def follow_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Keep follow counters in sync with ``UserProfile.following`` and queue
+    the matching timeline backfills and prunes, plus a full delivery for
+    followees who dropped below the fan-out threshold.
+
+    ``instance`` is the follower for ``profile.following`` changes and the
+    followee for ``profile.followers`` changes (``reverse=True``).
+    """
+    if action in ('pre_remove', 'pre_clear'):
+        # remove() reports every requested pk and clear() reports none, so
+        # capture the edges that actually exist before they are deleted.
+        related = instance.followers.all() if reverse else instance.following.all()
+        if action == 'pre_remove':
+            related = related.filter(pk__in=pk_set)
+        instance._removed_follow_pks = set(related.values_list('pk', flat=True))
+        return
+    if action in ('post_remove', 'post_clear'):
+        pk_set = instance.__dict__.pop('_removed_follow_pks', set())
+    elif action != 'post_add':
+        return
+    if not pk_set:
+        return
+
+    delta = len(pk_set) if action == 'post_add' else -len(pk_set)
+    step = 1 if action == 'post_add' else -1
+    others = UserProfile.objects.filter(pk__in=pk_set)
+    if reverse:
+        counters.adjust(UserProfile.objects.filter(pk=instance.pk), follower_count=delta)
+        counters.adjust(others, following_count=step)
+    else:
+        counters.adjust(UserProfile.objects.filter(pk=instance.pk), following_count=delta)
+        counters.adjust(others, follower_count=step)
+
+    if reverse:
+        pairs = [(follower_pk, instance.pk) for follower_pk in pk_set]
+    else:
+        pairs = [(instance.pk, followee_pk) for followee_pk in pk_set]
+    timelines.sync_follow.enqueue_many(sorted(pairs))
+    if action != 'post_add':
+        followees, lost = (UserProfile.objects.filter(pk=instance.pk), len(pk_set)) if reverse else (others, 1)
+        timelines.deliver_author.enqueue_many((pk,) for pk in timelines.demoted_authors(followees, lost))
@@ -0,0 +1,125 @@
+"""
+"People you may know" suggestions from the follow graph.
+
+A friends-of-friends query joins the follow table to itself and explodes
+for well-connected profiles, so ``build`` loads the whole graph into
+memory once and walks it per profile instead. Every profile followed by
+one of your followees is a candidate; candidates are scored by how many
+of your followees follow them (mutual follows) plus a smaller weight for
+each movie you both reviewed. The top ``TOP_N`` per profile are stored as
+``FollowSuggestion`` rows, so serving them is one indexed lookup.
+"""
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import UserProfile, Review, FollowSuggestion
+
+TOP_N = 20
+# Only the candidates with the most mutual follows get their co-reviewed
+# movies counted, bounding the work per profile.
+CANDIDATES_PER_PROFILE = 200
+# Followees following more profiles than this are skipped when walking the
+# graph; they would make every follower a candidate of everyone they follow.
+MAX_FOLLOWEE_FANOUT = 5000
+CO_REVIEW_WEIGHT = 0.5
+CHUNK_SIZE = 1000
+READ_CHUNK_SIZE = 10000
+
+
+def load_graph(chunk_size=READ_CHUNK_SIZE):
+    """
+    Return ``{profile id: set of followed profile ids}``.
+    """
+    following = defaultdict(set)
+    edges = UserProfile.following.through.objects.values_list('from_userprofile_id', 'to_userprofile_id')
+    for follower_id, followee_id in edges.iterator(chunk_size=chunk_size):
+        following[follower_id].add(followee_id)
+    return following
+
+
+def load_reviewed_movies(chunk_size=READ_CHUNK_SIZE):
+    """
+    Return ``{profile id: set of reviewed movie ids}``.
+    """
+    reviewed = defaultdict(set)
+    rows = Review.objects.order_by().values_list('user__profile', 'movie_id')
+    for profile_id, movie_id in rows.iterator(chunk_size=chunk_size):
+        if profile_id is not None:
+            reviewed[profile_id].add(movie_id)
+    return reviewed
+
+
+def score_candidates(profile_id, following, reviewed, top_n=TOP_N):
+    """
+    Return ``[(candidate id, score, mutual count, co-reviewed count)]``, best first.
+    """
+    followees = following.get(profile_id, set())
+    mutual = Counter()
+    for followee_id in followees:
+        second_degree = following.get(followee_id, ())
+        if len(second_degree) <= MAX_FOLLOWEE_FANOUT:
+            mutual.update(second_degree)
+    for excluded in followees | {profile_id}:
+        mutual.pop(excluded, None)
+
+    movies = reviewed.get(profile_id, set())
+    scored = []
+    for candidate_id, mutual_count in mutual.most_common(CANDIDATES_PER_PROFILE):
+        co_reviewed_count = len(movies & reviewed.get(candidate_id, set()))
+        score = mutual_count + CO_REVIEW_WEIGHT * co_reviewed_count
+        scored.append((candidate_id, score, mutual_count, co_reviewed_count))
+    scored.sort(key=lambda entry: (-entry[1], entry[0]))
+    return scored[:top_n]
+
+
+def build(top_n=TOP_N, chunk_size=CHUNK_SIZE):
+    """
+    Recompute every profile's suggestions and return the number stored.
+    """
+    computed_at = timezone.now()
+    following = load_graph()
+    reviewed = load_reviewed_movies()
+    profile_ids = sorted(following)
+    stored = 0
+    for start in range(0, len(profile_ids), chunk_size):
+        chunk = profile_ids[start:start + chunk_size]
+        suggestions = [
+            FollowSuggestion(
+                profile_id=profile_id,
+                suggested_id=candidate_id,
+                score=score,
+                mutual_count=mutual_count,
+                co_reviewed_count=co_reviewed_count,
+                computed_at=computed_at,
+            )
+            for profile_id in chunk
+            for candidate_id, score, mutual_count, co_reviewed_count
+            in score_candidates(profile_id, following, reviewed, top_n)
+        ]
+        with transaction.atomic():
+            FollowSuggestion.objects.filter(profile_id__in=chunk).delete()
+            FollowSuggestion.objects.bulk_create(suggestions, batch_size=1000)
+        stored += len(suggestions)
+    # Profiles that stopped following anyone get no suggestions.
+    FollowSuggestion.objects.filter(computed_at__lt=computed_at).delete()
+    return stored
+
+
+def suggested_profiles(profile, limit=TOP_N):
+    """
+    Return ``profile``'s stored suggestions it does not follow yet, best first.
+    """
+    return (
+        UserProfile.objects.select_related('user')
+        .filter(suggested_to__profile=profile)
+        .exclude(followers=profile)
+        .annotate(
+            score=F('suggested_to__score'),
+            mutual_count=F('suggested_to__mutual_count'),
+            co_reviewed_count=F('suggested_to__co_reviewed_count'),
+        )
+        .order_by('-score', 'pk')[:limit]
+    )
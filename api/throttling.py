@@ -0,0 +1,172 @@
+"""
+Token-bucket throttles for write endpoints.
+
+Views opt in by naming a ``throttle_scope``; rates come from
+``REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']`` as ``'<scope>'`` (per user)
+and ``'<scope>_ip'`` (per client IP), in DRF's ``'<n>/<period>'`` format.
+A rate of ``30/min`` is a bucket of 30 tokens refilled at 30 per minute:
+bursts of up to 30 requests, then one every two seconds. Read requests
+are never throttled.
+
+Buckets are tracked with GCRA (the generic cell rate algorithm), which
+is equivalent to a token bucket but keeps a single number per client:
+the time at which its bucket will be full again. That number can be
+advanced with one atomic ``incr`` in a shared cache, so the ``cache``
+backend needs no locks or read-modify-write cycles. The ``local`` backend
+keeps buckets in process memory behind a lock.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+DEFAULT_SETTINGS = {
+    # 'cache' shares buckets between processes; 'local' keeps them in memory.
+    'BACKEND': 'cache',
+    'CACHE_ALIAS': 'default',
+}
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+# Bucket times are stored as integer microseconds so they can be incr'd.
+MICROSECONDS = 1_000_000
+
+
+def get_settings():
+    return {**DEFAULT_SETTINGS, **getattr(settings, 'TOKEN_BUCKET', {})}
+
+
+def parse_rate(rate):
+    """
+    Return ``(capacity, seconds per token)`` for a rate such as ``'30/min'``.
+    """
+    count, period = rate.split('/')
+    capacity = int(count)
+    return capacity, PERIODS[period[0]] / capacity
+
+
+class LocalBackend:
+    """
+    Buckets in process memory; exact, but not shared between workers.
+    """
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def consume(self, key, capacity, interval):
+        now = time.monotonic()
+        with self._lock:
+            tat = max(self._buckets.get(key, now), now) + interval
+            wait = tat - now - capacity * interval
+            if wait > 0:
+                return wait
+            self._buckets[key] = tat
+            # Drop full buckets now and then so idle clients do not pile up.
+            if len(self._buckets) > 100_000:
+                self._buckets = {k: v for k, v in self._buckets.items() if v > now}
+        return None
+
+
+class CacheBackend:
+    """
+    Buckets in a Django cache, advanced with atomic ``incr``.
+    """
+
+    def __init__(self, alias):
+        self.alias = alias
+
+    def consume(self, key, capacity, interval):
+        cache = caches[self.alias]
+        now = int(time.time() * MICROSECONDS)
+        step = int(interval * MICROSECONDS)
+        timeout = int(capacity * interval) + 1
+        try:
+            tat = cache.incr(key, step)
+        except ValueError:
+            # First request, or the bucket expired because it was full.
+            if cache.add(key, now + step, timeout):
+                return None
+            tat = cache.incr(key, step)
+        if tat < now + step:
+            # The bucket refilled while idle: restart it from now. Racing
+            # requests may each be let through here, but only when idle.
+            cache.set(key, now + step, timeout)
+            return None
+        wait = tat - now - capacity * step
+        if wait > 0:
+            cache.decr(key, step)
+            return wait / MICROSECONDS
+        cache.touch(key, timeout)
+        return None
+
+
+_backends = {}
+
+
+def get_backend():
+    config = get_settings()
+    name = (config['BACKEND'], config['CACHE_ALIAS'])
+    if name not in _backends:
+        if config['BACKEND'] == 'local':
+            _backends[name] = LocalBackend()
+        else:
+            _backends[name] = CacheBackend(config['CACHE_ALIAS'])
+    return _backends[name]
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Throttle unsafe requests to views with a ``throttle_scope``.
+
+    Subclasses choose whose bucket a request draws from.
+    """
+    rate_suffix = ''
+
+    def __init__(self):
+        self.wait_time = None
+
+    def get_bucket_ident(self, request):
+        raise NotImplementedError
+
+    def get_rate(self, scope):
+        return api_settings.DEFAULT_THROTTLE_RATES.get(f'{scope}{self.rate_suffix}')
+
+    def allow_request(self, request, view):
+        if request.method in SAFE_METHODS:
+            return True
+        scope = getattr(view, 'throttle_scope', None)
+        rate = self.get_rate(scope) if scope else None
+        ident = self.get_bucket_ident(request) if rate else None
+        if ident is None:
+            return True
+        capacity, interval = parse_rate(rate)
+        self.wait_time = get_backend().consume(f'throttle:{scope}:{ident}', capacity, interval)
+        return self.wait_time is None
+
+    def wait(self):
+        return self.wait_time
+
+
+class UserTokenBucketThrottle(TokenBucketThrottle):
+    """
+    One bucket per authenticated user and scope.
+    """
+
+    def get_bucket_ident(self, request):
+        if request.user and request.user.is_authenticated:
+            return f'user:{request.user.pk}'
+        return None
+
+
+class IPTokenBucketThrottle(TokenBucketThrottle):
+    """
+    One bucket per client IP and scope, rated by ``'<scope>_ip'``.
+    """
+    rate_suffix = '_ip'
+
+    def get_bucket_ident(self, request):
+        return f'ip:{self.get_ident(request)}'
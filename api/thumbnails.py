@@ -0,0 +1,228 @@
+"""
+Resized variants of profile pictures.
+
+Originals are stored by ``ContentAddressedStorage`` under their SHA-256
+(``profile_pics/ab/ab12….jpg``), so the same image uploaded twice is
+stored once. Each original gets a fixed set of square variants, one per
+``VARIANTS`` size and ``FORMATS`` entry, written next to each other under
+``profile_pics/variants/<sha256>/`` and shared by every profile using that
+image.
+
+After a profile's picture changes, the ``build`` job (see ``api/jobs.py``)
+generates its variants off the request path and records them in
+``UserProfile.profile_picture_variants``.
+Serializers link recorded variants to storage directly and the rest to
+``avatar_variant``, which generates a missing variant on its first
+request and redirects to it. ``build_thumbnails`` backfills pictures
+uploaded before this pipeline.
+"""
+import hashlib
+import posixpath
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.urls import reverse
+from PIL import Image, ImageOps
+
+from . import jobs
+
+DEFAULT_SETTINGS = {
+    # Variant name: edge length in pixels of the square thumbnail.
+    'VARIANTS': {'small': 40, 'medium': 128, 'large': 512},
+    # Encodings written for every variant, preferred first.
+    'FORMATS': ['webp', 'jpeg'],
+    'QUALITY': 80,
+}
+
+# UserProfile.profile_picture's upload_to.
+PICTURE_DIR = 'profile_pics'
+EXTENSIONS = {'webp': 'webp', 'jpeg': 'jpg', 'png': 'png'}
+
+
+def get_settings():
+    return {**DEFAULT_SETTINGS, **getattr(settings, 'THUMBNAILS', {})}
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Store files under the SHA-256 of their content; identical files are saved once.
+    """
+
+    def save(self, name, content, max_length=None):
+        digest = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        digest = digest.hexdigest()
+        extension = posixpath.splitext(name)[1].lower()
+        name = posixpath.join(posixpath.dirname(name), digest[:2], digest + extension)
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length)
+
+    def save_as(self, name, content):
+        """
+        Save ``content`` under ``name`` itself, for files named by their source.
+        """
+        return super().save(name, content)
+
+
+def picture_storage():
+    return ContentAddressedStorage()
+
+
+def picture_key(name):
+    """
+    Return the content hash naming a stored picture's variants.
+    """
+    return posixpath.splitext(posixpath.basename(name))[0]
+
+
+def variant_name(name, variant, image_format):
+    return posixpath.join(PICTURE_DIR, 'variants', picture_key(name), f'{variant}.{EXTENSIONS[image_format]}')
+
+
+def all_variants():
+    config = get_settings()
+    return [f'{variant}.{image_format}' for variant in config['VARIANTS'] for image_format in config['FORMATS']]
+
+
+def render_variant(image, size, image_format):
+    """
+    Return ``image`` cropped to a ``size`` pixel square and encoded as ``image_format``.
+    """
+    thumbnail = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+    if image_format == 'jpeg' and thumbnail.mode != 'RGB':
+        # JPEG has no alpha channel: flatten onto white.
+        background = Image.new('RGB', thumbnail.size, 'white')
+        rgba = thumbnail.convert('RGBA')
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        thumbnail = background
+    elif thumbnail.mode not in ('RGB', 'RGBA'):
+        thumbnail = thumbnail.convert('RGBA')
+    output = BytesIO()
+    options = {'quality': get_settings()['QUALITY']}
+    if image_format == 'jpeg':
+        options.update(optimize=True, progressive=True)
+    elif image_format == 'webp':
+        options.update(method=4)
+    thumbnail.save(output, format=image_format.upper(), **options)
+    return output.getvalue()
+
+
+def generate_variants(name, only=None):
+    """
+    Write the missing variants of the stored picture ``name``; returns every variant that exists.
+
+    ``only`` limits generation to those ``'<variant>.<format>'`` entries.
+    """
+    storage = picture_storage()
+    config = get_settings()
+    done = []
+    image = None
+    for variant, size in config['VARIANTS'].items():
+        for image_format in config['FORMATS']:
+            entry = f'{variant}.{image_format}'
+            target = variant_name(name, variant, image_format)
+            if not storage.exists(target):
+                if only is not None and entry not in only:
+                    continue
+                if image is None:
+                    with storage.open(name, 'rb') as file:
+                        image = ImageOps.exif_transpose(Image.open(file))
+                        image.load()
+                storage.save_as(target, ContentFile(render_variant(image, size, image_format)))
+            done.append(entry)
+    return done
+
+
+def record_variants(name, variants):
+    """
+    Store ``variants`` on every profile using the picture ``name`` that has
+    not recorded them yet.
+    """
+    from . import responsecache
+    from .models import UserProfile
+
+    profiles = UserProfile.objects.filter(profile_picture=name).exclude(profile_picture_variants=variants)
+    user_ids = list(profiles.values_list('user_id', flat=True))
+    if user_ids:
+        profiles.filter(user_id__in=user_ids).update(profile_picture_variants=variants)
+        # Review and comment lists nest the authors' avatars.
+        responsecache.bump(*[f'user:{user_id}' for user_id in user_ids])
+
+
+@jobs.task(key='{0}', max_attempts=3, atomic=False)
+def build(name):
+    """
+    Generate and record every variant of the picture ``name``.
+    """
+    record_variants(name, generate_variants(name))
+
+
+def find_picture(key):
+    """
+    Return the stored name of the original with content hash ``key``, or None.
+    """
+    directory = posixpath.join(PICTURE_DIR, key[:2])
+    storage = picture_storage()
+    if not storage.exists(directory):
+        return None
+    _, files = storage.listdir(directory)
+    for file in files:
+        if picture_key(file) == key:
+            return posixpath.join(directory, file)
+    return None
+
+
+def ensure_variant(key, variant, extension):
+    """
+    Return the storage URL of a variant of the picture ``key``, generating it if missing.
+
+    Returns None for unknown pictures and variants. The picture's other
+    missing variants are left to the ``build`` job.
+    """
+    config = get_settings()
+    image_format = {extension: image_format for image_format, extension in EXTENSIONS.items()}.get(extension)
+    if variant not in config['VARIANTS'] or image_format not in config['FORMATS']:
+        return None
+    name = find_picture(key)
+    if name is None:
+        return None
+    target = variant_name(name, variant, image_format)
+    storage = picture_storage()
+    # Repeated requests for a variant that exists write and record nothing.
+    if not storage.exists(target):
+        done = generate_variants(name, only={f'{variant}.{image_format}'})
+        record_variants(name, done)
+        if len(done) < len(all_variants()):
+            build.enqueue(name)
+    return storage.url(target)
+
+
+def avatar_urls(name, variants, request=None):
+    """
+    Return ``{variant: {format: url}}`` for the picture ``name``, or None without one.
+
+    Recorded variants link to storage; the others to the lazy ``avatar_variant`` view.
+    """
+    if not name:
+        return None
+    config = get_settings()
+    storage = picture_storage()
+    recorded = set(variants or ())
+    urls = {}
+    for variant in config['VARIANTS']:
+        urls[variant] = {}
+        for image_format in config['FORMATS']:
+            if f'{variant}.{image_format}' in recorded:
+                url = storage.url(variant_name(name, variant, image_format))
+            else:
+                url = reverse('avatar-variant', kwargs={
+                    'key': picture_key(name), 'variant': variant, 'extension': EXTENSIONS[image_format],
+                })
+            urls[variant][image_format] = request.build_absolute_uri(url) if request is not None else url
+    return urls
@@ -0,0 +1,250 @@
+"""
+Materialized feed timelines with hybrid fan-out.
+
+Reviews by regular accounts are pushed into each follower's timeline when
+they are written. Reviews by accounts with at least ``FEED_FANOUT_THRESHOLD``
+followers are not pushed; they are merged in when the feed is read instead,
+so a single review never turns into millions of timeline rows.
+
+Both run on the job queue (``deliver_review`` and ``sync_follow``), after
+the write that caused them has committed. Timelines keep their
+``FEED_TIMELINE_LENGTH`` newest entries; older ones are trimmed once a
+timeline outgrows that by ``TRIM_SLACK``.
+"""
+from django.conf import settings
+from django.db.models import F, Q
+
+from .models import UserProfile, Review, TimelineEntry
+from . import counters, jobs
+
+DEFAULT_FANOUT_THRESHOLD = 10000
+DEFAULT_BACKFILL_LIMIT = 100
+DEFAULT_TIMELINE_LENGTH = 1000
+FANOUT_BATCH_SIZE = 1000
+# Fraction of FEED_TIMELINE_LENGTH a timeline may grow past before it is trimmed.
+TRIM_SLACK = 0.1
+
+
+def get_fanout_threshold():
+    return getattr(settings, 'FEED_FANOUT_THRESHOLD', DEFAULT_FANOUT_THRESHOLD)
+
+
+def get_backfill_limit():
+    return getattr(settings, 'FEED_BACKFILL_LIMIT', DEFAULT_BACKFILL_LIMIT)
+
+
+def get_timeline_length():
+    return getattr(settings, 'FEED_TIMELINE_LENGTH', DEFAULT_TIMELINE_LENGTH)
+
+
+def is_pull_author(profile):
+    """
+    Return True if reviews by this profile are merged in at read time.
+    """
+    return profile.follower_count >= get_fanout_threshold()
+
+
+def _pull_authors(profile):
+    return profile.following.filter(follower_count__gte=get_fanout_threshold()).values_list('user_id', flat=True)
+
+
+def get_pull_author_ids(profile):
+    """
+    Return the user ids of followed accounts whose reviews are read-time merged.
+    """
+    return list(_pull_authors(profile))
+
+
+async def aget_pull_author_ids(profile):
+    return [user_id async for user_id in _pull_authors(profile)]
+
+
+def demoted_authors(profiles, lost):
+    """
+    Return the pks of ``profiles`` that just dropped below the fan-out threshold
+    by losing ``lost`` followers each.
+    """
+    threshold = get_fanout_threshold()
+    return list(
+        profiles.filter(follower_count__lt=threshold, follower_count__gte=threshold - lost)
+        .values_list('pk', flat=True)
+    )
+
+
+def _grow(user_ids, added):
+    """
+    Count ``added`` new entries in each timeline and trim those grown too long.
+    """
+    profiles = UserProfile.objects.filter(user_id__in=user_ids)
+    profiles.update(timeline_length=F('timeline_length') + added)
+    length = get_timeline_length()
+    trim(profiles.filter(timeline_length__gt=length + int(length * TRIM_SLACK)).values_list('user_id', flat=True))
+
+
+def trim(user_ids):
+    """
+    Delete all but the newest ``FEED_TIMELINE_LENGTH`` entries of each timeline.
+    """
+    length = get_timeline_length()
+    for user_id in user_ids:
+        entries = TimelineEntry.objects.filter(user_id=user_id)
+        oldest_kept = list(
+            entries.order_by('-timestamp', '-review_id').values_list('timestamp', 'review_id')[length - 1:length]
+        )
+        if oldest_kept:
+            timestamp, review_id = oldest_kept[0]
+            entries.filter(
+                Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, review_id__lt=review_id)
+            ).delete()
+        UserProfile.objects.filter(user_id=user_id).update(timeline_length=entries.count())
+
+
+def fan_out_review(review):
+    """
+    Push a newly created review into the timelines of its author's followers.
+    """
+    author_profile = UserProfile.objects.get(user_id=review.user_id)
+    if is_pull_author(author_profile):
+        return
+    follower_ids = (
+        author_profile.followers.values_list('user_id', flat=True).iterator(chunk_size=FANOUT_BATCH_SIZE)
+    )
+    batch = []
+    for user_id in follower_ids:
+        batch.append(TimelineEntry(
+            user_id=user_id,
+            review_id=review.pk,
+            author_id=review.user_id,
+            timestamp=review.timestamp,
+        ))
+        if len(batch) >= FANOUT_BATCH_SIZE:
+            _deliver(batch)
+            batch = []
+    if batch:
+        _deliver(batch)
+
+
+def _deliver(entries):
+    TimelineEntry.objects.bulk_create(entries, ignore_conflicts=True)
+    _grow([entry.user_id for entry in entries], 1)
+
+
+def backfill(follower_profile, followee_profiles, limit=None):
+    """
+    Copy the most recent reviews of newly followed profiles into a timeline.
+    """
+    if limit is None:
+        limit = get_backfill_limit()
+    author_ids = [
+        profile.user_id for profile in followee_profiles
+        if not is_pull_author(profile)
+    ]
+    if not author_ids or limit <= 0:
+        return
+    reviews = (
+        Review.objects.filter(user_id__in=author_ids)
+        .order_by('-timestamp', '-id')
+        .values_list('id', 'user_id', 'timestamp')[:limit]
+    )
+    entries = TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(
+                user_id=follower_profile.user_id,
+                review_id=review_id,
+                author_id=author_id,
+                timestamp=timestamp,
+            )
+            for review_id, author_id, timestamp in reviews
+        ],
+        ignore_conflicts=True,
+    )
+    if entries:
+        # Entries already present are counted again; trim() corrects the count.
+        _grow([follower_profile.user_id], len(entries))
+
+
+def prune(follower_profile, followee_profiles):
+    """
+    Remove the reviews of unfollowed profiles from a timeline.
+    """
+    author_ids = [profile.user_id for profile in followee_profiles]
+    deleted, _ = TimelineEntry.objects.filter(user_id=follower_profile.user_id, author_id__in=author_ids).delete()
+    counters.adjust(UserProfile.objects.filter(user_id=follower_profile.user_id), timeline_length=-deleted)
+
+
+def rebuild(profile, limit=None):
+    """
+    Discard and regenerate a profile's timeline from its current followees.
+    """
+    TimelineEntry.objects.filter(user_id=profile.user_id).delete()
+    UserProfile.objects.filter(pk=profile.pk).update(timeline_length=0)
+    backfill(profile, profile.following.all(), limit=limit)
+
+
+@jobs.task(key='{0}')
+def deliver_review(review_id):
+    """
+    ``fan_out_review`` for the review ``review_id``, unless it was deleted meanwhile.
+    """
+    review = Review.objects.filter(pk=review_id).first()
+    if review is not None:
+        fan_out_review(review)
+
+
+@jobs.task(key='{0}:{1}')
+def sync_follow(follower_id, followee_id):
+    """
+    Backfill or prune a followee's reviews in a follower's timeline, matching whether the follow exists now.
+
+    A follow undone before this runs is pruned once instead of being
+    backfilled and pruned.
+    """
+    profiles = UserProfile.objects.in_bulk([follower_id, followee_id])
+    if follower_id not in profiles or followee_id not in profiles:
+        # Deleting a profile cascades to its timeline rows.
+        return
+    follower, followee = profiles[follower_id], profiles[followee_id]
+    if follower.following.filter(pk=followee_id).exists():
+        backfill(follower, [followee])
+    else:
+        prune(follower, [followee])
+
+
+@jobs.task(key='{0}')
+def deliver_author(profile_id):
+    """
+    Push the recent reviews of a profile that stopped being a pull author into
+    its followers' timelines.
+
+    Its reviews were merged in at read time until now and were never fanned out.
+    """
+    profile = UserProfile.objects.filter(pk=profile_id).first()
+    if profile is None or is_pull_author(profile):
+        return
+    for follower in profile.followers.iterator(chunk_size=FANOUT_BATCH_SIZE):
+        backfill(follower, [profile])
+
+
+def get_feed_sources(user):
+    """
+    Return the querysets a user's feed is merged from, each with its
+    ``(timestamp, review id)`` key fields.
+
+    The first holds the user's timeline entries; each high-follower account
+    they follow adds its own reviews. Every source can be read newest first
+    from an index, so ``FeedCursorPagination`` seeks each one and merges a page.
+    """
+    return _feed_sources(user, get_pull_author_ids(user.profile))
+
+
+async def aget_feed_sources(user):
+    """
+    ``get_feed_sources`` for async views.
+    """
+    return _feed_sources(user, await aget_pull_author_ids(user.profile))
+
+
+def _feed_sources(user, pull_author_ids):
+    sources = [(TimelineEntry.objects.filter(user=user), ('timestamp', 'review_id'))]
+    sources.extend((Review.objects.filter(user_id=author_id), ('timestamp', 'id')) for author_id in pull_author_ids)
+    return sources
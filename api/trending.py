@@ -0,0 +1,196 @@
+"""
+Trending movies and reviews from hourly activity buckets.
+
+Creating a review, like or comment adds one to the current hour's
+``TrendingBucket`` of its movie and review; deleting one takes it back out
+of the bucket it was counted in. ``refresh`` periodically reads only the
+buckets inside the window, weighs each by ``0.5 ** (age / half-life)``, and
+rewrites the ``TrendingMovie`` and ``TrendingReview`` leaderboards, so the
+trending endpoints read one page of ranked rows.
+
+Activity is recorded by the ``record_activity`` job, off the request path.
+``rebuild`` recounts the buckets from the rows themselves, for data written
+without the receivers.
+"""
+import heapq
+from collections import Counter, defaultdict
+from datetime import timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Movie, Review, Comment, Like, TrendingBucket, TrendingMovie, TrendingReview
+from . import counters, jobs
+
+DEFAULT_SETTINGS = {
+    # Activity older than this is ignored and its buckets are deleted.
+    'WINDOW_HOURS': 7 * 24,
+    # Activity loses half its weight every this many hours.
+    'HALF_LIFE_HOURS': 24,
+    'WEIGHTS': {'review_count': 3, 'like_count': 1, 'comment_count': 2},
+    # Rows kept in each leaderboard.
+    'LEADERBOARD_SIZE': 100,
+}
+
+COUNT_FIELDS = ('review_count', 'like_count', 'comment_count')
+
+
+def get_settings():
+    return {**DEFAULT_SETTINGS, **getattr(settings, 'TRENDING', {})}
+
+
+def bucket_hour(moment):
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def _add(model, field, ids, hour, deltas):
+    # An id listed n times (e.g. a movie with two liked reviews) gets n times the deltas.
+    counts = Counter(ids)
+    if not counts:
+        return
+    # Create the missing buckets empty, then apply every delta as an update,
+    # so concurrent writers and removals recorded before their additions all count.
+    TrendingBucket.objects.bulk_create(
+        [
+            TrendingBucket(**{field: target_id}, hour=hour)
+            for target_id in model.objects.filter(pk__in=counts).values_list('pk', flat=True)
+        ],
+        ignore_conflicts=True,
+    )
+    for times in set(counts.values()):
+        group = {target_id for target_id, count in counts.items() if count == times}
+        scaled = {name: delta * times for name, delta in deltas.items()}
+        counters.adjust(TrendingBucket.objects.filter(**{f'{field}__in': group}, hour=hour), **scaled)
+
+
+def record(movie_ids=(), review_ids=(), at=None, **deltas):
+    """
+    Add ``deltas`` (e.g. ``like_count=1``) to the buckets for the hour of ``at``.
+
+    Ids may repeat; each occurrence counts once. Activity older than the
+    window is ignored, so removing it is a no-op.
+    """
+    hour = bucket_hour(at or timezone.now())
+    if hour < bucket_hour(timezone.now()) - timedelta(hours=get_settings()['WINDOW_HOURS']):
+        return
+    _add(Movie, 'movie_id', movie_ids, hour, deltas)
+    _add(Review, 'review_id', review_ids, hour, deltas)
+
+
+@jobs.task()
+def record_activity(at, movie_ids=(), review_ids=(), **deltas):
+    """
+    ``record`` run from the job queue; ``at`` arrives as an ISO 8601 string.
+    """
+    record(movie_ids=movie_ids, review_ids=review_ids, at=parse_datetime(at), **deltas)
+
+
+def _scores(rows, now, half_life, weights):
+    scores = defaultdict(float)
+    for target_id, hour, *counts in rows:
+        age = (now - hour).total_seconds() / 3600
+        activity = sum(weights.get(field, 0) * count for field, count in zip(COUNT_FIELDS, counts))
+        scores[target_id] += activity * 0.5 ** (age / half_life)
+    return scores
+
+
+def _ranked(scores, size):
+    top = heapq.nlargest(size, ((score, target_id) for target_id, score in scores.items() if score > 0))
+    return [(target_id, score, rank) for rank, (score, target_id) in enumerate(top, start=1)]
+
+
+def refresh(now=None):
+    """
+    Rebuild both leaderboards and drop expired buckets.
+
+    Returns the number of ``(movies, reviews)`` ranked.
+    """
+    config = get_settings()
+    now = now or timezone.now()
+    cutoff = bucket_hour(now) - timedelta(hours=config['WINDOW_HOURS'])
+    TrendingBucket.objects.filter(hour__lt=cutoff).delete()
+
+    buckets = TrendingBucket.objects.filter(hour__gte=cutoff).order_by()
+    movie_scores = _scores(
+        buckets.filter(movie__isnull=False).values_list('movie_id', 'hour', *COUNT_FIELDS).iterator(),
+        now, config['HALF_LIFE_HOURS'], config['WEIGHTS'],
+    )
+    review_scores = _scores(
+        buckets.filter(review__isnull=False).values_list('review_id', 'hour', *COUNT_FIELDS).iterator(),
+        now, config['HALF_LIFE_HOURS'], config['WEIGHTS'],
+    )
+    movies = _ranked(movie_scores, config['LEADERBOARD_SIZE'])
+    reviews = _ranked(review_scores, config['LEADERBOARD_SIZE'])
+    with transaction.atomic():
+        TrendingMovie.objects.all().delete()
+        TrendingMovie.objects.bulk_create(
+            [TrendingMovie(movie_id=movie_id, score=score, rank=rank) for movie_id, score, rank in movies]
+        )
+        TrendingReview.objects.all().delete()
+        TrendingReview.objects.bulk_create(
+            [TrendingReview(review_id=review_id, score=score, rank=rank) for review_id, score, rank in reviews]
+        )
+    return len(movies), len(reviews)
+
+
+def _activity(queryset, target, cutoff):
+    """
+    Yield ``(target id, hour, rows)`` for the rows of ``queryset`` inside the window.
+    """
+    rows = (
+        queryset.filter(timestamp__gte=cutoff)
+        .annotate(bucket=TruncHour('timestamp', tzinfo=dt_timezone.utc))
+        .order_by()
+        .values(target, 'bucket')
+        .annotate(total=Count('*'))
+        .values_list(target, 'bucket', 'total')
+    )
+    return rows.iterator()
+
+
+def rebuild(now=None):
+    """
+    Recount every bucket inside the window from reviews, likes and comments,
+    then ``refresh`` the leaderboards and return what it returns.
+    """
+    now = now or timezone.now()
+    cutoff = bucket_hour(now) - timedelta(hours=get_settings()['WINDOW_HOURS'])
+    sources = [
+        ('movie_id', 'review_count', Review.objects.all(), 'movie_id'),
+        ('movie_id', 'like_count', Like.objects.all(), 'review__movie_id'),
+        ('review_id', 'like_count', Like.objects.all(), 'review_id'),
+        ('movie_id', 'comment_count', Comment.objects.all(), 'review__movie_id'),
+        ('review_id', 'comment_count', Comment.objects.all(), 'review_id'),
+    ]
+    buckets = {}
+    for field, count_field, queryset, target in sources:
+        for target_id, hour, total in _activity(queryset, target, cutoff):
+            bucket = buckets.get((field, target_id, hour))
+            if bucket is None:
+                bucket = buckets[field, target_id, hour] = TrendingBucket(**{field: target_id}, hour=hour)
+            setattr(bucket, count_field, getattr(bucket, count_field) + total)
+    with transaction.atomic():
+        TrendingBucket.objects.filter(hour__gte=cutoff).delete()
+        TrendingBucket.objects.bulk_create(buckets.values(), batch_size=1000)
+    return refresh(now)
+
+
+def trending_movies(limit):
+    return (
+        Movie.objects.select_related('rating_stats')
+        .filter(trending__isnull=False)
+        .annotate(score=F('trending__score'))
+        .order_by('trending__rank')[:limit]
+    )
+
+
+def trending_reviews(limit):
+    return (
+        Review.objects.select_related('user')
+        .filter(trending__isnull=False)
+        .order_by('trending__rank')[:limit]
+    )
@@ -4,7 +4,7 @@ from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
 )
-from . import views
+from . import async_views, views
 
 router = DefaultRouter()
 router.register(r'users', views.UserViewSet)
@@ -18,6 +18,15 @@ urlpatterns = [
     path('', include(router.urls)),
     path('token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('export/<str:kind>/', views.ExportView.as_view(), name='export'),
+    path('jobs/stats/', views.JobStatsView.as_view(), name='job-stats'),
+    path('avatars/<slug:key>/<slug:variant>.<slug:extension>', views.AvatarVariantView.as_view(), name='avatar-variant'),
+    # Async mirrors of the hot read endpoints; see api/async_views.py.
+    path('async/movies/', async_views.movie_list, name='async-movie-list'),
+    path('async/movies/<int:pk>/', async_views.movie_detail, name='async-movie-detail'),
+    path('async/movies/<int:pk>/reviews/', async_views.movie_reviews, name='async-movie-reviews'),
+    path('async/reviews/<int:pk>/comments/', async_views.review_comments, name='async-review-comments'),
+    path('async/profiles/feed/', async_views.feed, name='async-profile-feed'),
 ]
 
 # TODO: Add any additional custom endpoints that don't fit the REST pattern 
\ No newline at end of file
@@ -1,156 +1,523 @@
+import html
+
 from django.shortcuts import render
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.http import HttpResponseRedirect, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.exceptions import ValidationError, NotFound
+from rest_framework.views import APIView
 from django.contrib.auth.models import User
 from .models import UserProfile, Movie, Review, Comment, Like
 from .serializers import (
-    UserSerializer, UserProfileSerializer, MovieSerializer,
-    ReviewSerializer, CommentSerializer, LikeSerializer
+    UserSerializer, UserProfileSerializer, MovieSerializer, MovieDetailSerializer,
+    ReviewSerializer, CommentSerializer, LikeSerializer, BatchIdsSerializer
 )
 from .permissions import IsOwnerOrReadOnly, IsReviewAuthorOrReadOnly, IsCommentAuthorOrReadOnly, CannotLikeTwice
+from .pagination import ReviewCursorPagination, CommentCursorPagination, FeedCursorPagination
+from .responsecache import (
+    cached_response, movie_detail_resources, movie_list_members, movie_list_resources, movie_reviews_resources,
+    review_list_members,
+)
+from .fastserializers import CompiledListMixin
+from .fieldsets import SparseFieldsViewMixin
+from . import batch, exports, jobs, recommendations, search, suggestions, thumbnails, trending
+
+def _get_limit_param(request, default, maximum):
+    """
+    Read a positive ``limit`` query parameter, capped at ``maximum``.
+    """
+    try:
+        limit = int(request.query_params.get('limit', default))
+    except ValueError:
+        raise ValidationError({'limit': 'A number is required.'})
+    if limit < 1:
+        raise ValidationError({'limit': 'Must be at least 1.'})
+    return min(limit, maximum)
 
-class UserViewSet(viewsets.ReadOnlyModelViewSet):
+class UserViewSet(SparseFieldsViewMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for viewing user instances.
     """
-    queryset = User.objects.all()
+    # Eager-loading plan: avatar reads user.profile.
+    queryset = User.objects.select_related('profile').order_by('pk')
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated]
     
     # TODO: Add endpoint to view user profile
 
-class UserProfileViewSet(viewsets.ModelViewSet):
+class UserProfileViewSet(SparseFieldsViewMixin, CompiledListMixin, viewsets.ModelViewSet):
     """
     ViewSet for viewing and editing user profiles.
     """
-    queryset = UserProfile.objects.all()
+    # Eager-loading plan: the nested UserSerializer reads profile.user; Django
+    # caches this profile as the user's, so avatar needs no further query.
+    queryset = UserProfile.objects.select_related('user').order_by('pk')
     serializer_class = UserProfileSerializer
     permission_classes = [permissions.IsAuthenticated, IsOwnerOrReadOnly]
+    # Writes without a scope are not throttled; actions set their own.
+    throttle_scope = None
     
-    # TODO: Implement custom action for following/unfollowing users
-    @action(detail=True, methods=['post'])
+    @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated],
+            throttle_scope='follow')
     def follow(self, request, pk=None):
         """
         Follow a user profile.
         """
-        # TODO: Implement follow logic
-        return Response({"detail": "Not implemented yet"}, status=status.HTTP_501_NOT_IMPLEMENTED)
+        profile = self.get_object()
+        if profile.user_id == request.user.id:
+            return Response({"detail": "You cannot follow yourself."}, status=status.HTTP_400_BAD_REQUEST)
+        request.user.profile.follow(profile)
+        return Response({"detail": f"You are now following {profile.user.username}."})
     
-    @action(detail=True, methods=['post'])
+    @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated],
+            throttle_scope='follow')
     def unfollow(self, request, pk=None):
         """
         Unfollow a user profile.
         """
-        # TODO: Implement unfollow logic
-        return Response({"detail": "Not implemented yet"}, status=status.HTTP_501_NOT_IMPLEMENTED)
+        profile = self.get_object()
+        request.user.profile.unfollow(profile)
+        return Response({"detail": f"You are no longer following {profile.user.username}."})
     
-    # TODO: Implement custom action to get user's feed (reviews from followed users)
-    @action(detail=False, methods=['get'])
+    @action(detail=False, methods=['post'], url_path='batch-follow',
+            permission_classes=[permissions.IsAuthenticated], throttle_scope='follow')
+    def batch_follow(self, request):
+        """
+        Follow every profile in ``ids`` in one transaction.
+        """
+        serializer = BatchIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = batch.follow_profiles(request.user.profile, serializer.validated_data['ids'])
+        return Response({"results": results})
+    
+    @action(detail=False, methods=['get'], serializer_class=ReviewSerializer,
+            pagination_class=FeedCursorPagination)
     def feed(self, request):
         """
         Get the authenticated user's feed of reviews from followed users.
+
+        Reads the materialized timeline; see ``api/timelines.py``.
+        """
+        # FeedCursorPagination picks the page's reviews from the user's feed
+        # sources and loads them from here.
+        queryset = Review.objects.select_related('user__profile')
+        return self.get_list_response(queryset)
+    
+    @action(detail=False, methods=['get'])
+    def suggestions(self, request):
+        """
+        Suggest profiles to follow, from mutual follows and co-reviewed movies.
+
+        ``limit`` caps the results (default 20, at most 50); see
+        ``api/suggestions.py``.
+        """
+        limit = _get_limit_param(request, default=suggestions.TOP_N, maximum=50)
+        profiles = suggestions.suggested_profiles(request.user.profile, limit=limit)
+        return Response(self.get_serializer(profiles, many=True).data)
+    
+    @action(detail=False, methods=['get'], serializer_class=MovieSerializer)
+    def recommendations(self, request):
+        """
+        Recommend movies from the neighbours of the movies the user reviewed.
+
+        ``limit`` caps the results (default 20, at most 50); see
+        ``api/recommendations.py``.
         """
-        # TODO: Implement feed logic
-        return Response({"detail": "Not implemented yet"}, status=status.HTTP_501_NOT_IMPLEMENTED)
+        limit = _get_limit_param(request, default=recommendations.TOP_K, maximum=50)
+        movies = recommendations.recommended_movies(request.user, limit=limit)
+        return Response(self.get_serializer(movies, many=True).data)
 
-class MovieViewSet(viewsets.ModelViewSet):
+def add_search_truncated(response, truncated):
+    """
+    Tell clients when a search listed only the best ``search.MAX_RESULTS`` matches.
+    """
+    if truncated is not None:
+        response.data['search_truncated'] = truncated
+    return response
+
+class MovieViewSet(SparseFieldsViewMixin, CompiledListMixin, viewsets.ModelViewSet):
     """
     ViewSet for viewing and editing movie instances.
     """
-    queryset = Movie.objects.all()
+    # Eager-loading plan (see get_queryset): rating_stats backs average_rating,
+    # review_count and the detail histogram.
+    queryset = Movie.objects.select_related('rating_stats')
     serializer_class = MovieSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    # ?ordering= values, mapped onto the indexed MovieRatingStats columns.
+    ordering_fields = {
+        'average_rating': ('rating_stats__average_rating', 'rating_stats__movie'),
+        'review_count': ('rating_stats__rating_count', 'rating_stats__movie'),
+    }
+    # Set by get_queryset when a full-text search ran: whether it hit search.MAX_RESULTS.
+    search_truncated = None
     
-    # TODO: Add endpoint to view movie reviews
-    @action(detail=True, methods=['get'])
+    def get_serializer_class(self):
+        if self.action == 'retrieve':
+            return MovieDetailSerializer
+        return super().get_serializer_class()
+    
+    @cached_response(movie_list_resources, movie_list_members)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+    
+    def get_paginated_response(self, data):
+        return add_search_truncated(super().get_paginated_response(data), self.search_truncated)
+    
+    @cached_response(movie_detail_resources)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+    
+    @action(detail=True, methods=['get'], serializer_class=ReviewSerializer,
+            pagination_class=ReviewCursorPagination)
+    @cached_response(movie_reviews_resources, review_list_members)
     def reviews(self, request, pk=None):
         """
         Get all reviews for a specific movie.
         """
-        # TODO: Implement reviews retrieval logic
-        return Response({"detail": "Not implemented yet"}, status=status.HTTP_501_NOT_IMPLEMENTED)
+        movie = self.get_object()
+        queryset = Review.objects.filter(movie=movie).select_related('user__profile')
+        return self.get_list_response(queryset)
+    
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk=None):
+        """
+        Get the movies most similar to this one by their review ratings.
+
+        ``limit`` caps the results (default 20, at most 50); see
+        ``api/recommendations.py``.
+        """
+        movie = self.get_object()
+        limit = _get_limit_param(request, default=recommendations.TOP_K, maximum=50)
+        movies = recommendations.similar_movies(movie.pk, limit=limit)
+        return Response(self.get_serializer(movies, many=True).data)
+    
+    @action(detail=False, methods=['get'], url_path='trending', url_name='trending')
+    def trending_movies(self, request):
+        """
+        Get the movies with the most recent activity, best first.
+
+        Served from the leaderboard rebuilt by ``refresh_trending``; ``limit``
+        caps the results (default 20).
+        """
+        limit = _get_limit_param(request, default=20, maximum=trending.get_settings()['LEADERBOARD_SIZE'])
+        return Response(self.get_serializer(trending.trending_movies(limit), many=True).data)
+    
+    @action(detail=False, methods=['get'])
+    def autocomplete(self, request):
+        """
+        Suggest movie titles for a partially typed ``q``, best match first.
+        """
+        query = request.query_params.get('q', '')
+        using = Movie.objects.db
+        if not search.is_available(using):
+            movies = Movie.objects.filter(title__istartswith=query.strip())[:10] if query.strip() else []
+            return Response([
+                {
+                    'id': movie.id,
+                    'title': movie.title,
+                    'release_year': movie.release_year,
+                    'highlight': html.escape(movie.title),
+                }
+                for movie in movies
+            ])
+        hits = search.search_movies(title=query, limit=10, using=using)
+        movies = Movie.objects.in_bulk([hit.id for hit in hits])
+        return Response([
+            {
+                'id': hit.id,
+                'title': movies[hit.id].title,
+                'release_year': movies[hit.id].release_year,
+                'highlight': hit.snippet,
+            }
+            for hit in hits if hit.id in movies
+        ])
+    
+    def _get_number_param(self, name, cast):
+        value = self.request.query_params.get(name)
+        if not value:
+            return None
+        try:
+            return cast(value)
+        except ValueError:
+            raise ValidationError({name: 'A number is required.'})
     
-    # TODO: Add search and filtering functionality
     def get_queryset(self):
         """
         Optionally filter movies based on query parameters.
+
+        ``search`` (title and description) and ``title`` (title prefix) are
+        answered by the full-text index in ``api/search.py`` and ordered by
+        relevance; ``genre`` and ``release_year`` are applied inside the same
+        indexed query. ``min_rating``, ``min_reviews`` and ``ordering``
+        (``average_rating``, ``review_count``, optionally prefixed with ``-``)
+        are answered from the indexed ``MovieRatingStats`` row rather than
+        aggregating reviews.
         """
-        # TODO: Implement filtering by title, genre, release year
-        return Movie.objects.all()
+        queryset = super().get_queryset()
+        params = self.request.query_params
+        text = params.get('search', '').strip()
+        title = params.get('title', '').strip()
+        genre = params.get('genre')
+        release_year = self._get_number_param('release_year', int)
+        
+        if (text or title) and search.is_available(queryset.db):
+            hits = search.search_movies(text, title=title, genre=genre, release_year=release_year, using=queryset.db)
+            queryset = search.apply_hits(queryset, hits)
+            self.search_truncated = hits.truncated
+        else:
+            if text:
+                queryset = queryset.filter(Q(title__icontains=text) | Q(description__icontains=text))
+            if title:
+                queryset = queryset.filter(title__icontains=title)
+            if genre:
+                queryset = queryset.filter(genre=genre)
+            if release_year is not None:
+                queryset = queryset.filter(release_year=release_year)
+            queryset = queryset.order_by('pk')
+        
+        min_rating = self._get_number_param('min_rating', float)
+        if min_rating is not None:
+            queryset = queryset.filter(rating_stats__average_rating__gte=min_rating)
+        
+        min_reviews = self._get_number_param('min_reviews', int)
+        if min_reviews is not None:
+            queryset = queryset.filter(rating_stats__rating_count__gte=min_reviews)
+        
+        ordering = params.get('ordering')
+        if ordering:
+            descending = ordering.startswith('-')
+            fields = self.ordering_fields.get(ordering.lstrip('-'))
+            if fields is None:
+                raise ValidationError({'ordering': f"Choose from: {', '.join(self.ordering_fields)}."})
+            queryset = queryset.order_by(*[f'-{field}' if descending else field for field in fields])
+        return queryset
 
-class ReviewViewSet(viewsets.ModelViewSet):
+class ReviewViewSet(SparseFieldsViewMixin, CompiledListMixin, viewsets.ModelViewSet):
     """
     ViewSet for viewing and editing review instances.
     """
-    queryset = Review.objects.all()
+    # Eager-loading plan: the nested UserSerializer reads review.user and its profile.
+    queryset = Review.objects.select_related('user__profile')
     serializer_class = ReviewSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsReviewAuthorOrReadOnly]
+    pagination_class = ReviewCursorPagination
+    throttle_scope = 'review'
     
-    # TODO: Override perform_create to set the user
     def perform_create(self, serializer):
         """
         Set the user when creating a review.
         """
-        # TODO: Implement user assignment
-        pass
+        try:
+            with transaction.atomic():
+                serializer.save(user=self.request.user)
+        except IntegrityError:
+            # A concurrent request created the review after validate() checked.
+            raise ValidationError({'non_field_errors': ["You have already reviewed this movie."]})
     
-    # TODO: Add endpoint to like/unlike a review
-    @action(detail=True, methods=['post'])
+    @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated],
+            throttle_scope='like')
     def like(self, request, pk=None):
         """
         Like a review.
         """
-        # TODO: Implement like logic
-        return Response({"detail": "Not implemented yet"}, status=status.HTTP_501_NOT_IMPLEMENTED)
+        review = self.get_object()
+        with transaction.atomic():
+            _, created = Like.objects.get_or_create(user=request.user, review=review)
+        if not created:
+            return Response({"detail": "You have already liked this review."})
+        return Response({"detail": "Review liked."}, status=status.HTTP_201_CREATED)
     
-    @action(detail=True, methods=['post'])
+    @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated],
+            throttle_scope='like')
     def unlike(self, request, pk=None):
         """
         Unlike a review.
         """
-        # TODO: Implement unlike logic
-        return Response({"detail": "Not implemented yet"}, status=status.HTTP_501_NOT_IMPLEMENTED)
+        review = self.get_object()
+        with transaction.atomic():
+            deleted, _ = Like.objects.filter(user=request.user, review=review).delete()
+        if not deleted:
+            return Response({"detail": "You have not liked this review."}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"detail": "Review unliked."})
     
-    # TODO: Add endpoint to list comments on a review
-    @action(detail=True, methods=['get'])
+    @action(detail=False, methods=['post'], url_path='batch-like',
+            permission_classes=[permissions.IsAuthenticated], throttle_scope='like')
+    def batch_like(self, request):
+        """
+        Like every review in ``ids`` in one transaction.
+        """
+        serializer = BatchIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = batch.like_reviews(request.user, serializer.validated_data['ids'])
+        return Response({"results": results})
+    
+    @action(detail=False, methods=['post'], url_path='batch-unlike',
+            permission_classes=[permissions.IsAuthenticated], throttle_scope='like')
+    def batch_unlike(self, request):
+        """
+        Unlike every review in ``ids`` in one transaction.
+        """
+        serializer = BatchIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = batch.unlike_reviews(request.user, serializer.validated_data['ids'])
+        return Response({"results": results})
+    
+    @action(detail=False, methods=['get'], url_path='trending', url_name='trending')
+    def trending_reviews(self, request):
+        """
+        Get the reviews with the most recent likes and comments, best first.
+
+        Served from the leaderboard rebuilt by ``refresh_trending``; ``limit``
+        caps the results (default 20).
+        """
+        limit = _get_limit_param(request, default=20, maximum=trending.get_settings()['LEADERBOARD_SIZE'])
+        return Response(self.get_serializer(trending.trending_reviews(limit), many=True).data)
+    
+    @action(detail=False, methods=['get'], url_path='search')
+    def full_text_search(self, request):
+        """
+        Search review text for ``q``, best match first, with highlighted snippets.
+
+        Optional ``movie`` restricts the search to one movie's reviews and
+        ``limit`` (at most 50) caps the number of results.
+        """
+        query = request.query_params.get('q', '').strip()
+        movie_id = request.query_params.get('movie')
+        try:
+            limit = min(int(request.query_params.get('limit', 20)), 50)
+            movie_id = int(movie_id) if movie_id else None
+        except ValueError:
+            raise ValidationError({'detail': '`limit` and `movie` must be integers.'})
+        
+        queryset = Review.objects.select_related('user')
+        if search.is_available(queryset.db):
+            hits = search.search_reviews(query, movie_id=movie_id, limit=limit, using=queryset.db)
+            queryset = search.apply_hits(queryset, hits)
+        else:
+            queryset = queryset.filter(text__icontains=query) if query else queryset.none()
+            if movie_id is not None:
+                queryset = queryset.filter(movie_id=movie_id)
+            queryset = queryset.order_by('-timestamp')[:limit]
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
+    
+    @action(detail=True, methods=['get'], serializer_class=CommentSerializer,
+            pagination_class=CommentCursorPagination)
     def comments(self, request, pk=None):
         """
         Get all comments for a specific review.
         """
-        # TODO: Implement comments retrieval logic
-        return Response({"detail": "Not implemented yet"}, status=status.HTTP_501_NOT_IMPLEMENTED)
+        review = self.get_object()
+        queryset = Comment.objects.filter(review=review).select_related('author__profile')
+        return self.get_list_response(queryset)
 
-class CommentViewSet(viewsets.ModelViewSet):
+class CommentViewSet(SparseFieldsViewMixin, CompiledListMixin, viewsets.ModelViewSet):
     """
     ViewSet for viewing and editing comment instances.
     """
-    queryset = Comment.objects.all()
+    # Eager-loading plan: the nested UserSerializer reads comment.author and its profile.
+    queryset = Comment.objects.select_related('author__profile')
     serializer_class = CommentSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsCommentAuthorOrReadOnly]
+    pagination_class = CommentCursorPagination
+    throttle_scope = 'comment'
     
-    # TODO: Override perform_create to set the author
     def perform_create(self, serializer):
         """
         Set the author when creating a comment.
         """
-        # TODO: Implement author assignment
-        pass
+        with transaction.atomic():
+            serializer.save(author=self.request.user)
 
-class LikeViewSet(viewsets.ModelViewSet):
+class LikeViewSet(SparseFieldsViewMixin, CompiledListMixin, viewsets.ModelViewSet):
     """
     ViewSet for viewing and editing like instances.
     """
-    queryset = Like.objects.all()
+    # Eager-loading plan: the nested UserSerializer reads like.user and its profile.
+    queryset = Like.objects.select_related('user__profile').order_by('pk')
     serializer_class = LikeSerializer
     permission_classes = [permissions.IsAuthenticated, CannotLikeTwice]
+    throttle_scope = 'like'
     
-    # TODO: Override perform_create to set the user
     def perform_create(self, serializer):
         """
         Set the user when creating a like.
         """
-        # TODO: Implement user assignment
-        pass
+        try:
+            with transaction.atomic():
+                serializer.save(user=self.request.user)
+        except IntegrityError:
+            raise ValidationError({'non_field_errors': ["You have already liked this review."]})
+
+class ExportView(APIView):
+    """
+    Stream every review, comment or like as NDJSON, one object per line.
+
+    Optional ``movie``, ``user`` and ``since`` (ISO 8601 timestamp) filters
+    let incremental jobs read only new rows; see ``api/exports.py``.
+    """
+    permission_classes = [permissions.IsAdminUser]
+    
+    def get(self, request, kind):
+        if kind not in exports.EXPORTS:
+            raise NotFound(f"Unknown export {kind!r}.")
+        queryset = exports.get_export_queryset(
+            kind,
+            movie=self._get_id_param('movie'),
+            user=self._get_id_param('user'),
+            since=self._get_since_param(),
+        )
+        response = StreamingHttpResponse(exports.iter_ndjson(queryset), content_type=exports.CONTENT_TYPE)
+        response['Content-Disposition'] = f'attachment; filename="{kind}.ndjson"'
+        return response
+    
+    def _get_id_param(self, name):
+        value = self.request.query_params.get(name)
+        if not value:
+            return None
+        try:
+            return int(value)
+        except ValueError:
+            raise ValidationError({name: 'A number is required.'})
+    
+    def _get_since_param(self):
+        value = self.request.query_params.get('since')
+        if not value:
+            return None
+        since = parse_datetime(value)
+        if since is None:
+            raise ValidationError({'since': 'An ISO 8601 timestamp is required.'})
+        if timezone.is_naive(since):
+            since = timezone.make_aware(since)
+        return since
+
+class AvatarVariantView(APIView):
+    """
+    Redirect to a profile picture variant, generating it on its first request.
+
+    Serializers link here until a variant is built; see ``api/thumbnails.py``.
+    """
+    # Linked from <img> tags, which send no credentials.
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+    
+    def get(self, request, key, variant, extension):
+        url = thumbnails.ensure_variant(key, variant, extension)
+        if url is None:
+            raise NotFound("Unknown picture or variant.")
+        return HttpResponseRedirect(url)
+
+class JobStatsView(APIView):
+    """
+    Background job queue depth, lag and throughput; see ``api/jobs.py``.
+    """
+    permission_classes = [permissions.IsAdminUser]
     
-    # TODO: Add validation to prevent multiple likes
+    def get(self, request):
+        return Response(jobs.metrics())
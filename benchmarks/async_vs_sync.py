@@ -0,0 +1,196 @@
+"""
+Compare the async read endpoints under ASGI with their sync twins under WSGI.
+
+Drives ``flickfeed.asgi.application`` from one event loop and
+``flickfeed.wsgi.application`` from a pool of threads, keeping
+``--concurrency`` requests in flight against the existing database, and
+reports throughput and p50/p95/p99 latency per endpoint. The response
+cache is disabled so both paths hit the database. ``--db-latency-ms``
+sleeps before every query to stand in for a remote database server.
+
+    python benchmarks/async_vs_sync.py [--concurrency 50] [--requests 500]
+        [--db-latency-ms 0] [--username alice] [--endpoint movies ...]
+"""
+import argparse
+import asyncio
+import io
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'flickfeed.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.contrib.auth.models import User  # noqa: E402
+from django.db.backends.signals import connection_created  # noqa: E402
+from django.test import override_settings  # noqa: E402
+from rest_framework_simplejwt.tokens import AccessToken  # noqa: E402
+
+from api.models import Movie, Review  # noqa: E402
+from flickfeed.asgi import application as asgi_application  # noqa: E402
+from flickfeed.wsgi import application as wsgi_application  # noqa: E402
+
+HOST = 'localhost'
+
+
+def endpoints(username):
+    """
+    Return ``{name: (sync path, async path, needs token)}`` for the existing data.
+    """
+    movie = Movie.objects.order_by('pk').first()
+    review = Review.objects.order_by('pk').first()
+    paths = {'movies': ('/api/movies/', '/api/async/movies/', False)}
+    if movie is not None:
+        paths['movie'] = (f'/api/movies/{movie.pk}/', f'/api/async/movies/{movie.pk}/', False)
+        paths['reviews'] = (f'/api/movies/{movie.pk}/reviews/', f'/api/async/movies/{movie.pk}/reviews/', False)
+    if review is not None:
+        paths['comments'] = (f'/api/reviews/{review.pk}/comments/', f'/api/async/reviews/{review.pk}/comments/', False)
+    if username:
+        paths['feed'] = ('/api/profiles/feed/', '/api/async/profiles/feed/', True)
+    return paths
+
+
+def add_latency(delay):
+    def sleep_then_execute(execute, sql, params, many, context):
+        time.sleep(delay)
+        return execute(sql, params, many, context)
+
+    def install(sender, connection, **kwargs):
+        connection.execute_wrappers.append(sleep_then_execute)
+
+    connection_created.connect(install, weak=False)
+
+
+def percentile(timings, fraction):
+    return timings[min(len(timings) - 1, int(len(timings) * fraction))]
+
+
+def report(label, timings, elapsed, errors):
+    timings.sort()
+    print(
+        f"  {label:<5} {len(timings) / elapsed:8.1f} req/s"
+        f"  p50 {percentile(timings, 0.50):7.1f} ms"
+        f"  p95 {percentile(timings, 0.95):7.1f} ms"
+        f"  p99 {percentile(timings, 0.99):7.1f} ms"
+        f"{f'  {errors} errors' if errors else ''}"
+    )
+
+
+def wsgi_request(path, token):
+    environ = {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': path,
+        'QUERY_STRING': '',
+        'SERVER_NAME': HOST,
+        'SERVER_PORT': '80',
+        'HTTP_HOST': HOST,
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': sys.stderr,
+        'wsgi.url_scheme': 'http',
+        'wsgi.version': (1, 0),
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    if token:
+        environ['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+    statuses = []
+    start = time.perf_counter()
+    body = wsgi_application(environ, lambda status, headers: statuses.append(status))
+    try:
+        for _ in body:
+            pass
+    finally:
+        body.close()
+    return (time.perf_counter() - start) * 1000, statuses[0].startswith('200')
+
+
+def run_wsgi(path, token, concurrency, total):
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        start = time.perf_counter()
+        results = list(pool.map(lambda _: wsgi_request(path, token), range(total)))
+        elapsed = time.perf_counter() - start
+    return [timing for timing, _ in results], elapsed, sum(not ok for _, ok in results)
+
+
+async def asgi_request(path, token):
+    headers = [(b'host', HOST.encode())]
+    if token:
+        headers.append((b'authorization', f'Bearer {token}'.encode()))
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': b'',
+        'root_path': '',
+        'headers': headers,
+        'server': (HOST, 80),
+        'client': ('127.0.0.1', 0),
+    }
+    statuses = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            statuses.append(message['status'])
+
+    start = time.perf_counter()
+    await asgi_application(scope, receive, send)
+    return (time.perf_counter() - start) * 1000, statuses[0] == 200
+
+
+async def run_asgi(path, token, concurrency, total):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded():
+        async with semaphore:
+            return await asgi_request(path, token)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(bounded() for _ in range(total)))
+    elapsed = time.perf_counter() - start
+    return [timing for timing, _ in results], elapsed, sum(not ok for _, ok in results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--concurrency', type=int, default=50, help="Requests in flight at once.")
+    parser.add_argument('--requests', type=int, default=500, help="Requests per endpoint and server.")
+    parser.add_argument('--db-latency-ms', type=float, default=0, help="Delay added before every query.")
+    parser.add_argument('--username', help="Authenticate as this user; required for the feed.")
+    parser.add_argument('--endpoint', action='append', help="Only run these endpoints (repeatable).")
+    options = parser.parse_args()
+
+    token = None
+    if options.username:
+        token = str(AccessToken.for_user(User.objects.get(username=options.username)))
+    paths = endpoints(options.username)
+    if options.db_latency_ms:
+        add_latency(options.db_latency_ms / 1000)
+
+    print(f"concurrency {options.concurrency}, {options.requests} requests, "
+          f"+{options.db_latency_ms:g} ms per query")
+    with override_settings(RESPONSE_CACHE={'ENABLED': False}):
+        for name, (sync_path, async_path, needs_token) in paths.items():
+            if options.endpoint and name not in options.endpoint:
+                continue
+            request_token = token if needs_token or options.username else None
+            print(name)
+            report('wsgi', *run_wsgi(sync_path, request_token, options.concurrency, options.requests))
+            report('asgi', *asyncio.run(run_asgi(async_path, request_token, options.concurrency, options.requests)))
+
+
+if __name__ == '__main__':
+    main()
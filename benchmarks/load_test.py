@@ -0,0 +1,254 @@
+"""
+Drive the read endpoints of a running server with concurrent clients.
+
+Each client repeatedly picks an endpoint from a weighted mix (movie list,
+movie detail, movie reviews, review comments, feed, trending) and requests
+it as one of the generated users. Reports throughput, p50/p95/p99 latency
+and queries per request for each endpoint; query counts come from the
+``X-Query-Count`` header, which ``QueryBudgetMiddleware`` only adds while
+``DEBUG`` is on. ``--output`` saves the results as JSON, and ``--compare``
+prints the change against an earlier run, e.g. one from another commit.
+
+    python manage.py generate_dataset --users 10000 --movies 2000
+    python manage.py runserver
+    python benchmarks/load_test.py [--base-url http://127.0.0.1:8000] [--concurrency 20]
+        [--duration 30] [--output run.json] [--compare baseline.json]
+"""
+import argparse
+import json
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+# Endpoint name: (relative weight, whether it needs an authenticated user).
+MIX = {
+    'movie_list': (25, False),
+    'movie_detail': (20, False),
+    'movie_reviews': (15, False),
+    'review_comments': (10, False),
+    'feed': (25, True),
+    'trending': (5, False),
+}
+
+
+class Client:
+    def __init__(self, base_url, timeout):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def request(self, path, token=None, body=None):
+        """
+        Return ``(status, headers, parsed body or None)``.
+        """
+        headers = {'Accept': 'application/json'}
+        data = None
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        if body is not None:
+            headers['Content-Type'] = 'application/json'
+            data = json.dumps(body).encode()
+        request = urllib.request.Request(self.base_url + path, data=data, headers=headers)
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return response.status, response.headers, json.loads(response.read() or b'null')
+        except urllib.error.HTTPError as exc:
+            exc.read()
+            return exc.code, exc.headers, None
+
+
+def discover(client, prefix, password, users, movies):
+    """
+    Log in as up to ``users`` generated users and collect movie and review ids.
+    """
+    tokens = []
+    for index in range(users):
+        status, _, body = client.request('/api/token/', body={'username': f'{prefix}{index}', 'password': password})
+        if status == 200:
+            tokens.append(body['access'])
+    if not tokens:
+        sys.exit(f"Could not log in as {prefix}0; run generate_dataset first or pass --prefix/--password.")
+
+    movie_ids = []
+    page = 1
+    while len(movie_ids) < movies:
+        status, _, body = client.request(f'/api/movies/?ordering=-review_count&page={page}', tokens[0])
+        if status != 200:
+            break
+        movie_ids.extend(movie['id'] for movie in body['results'])
+        if not body['next']:
+            break
+        page += 1
+    if not movie_ids:
+        sys.exit("No movies found.")
+
+    review_ids = []
+    for movie_id in movie_ids[:20]:
+        status, _, body = client.request(f'/api/movies/{movie_id}/reviews/', tokens[0])
+        if status == 200:
+            review_ids.extend(review['id'] for review in body['results'])
+    return tokens, movie_ids, review_ids
+
+
+def pick_path(name, rng, movie_ids, review_ids):
+    if name == 'movie_list':
+        return f'/api/movies/?page={rng.randint(1, 5)}'
+    if name == 'movie_detail':
+        return f'/api/movies/{rng.choice(movie_ids)}/'
+    if name == 'movie_reviews':
+        return f'/api/movies/{rng.choice(movie_ids)}/reviews/'
+    if name == 'review_comments':
+        return f'/api/reviews/{rng.choice(review_ids)}/comments/'
+    if name == 'feed':
+        return '/api/profiles/feed/'
+    return '/api/movies/trending/'
+
+
+def run(client, options, tokens, movie_ids, review_ids):
+    names = [name for name in MIX if name != 'review_comments' or review_ids]
+    weights = [MIX[name][0] for name in names]
+    samples = []
+    lock = threading.Lock()
+    started = time.perf_counter()
+    record_after = started + options.warmup
+    deadline = record_after + options.duration
+
+    def worker(seed):
+        rng = random.Random(seed)
+        local = []
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, weights)[0]
+            token = rng.choice(tokens)
+            path = pick_path(name, rng, movie_ids, review_ids)
+            start = time.perf_counter()
+            try:
+                status, headers, _ = client.request(path, token)
+                queries = headers.get('X-Query-Count')
+            except OSError:
+                status, queries = 0, None
+            end = time.perf_counter()
+            if start >= record_after:
+                local.append((name, (end - start) * 1000, status, int(queries) if queries else None))
+        with lock:
+            samples.extend(local)
+
+    with ThreadPoolExecutor(max_workers=options.concurrency) as pool:
+        list(pool.map(worker, range(options.seed, options.seed + options.concurrency)))
+    return samples, options.duration
+
+
+def percentile(timings, fraction):
+    return timings[min(len(timings) - 1, int(len(timings) * fraction))]
+
+
+def summarize(samples, elapsed):
+    groups = defaultdict(list)
+    for sample in samples:
+        groups[sample[0]].append(sample)
+        groups['all'].append(sample)
+    results = {}
+    for name, group in sorted(groups.items()):
+        timings = sorted(timing for _, timing, _, _ in group)
+        queries = [count for _, _, _, count in group if count is not None]
+        results[name] = {
+            'requests': len(group),
+            'errors': sum(1 for _, _, status, _ in group if not 200 <= status < 400),
+            'throughput': round(len(group) / elapsed, 2),
+            'p50_ms': round(percentile(timings, 0.50), 2),
+            'p95_ms': round(percentile(timings, 0.95), 2),
+            'p99_ms': round(percentile(timings, 0.99), 2),
+            'max_ms': round(timings[-1], 2),
+            'queries_per_request': round(statistics.fmean(queries), 2) if queries else None,
+        }
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results, baseline=None):
+    print(f"{'endpoint':<16}{'reqs':>7}{'err':>5}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'queries':>9}")
+    for name, row in results.items():
+        queries = '-' if row['queries_per_request'] is None else f"{row['queries_per_request']:.1f}"
+        print(
+            f"{name:<16}{row['requests']:>7}{row['errors']:>5}{row['throughput']:>9.1f}"
+            f"{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}{queries:>9}"
+        )
+    if not baseline:
+        return
+    print(f"\nChange against {baseline['commit'] or 'baseline'} ({baseline['started_at']}):")
+    for name, row in results.items():
+        before = baseline['results'].get(name)
+        if not before:
+            continue
+        changes = []
+        for key, label in (('throughput', 'req/s'), ('p95_ms', 'p95'), ('p99_ms', 'p99')):
+            if before[key]:
+                changes.append(f"{label} {(row[key] - before[key]) / before[key]:+.0%}")
+        if row['queries_per_request'] is not None and before['queries_per_request'] is not None:
+            changes.append(f"queries {row['queries_per_request'] - before['queries_per_request']:+.1f}")
+        print(f"{name:<16}{'  '.join(changes)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+    parser.add_argument('--concurrency', type=int, default=20, help="Concurrent clients.")
+    parser.add_argument('--duration', type=float, default=30, help="Seconds to measure for.")
+    parser.add_argument('--warmup', type=float, default=5, help="Seconds of requests to discard first.")
+    parser.add_argument('--users', type=int, default=50, help="Generated users to log in as.")
+    parser.add_argument('--movies', type=int, default=200, help="Movies to spread detail requests over.")
+    parser.add_argument('--prefix', default='loaduser', help="Username prefix given to generate_dataset.")
+    parser.add_argument('--password', default='loadtest123', help="Password given to generate_dataset.")
+    parser.add_argument('--timeout', type=float, default=30, help="Per-request timeout in seconds.")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Write the results to this JSON file.")
+    parser.add_argument('--compare', help="JSON results of an earlier run to compare against.")
+    options = parser.parse_args()
+
+    client = Client(options.base_url, options.timeout)
+    tokens, movie_ids, review_ids = discover(client, options.prefix, options.password, options.users, options.movies)
+    print(f"{len(tokens)} users, {len(movie_ids)} movies, {len(review_ids)} reviews; "
+          f"{options.concurrency} clients for {options.duration:g}s")
+    started_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
+    samples, elapsed = run(client, options, tokens, movie_ids, review_ids)
+    if not samples:
+        sys.exit("No requests completed.")
+    results = summarize(samples, elapsed)
+
+    baseline = None
+    if options.compare:
+        with open(options.compare) as file:
+            baseline = json.load(file)
+    print_results(results, baseline)
+
+    if options.output:
+        report = {
+            'commit': git_commit(),
+            'started_at': started_at,
+            'base_url': options.base_url,
+            'concurrency': options.concurrency,
+            'duration': options.duration,
+            'results': results,
+        }
+        with open(options.output, 'w') as file:
+            json.dump(report, file, indent=2)
+            file.write('\n')
+        print(f"\nWrote {options.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Compare response encoders on real endpoint payloads.
+
+Fetches the data of the feed, movie list, movie reviews, review comments
+and review list pages (``--page-size`` rows, response cache disabled) from
+the existing database, then encodes each payload ``--repeat`` times with
+DRF's stdlib ``JSONRenderer``, ``FastJSONRenderer`` (orjson, when
+installed) and ``MessagePackRenderer`` (when msgpack is installed).
+Reports the mean encode time, the body size and the gzipped size.
+
+    python benchmarks/renderers.py [--page-size 100] [--repeat 200] [--username loaduser0]
+"""
+import argparse
+import gzip
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'flickfeed.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.contrib.auth.models import User  # noqa: E402
+from django.test import Client, override_settings  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+from rest_framework_simplejwt.tokens import AccessToken  # noqa: E402
+
+from api import renderers  # noqa: E402
+from api.models import Movie, Review  # noqa: E402
+
+
+def payloads(username, page_size):
+    """
+    Return ``{endpoint: response data}`` for the busiest movie and review.
+    """
+    user = User.objects.get(username=username) if username else User.objects.order_by('pk').first()
+    client = Client(HTTP_HOST='localhost', HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+    movie = Movie.objects.order_by('-rating_stats__rating_count').first()
+    review = Review.objects.order_by('-comments_count').first()
+    paths = {
+        'feed': f'/api/profiles/feed/?page_size={page_size}',
+        'reviews': f'/api/reviews/?page_size={page_size}',
+        'movies': f'/api/movies/?ordering=-review_count',
+    }
+    if movie is not None:
+        paths['movie_reviews'] = f'/api/movies/{movie.pk}/reviews/?page_size={page_size}'
+    if review is not None:
+        paths['comments'] = f'/api/reviews/{review.pk}/comments/?page_size={page_size}'
+    data = {}
+    with override_settings(RESPONSE_CACHE={'ENABLED': False}):
+        for name, path in paths.items():
+            response = client.get(path)
+            if response.status_code == 200:
+                data[name] = response.data
+            else:
+                print(f"{name}: {path} answered {response.status_code}, skipped")
+    return data
+
+
+def encoders():
+    found = {'json': JSONRenderer()}
+    if renderers.orjson is not None:
+        found['orjson'] = renderers.FastJSONRenderer()
+    if renderers.msgpack is not None:
+        found['msgpack'] = renderers.MessagePackRenderer()
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--page-size', type=int, default=100, help="Rows per list page.")
+    parser.add_argument('--repeat', type=int, default=200, help="Encodes per payload and format.")
+    parser.add_argument('--username', help="User whose feed is encoded (default: the first user).")
+    options = parser.parse_args()
+
+    formats = encoders()
+    print(f"{'endpoint':<15}{'format':<9}{'encode µs':>11}{'speedup':>9}{'bytes':>9}{'gzipped':>9}")
+    for name, data in payloads(options.username, options.page_size).items():
+        baseline = None
+        for label, renderer in formats.items():
+            body = renderer.render(data, renderer.media_type)
+            started = time.perf_counter()
+            for _ in range(options.repeat):
+                renderer.render(data, renderer.media_type)
+            elapsed = (time.perf_counter() - started) / options.repeat * 1e6
+            baseline = baseline or elapsed
+            print(f"{name:<15}{label:<9}{elapsed:>11.1f}{baseline / elapsed:>8.1f}x"
+                  f"{len(body):>9}{len(gzip.compress(body)):>9}")
+
+
+if __name__ == '__main__':
+    main()
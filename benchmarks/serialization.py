@@ -0,0 +1,110 @@
+"""
+Compare DRF serializers with their compiled form on list pages.
+
+For the list querysets of reviews, comments, movies and likes, fetches a
+page of ``--rows`` rows and serializes it ``--repeat`` times both ways:
+``serializer``, instances through the DRF serializer (with the ``only()``
+trimming of ``api/fieldsets.py``), and ``compiled``, ``.values()`` rows
+through ``api/fastserializers.py``. Reports rows per second including the
+query and for serialization alone, and checks that both render to the same
+JSON bytes. Run it against a database filled by ``generate_dataset``.
+
+    python benchmarks/serialization.py [--rows 100] [--repeat 50] [--fields id,rating,user.username]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'flickfeed.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+from rest_framework.request import Request  # noqa: E402
+from rest_framework.test import APIRequestFactory  # noqa: E402
+
+from api.fastserializers import compile_serializer  # noqa: E402
+from api.fieldsets import optimize_queryset  # noqa: E402
+from api.views import ReviewViewSet, CommentViewSet, MovieViewSet, LikeViewSet  # noqa: E402
+
+VIEWSETS = {
+    'reviews': ReviewViewSet,
+    'comments': CommentViewSet,
+    'movies': MovieViewSet,
+    'likes': LikeViewSet,
+}
+
+
+def measure(function, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    return time.perf_counter() - started, result
+
+
+def run(name, viewset, options):
+    query = f'?fields={options.fields}' if options.fields else ''
+    request = Request(APIRequestFactory().get(f'/api/{name}/{query}'))
+    view = viewset(request=request, action='list', args=(), kwargs={}, format_kwarg=None)
+    queryset = view.get_queryset()
+    serializer_class = view.get_serializer_class()
+    context = view.get_serializer_context()
+    ordering = [field.lstrip('-') for field in getattr(view.pagination_class, 'ordering', None) or ()]
+
+    serializer = serializer_class(context=context)
+    compiled = compile_serializer(serializer, queryset)
+    if compiled is None:
+        print(f"{name:<10}not compilable")
+        return
+    instances = optimize_queryset(queryset, serializer, extra=ordering)[:options.rows]
+    rows = compiled.rows(queryset, extra=ordering)[:options.rows]
+
+    def with_serializer(page=None):
+        return serializer_class(list(instances) if page is None else page, many=True, context=context).data
+
+    def with_compiled(page=None):
+        return compiled.represent(list(rows) if page is None else page)
+
+    loaded_instances, loaded_rows = list(instances), list(rows)
+    count = len(loaded_rows)
+    if not count:
+        print(f"{name:<10}no rows")
+        return
+    renderer = JSONRenderer()
+    same = renderer.render(with_serializer(loaded_instances)) == renderer.render(with_compiled(loaded_rows))
+
+    results = [
+        measure(with_serializer, options.repeat)[0],
+        measure(with_compiled, options.repeat)[0],
+        measure(lambda: with_serializer(loaded_instances), options.repeat)[0],
+        measure(lambda: with_compiled(loaded_rows), options.repeat)[0],
+    ]
+    rates = [count * options.repeat / elapsed for elapsed in results]
+    print(
+        f"{name:<10}{count:>6}{rates[0]:>14,.0f}{rates[1]:>14,.0f}{rates[1] / rates[0]:>8.1f}x"
+        f"{rates[2]:>14,.0f}{rates[3]:>14,.0f}{rates[3] / rates[2]:>8.1f}x{'yes' if same else 'NO':>10}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100, help="Rows per page.")
+    parser.add_argument('--repeat', type=int, default=50, help="Pages serialized per measurement.")
+    parser.add_argument('--fields', help="A ?fields= value applied to every endpoint.")
+    parser.add_argument('--endpoint', action='append', help="Only run these endpoints (repeatable).")
+    options = parser.parse_args()
+
+    print(f"{'':<16}{'with query, rows/s':^36}{'serialize only, rows/s':^36}")
+    print(f"{'endpoint':<10}{'rows':>6}{'serializer':>14}{'compiled':>14}{'':>9}"
+          f"{'serializer':>14}{'compiled':>14}{'':>9}{'same JSON':>10}")
+    for name, viewset in VIEWSETS.items():
+        if not options.endpoint or name in options.endpoint:
+            run(name, viewset, options)
+
+
+if __name__ == '__main__':
+    main()
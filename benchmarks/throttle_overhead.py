@@ -0,0 +1,76 @@
+"""
+Measure the per-request overhead of the token-bucket throttles.
+
+Runs both throttles of a write endpoint (user and IP buckets) against each
+backend and reports the mean and p99 cost of ``allow_request``. Exits with
+status 1 if any p99 exceeds the budget.
+
+    python benchmarks/throttle_overhead.py [--iterations 20000] [--budget-us 1000]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'flickfeed.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.contrib.auth.models import User  # noqa: E402
+from django.test import override_settings  # noqa: E402
+from rest_framework.request import Request  # noqa: E402
+from rest_framework.test import APIRequestFactory  # noqa: E402
+
+from api import throttling  # noqa: E402
+
+
+class View:
+    throttle_scope = 'like'
+
+
+def measure(iterations, users):
+    factory = APIRequestFactory()
+    throttles = [throttling.UserTokenBucketThrottle(), throttling.IPTokenBucketThrottle()]
+    view = View()
+    requests = []
+    for index in range(users):
+        raw = factory.post('/api/reviews/1/like/', REMOTE_ADDR=f'10.0.{index // 256}.{index % 256}')
+        user = User(pk=index + 1, username=f'bench{index}')
+        request = Request(raw)
+        request._user = user
+        requests.append(request)
+
+    timings = []
+    for iteration in range(iterations):
+        request = requests[iteration % users]
+        start = time.perf_counter()
+        for throttle in throttles:
+            throttle.allow_request(request, view)
+        timings.append((time.perf_counter() - start) * 1_000_000)
+    timings.sort()
+    return statistics.fmean(timings), timings[int(len(timings) * 0.99)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=20000)
+    parser.add_argument('--users', type=int, default=1000, help="Distinct users and IPs to spread requests over.")
+    parser.add_argument('--budget-us', type=float, default=1000, help="Allowed p99 overhead in microseconds.")
+    options = parser.parse_args()
+
+    failed = False
+    for backend in ('local', 'cache'):
+        with override_settings(TOKEN_BUCKET={'BACKEND': backend, 'CACHE_ALIAS': 'default'}):
+            mean, p99 = measure(options.iterations, options.users)
+        over = p99 > options.budget_us
+        failed |= over
+        print(f"{backend:>6}: mean {mean:7.1f} us  p99 {p99:7.1f} us{'  OVER BUDGET' if over else ''}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 from pathlib import Path
+from importlib.util import find_spec
 import os
 from datetime import timedelta
 from dotenv import load_dotenv
@@ -55,12 +56,18 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # Server-Timing breakdown and sampled cProfile dumps; see api/profiling.py.
+    'api.middleware.ProfilingMiddleware',
+    # Safe requests read from replicas, if any are configured.
+    'api.middleware.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # Development only: counts queries per request, inactive unless DEBUG.
+    'api.middleware.QueryBudgetMiddleware',
 ]
 
 ROOT_URLCONF = 'flickfeed.urls'
@@ -86,13 +93,71 @@ WSGI_APPLICATION = 'flickfeed.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Connections persist for CONN_MAX_AGE seconds. PRAGMAS are applied to every
+# new SQLite connection (api/replicas.py): WAL lets readers run alongside the
+# writer, and busy_timeout makes writers queue instead of failing.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'cache_size': -20000,
+    'temp_store': 'MEMORY',
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': int(os.getenv('DATABASE_CONN_MAX_AGE', '60')),
+        'CONN_HEALTH_CHECKS': True,
+        'PRAGMAS': SQLITE_PRAGMAS,
     }
 }
 
+# Read replicas: comma-separated SQLite files, e.g. DATABASE_REPLICAS=db-replica.sqlite3,
+# refreshed from the primary with `manage.py sync_replicas`. Replicas are
+# read-only and mirror the default database in tests.
+for index, name in enumerate(filter(None, os.getenv('DATABASE_REPLICAS', '').split(',')), start=1):
+    DATABASES[f'replica{index}'] = {
+        **DATABASES['default'],
+        'NAME': BASE_DIR / name.strip(),
+        'PRAGMAS': {
+            **{key: value for key, value in SQLITE_PRAGMAS.items() if key != 'journal_mode'},
+            'query_only': 'ON',
+        },
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['api.replicas.ReplicaRouter']
+
+REPLICA_ROUTING = {
+    'PIN_SECONDS': 5,
+    'MAX_LAG_SECONDS': 10,
+    'CACHE_ALIAS': 'default',
+}
+
+
+# Caches
+# The response cache backend is pluggable: LocMem by default (and in tests),
+# e.g. FileBasedCache or Redis in production via the environment.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'responses': {
+        'BACKEND': os.getenv('RESPONSE_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('RESPONSE_CACHE_LOCATION', 'flickfeed-responses'),
+    },
+}
+
+# Versioned read-through cache for catalog endpoints (api/responsecache.py)
+RESPONSE_CACHE = {
+    'ALIAS': 'responses',
+    'TIMEOUT': 300,
+    'ENABLED': True,
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -115,13 +180,50 @@ AUTH_PASSWORD_VALIDATORS = [
 # Django Rest Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # orjson-backed JSON (stdlib without orjson), and MessagePack for clients
+    # asking for application/msgpack when msgpack is installed; see api/renderers.py.
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        *(['api.renderers.MessagePackRenderer'] if find_spec('msgpack') else []),
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.renderers.FastJSONParser',
+        *(['api.renderers.MessagePackParser'] if find_spec('msgpack') else []),
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    # Large timestamp-ordered lists (reviews, comments, feeds) override this
+    # with the keyset paginators in api/pagination.py.
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
-    'PAGE_SIZE': 10
+    'PAGE_SIZE': 10,
+    # Token buckets for write endpoints, per user ('<scope>') and per client
+    # IP ('<scope>_ip'); views pick a scope with `throttle_scope`.
+    'DEFAULT_THROTTLE_CLASSES': [
+        'api.throttling.UserTokenBucketThrottle',
+        'api.throttling.IPTokenBucketThrottle',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'like': '60/min',
+        'like_ip': '300/min',
+        'follow': '30/min',
+        'follow_ip': '150/min',
+        'comment': '20/min',
+        'comment_ip': '100/min',
+        'review': '10/min',
+        'review_ip': '50/min',
+    },
+}
+
+# Token bucket storage for api.throttling: 'cache' (shared) or 'local'.
+TOKEN_BUCKET = {
+    'BACKEND': 'cache',
+    'CACHE_ALIAS': 'default',
 }
 
 # JWT settings
@@ -132,6 +234,50 @@ SIMPLE_JWT = {
     'BLACKLIST_AFTER_ROTATION': False,
 }
 
+# In-process cache of authenticated users (api/authentication.py)
+AUTH_USER_CACHE = {
+    'MAX_SIZE': 10000,
+    'TIMEOUT': 60,
+}
+
+# Query budget enforced by api.middleware.QueryBudgetMiddleware (DEBUG only)
+QUERY_BUDGET = {
+    'MAX_QUERIES': 20,
+    'MAX_DUPLICATES': 5,
+    'RAISE': False,
+}
+
+# Per-request profiling (api/profiling.py): Server-Timing on every response,
+# plus cProfile and SQL dumps for a sample of requests and for slow ones.
+# On while DEBUG is; the header reveals query counts, so set ENABLED
+# explicitly to profile a production deployment.
+PROFILING = {
+    'SERVER_TIMING': True,
+    'SAMPLE_RATE': 0.0,
+    'SLOW_THRESHOLD_MS': None,
+    'DUMP_DIR': BASE_DIR / 'profiles',
+}
+
+# Feed settings
+# Authors with at least this many followers are merged into feeds at read time
+# instead of being fanned out to every follower's timeline on write.
+FEED_FANOUT_THRESHOLD = 10000
+# Number of a followee's recent reviews copied into a timeline on follow.
+FEED_BACKFILL_LIMIT = 100
+# Number of recent entries kept in each materialized timeline; older ones are trimmed.
+FEED_TIMELINE_LENGTH = 1000
+
+# Maximum number of ids accepted by the batch like/unlike/follow endpoints.
+BATCH_ACTION_MAX_ITEMS = 100
+
+# Trending leaderboards (api/trending.py), rebuilt by `manage.py refresh_trending`.
+TRENDING = {
+    'WINDOW_HOURS': 7 * 24,
+    'HALF_LIFE_HOURS': 24,
+    'WEIGHTS': {'review_count': 3, 'like_count': 1, 'comment_count': 2},
+    'LEADERBOARD_SIZE': 100,
+}
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -154,6 +300,25 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Profile picture variants; see api/thumbnails.py.
+THUMBNAILS = {
+    'VARIANTS': {'small': 40, 'medium': 128, 'large': 512},
+    'FORMATS': ['webp', 'jpeg'],
+    'QUALITY': 80,
+}
+
+# Background job queue; see api/jobs.py. Jobs run in ``manage.py run_jobs``.
+JOBS = {
+    'EAGER': False,
+    'BATCH_SIZE': 50,
+    'CONCURRENCY': 4,
+    'POOL': 'thread',
+    'LEASE_SECONDS': 300,
+    'MAX_ATTEMPTS': 5,
+    'BACKOFF_SECONDS': 2,
+    'RETENTION_HOURS': 24,
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
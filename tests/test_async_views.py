@@ -0,0 +1,112 @@
+import json
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.test import override_settings
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from api.models import Comment, Movie, Review
+
+
+@override_settings(JOBS={'EAGER': True})
+class AsyncViewTests(APITestCase):
+    """
+    The ``/api/async/`` views answer with the status, body and pagination of the endpoints they mirror.
+    """
+
+    def setUp(self):
+        caches['responses'].clear()
+        self.reader = User.objects.create_user(username='reader')
+        self.users = [User.objects.create_user(username=f'critic{index}') for index in range(3)]
+        for user in self.users[:2]:
+            self.reader.profile.follow(user.profile)
+        self.movies = [
+            Movie.objects.create(
+                title=f'Heist {index}', genre='ACTION' if index % 2 else 'DRAMA', release_year=2000 + index,
+                description='A heist',
+            )
+            for index in range(12)
+        ]
+        for index, (user, movie) in enumerate((user, movie) for user in self.users for movie in self.movies[:3]):
+            Review.objects.create(movie=movie, user=user, text=f'Review {index}', rating=index % 5 + 1)
+        self.review = Review.objects.filter(movie=self.movies[0]).first()
+        for index in range(5):
+            Comment.objects.create(review=self.review, author=self.users[index % 3], text=f'Comment {index}')
+        self.token = str(RefreshToken.for_user(self.reader).access_token)
+
+    def fetch(self, path, method='get', token=None):
+        """
+        Request ``path`` from the sync API and its async mirror; return both responses.
+        """
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        sync = getattr(self.client, method)(f'/api{path}', headers=headers)
+
+        async def request():
+            return await getattr(self.async_client, method)(f'/api/async{path}', headers=headers)
+
+        return sync, async_to_sync(request)()
+
+    def assertSameResponse(self, path, token=None):
+        """
+        Compare one page of both endpoints, then follow their ``next`` links; return the pages.
+        """
+        pages = []
+        while path:
+            sync, asynchronous = self.fetch(path, token=token)
+            self.assertEqual(asynchronous.status_code, sync.status_code)
+            body = json.loads(sync.content)
+            # Links differ only by the mount point.
+            self.assertEqual(json.loads(asynchronous.content.decode().replace('/api/async/', '/api/')), body)
+            pages.append(body)
+            path = body.get('next') if isinstance(body, dict) else None
+            path = path and path.split('/api', 1)[1]
+        return pages
+
+    def test_movie_list_and_detail(self):
+        for path, counts in (
+            ('/movies/', [10, 2]),
+            ('/movies/?genre=ACTION', [6]),
+            ('/movies/?ordering=-average_rating', [10, 2]),
+            ('/movies/?min_reviews=1&ordering=review_count', [3]),
+            ('/movies/?page=2', [2]),
+        ):
+            with self.subTest(path=path):
+                pages = self.assertSameResponse(path)
+                self.assertEqual([len(page['results']) for page in pages], counts)
+        detail = self.assertSameResponse(f'/movies/{self.movies[0].pk}/')[0]
+        self.assertEqual(detail['review_count'], 3)
+
+    def test_review_and_comment_lists_page_alike(self):
+        pages = self.assertSameResponse(f'/movies/{self.movies[0].pk}/reviews/?page_size=2')
+        self.assertEqual([len(page['results']) for page in pages], [2, 1])
+        self.assertIn('avatar', pages[0]['results'][0]['user'])
+        pages = self.assertSameResponse(f'/reviews/{self.review.pk}/comments/?page_size=2')
+        self.assertEqual([len(page['results']) for page in pages], [2, 2, 1])
+        # Walking back from the last page matches too.
+        previous = pages[-1]['previous'].split('/api', 1)[1]
+        self.assertEqual(len(self.assertSameResponse(previous)[0]['results']), 2)
+
+    def test_feed_needs_authentication(self):
+        pages = self.assertSameResponse('/profiles/feed/?page_size=4', token=self.token)
+        self.assertEqual(sum(len(page['results']) for page in pages), 6)
+        self.assertEqual(
+            {review['user']['id'] for page in pages for review in page['results']},
+            {user.pk for user in self.users[:2]},
+        )
+        sync, asynchronous = self.fetch('/profiles/feed/')
+        self.assertEqual((sync.status_code, asynchronous.status_code), (401, 401))
+        self.assertEqual(asynchronous['WWW-Authenticate'], sync['WWW-Authenticate'])
+        self.assertEqual(json.loads(asynchronous.content), json.loads(sync.content))
+
+    def test_errors_match(self):
+        for path in ('/movies/0/', '/movies/0/reviews/', '/reviews/0/comments/'):
+            with self.subTest(path=path):
+                self.assertEqual(self.assertSameResponse(path), [{'detail': 'Not found.'}])
+        self.assertEqual(self.assertSameResponse('/movies/?ordering=title')[0], {
+            'ordering': 'Choose from: average_rating, review_count.',
+        })
+        sync, asynchronous = self.fetch(f'/movies/{self.movies[0].pk}/reviews/', method='post', token=self.token)
+        self.assertEqual((sync.status_code, asynchronous.status_code), (405, 405))
+        self.assertEqual(json.loads(asynchronous.content), json.loads(sync.content))
@@ -0,0 +1,119 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, override_settings
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api import authentication
+from api.authentication import UserCache, user_cache
+from api.querybudget import QueryCounter
+
+
+class Clock:
+    """
+    Stands in for the ``time`` module, moved forward by hand.
+    """
+
+    def __init__(self, now=1_000.0):
+        self.now = now
+
+    def monotonic(self):
+        return self.now
+
+
+class UserCacheTests(SimpleTestCase):
+    """
+    ``UserCache`` entries expire after ``TIMEOUT`` and the least recently used go first.
+    """
+
+    def setUp(self):
+        self.clock = Clock()
+        patcher = mock.patch.object(authentication, 'time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.cache = UserCache()
+
+    @override_settings(AUTH_USER_CACHE={'TIMEOUT': 60})
+    def test_entries_expire(self):
+        self.cache.set(1, None, 'user')
+        self.clock.now += 60
+        self.assertEqual(self.cache.get(1, None), 'user')
+        self.clock.now += 0.1
+        self.assertIsNone(self.cache.get(1, None))
+        self.assertNotIn(1, self.cache._entries)
+
+    @override_settings(AUTH_USER_CACHE={'MAX_SIZE': 2})
+    def test_least_recently_used_entries_are_evicted(self):
+        self.cache.set(1, None, 'first')
+        self.cache.set(2, None, 'second')
+        self.assertEqual(self.cache.get(1, None), 'first')
+        self.cache.set(3, None, 'third')
+        self.assertEqual(list(self.cache._entries), [1, 3])
+        self.assertIsNone(self.cache.get(2, None))
+
+    def test_entries_are_tied_to_the_token_claim(self):
+        self.cache.set(1, 'old-hash', 'user')
+        self.assertIsNone(self.cache.get(1, 'new-hash'))
+        # A mismatch drops the entry, so the old claim misses too.
+        self.assertIsNone(self.cache.get(1, 'old-hash'))
+
+
+class CachedJWTAuthenticationTests(APITestCase):
+    """
+    Cached users are dropped by every change that could turn a success into a 401.
+    """
+
+    def setUp(self):
+        user_cache.clear()
+        self.addCleanup(user_cache.clear)
+        self.user = User.objects.create_user(username='reader', password='first-password')
+        self.authenticate()
+
+    def authenticate(self, token=None):
+        token = token or str(AccessToken.for_user(self.user))
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        return token
+
+    def get(self):
+        return self.client.get('/api/profiles/feed/').status_code
+
+    def assertCached(self, cached=True, claim=None):
+        self.assertEqual(user_cache.get(self.user.pk, claim) is not None, cached)
+
+    def test_saves_drop_the_cached_user(self):
+        self.assertEqual(self.get(), 200)
+        self.assertCached()
+        self.user.save()
+        self.assertCached(False)
+        self.assertEqual(self.get(), 200)
+        self.user.profile.save()
+        self.assertCached(False)
+
+    def test_deactivated_and_deleted_users_are_refused(self):
+        self.assertEqual(self.get(), 200)
+        self.user.is_active = False
+        self.user.save(update_fields=['is_active'])
+        self.assertEqual(self.get(), 401)
+        self.user.is_active = True
+        self.user.save()
+        self.assertEqual(self.get(), 200)
+        self.user.delete()
+        self.assertCached(False)
+        self.assertEqual(self.get(), 401)
+
+    # simplejwt reads its settings once, so override_settings would not reach them.
+    @mock.patch.object(jwt_settings, 'CHECK_REVOKE_TOKEN', True)
+    def test_password_changes_revoke_cached_tokens(self):
+        old_token = self.authenticate()
+        self.assertEqual(self.get(), 200)
+        # Changed without signals, as by another process: the new token's claim still misses.
+        User.objects.filter(pk=self.user.pk).update(password='changed')
+        self.user.refresh_from_db()
+        self.authenticate()
+        with QueryCounter() as counter:
+            self.assertEqual(self.get(), 200)
+        self.assertTrue([sql for sql, _ in counter.queries if 'auth_user' in sql])
+        self.authenticate(old_token)
+        self.assertEqual(self.get(), 401)
@@ -0,0 +1,109 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.test import override_settings
+from rest_framework.test import APITestCase
+
+from api import batch
+from api.models import Like, Movie, Review, TimelineEntry, TrendingBucket, UserProfile
+
+
+# Timeline backfills and trending activity are jobs; run them inline.
+@override_settings(JOBS={'EAGER': True})
+class BatchActionTests(APITestCase):
+    """
+    Batch endpoints report a status per id and count only the rows they wrote.
+    """
+
+    def setUp(self):
+        caches['responses'].clear()
+        self.user = User.objects.create_user(username='viewer')
+        self.client.force_authenticate(self.user)
+        self.authors = [User.objects.create_user(username=f'author{index}') for index in range(3)]
+        self.reviews = [
+            Review.objects.create(
+                movie=Movie.objects.create(
+                    title=f'Heist {index}', genre='ACTION', release_year=2000, description='A heist'
+                ),
+                user=author, text='Great', rating=5,
+            )
+            for index, author in enumerate(self.authors)
+        ]
+
+    def post(self, url, ids):
+        response = self.client.post(url, {'ids': ids}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        return [(result['id'], result['status']) for result in response.data['results']]
+
+    def likes_counts(self):
+        return list(Review.objects.order_by('pk').values_list('likes_count', flat=True))
+
+    def test_like_reports_mixed_statuses(self):
+        first, second, _ = self.reviews
+        Like.objects.create(user=self.user, review=first)
+        results = self.post('/api/reviews/batch-like/', [first.pk, second.pk, 999, second.pk])
+        self.assertEqual(results, [
+            (first.pk, batch.ALREADY_LIKED), (second.pk, batch.LIKED), (999, batch.NOT_FOUND),
+        ])
+        self.assertEqual(self.likes_counts(), [1, 1, 0])
+        self.assertEqual(TrendingBucket.objects.get(review=second).like_count, 1)
+
+    def test_unlike_reports_mixed_statuses(self):
+        first, second, _ = self.reviews
+        Like.objects.create(user=self.user, review=first)
+        Like.objects.create(user=User.objects.create_user(username='fan'), review=first)
+        results = self.post('/api/reviews/batch-unlike/', [first.pk, second.pk, 999])
+        self.assertEqual(results, [(first.pk, batch.UNLIKED), (second.pk, batch.NOT_LIKED), (999, batch.NOT_FOUND)])
+        self.assertEqual(self.likes_counts(), [1, 0, 0])
+        self.assertEqual(TrendingBucket.objects.get(review=first).like_count, 1)
+        self.assertFalse(Like.objects.filter(user=self.user).exists())
+
+    def test_likes_inserted_concurrently_are_not_counted(self):
+        first, second, _ = self.reviews
+        # As if another request liked ``first`` between the read and the insert.
+        Like.objects.create(user=self.user, review=first)
+        inserted = batch._insert_new(
+            Like, [Like(user=self.user, review_id=review.pk) for review in (first, second)], 'review'
+        )
+        self.assertEqual(inserted, [second.pk])
+        self.assertEqual(batch._insert_new(Like, [Like(user=self.user, review_id=first.pk)], 'review'), [])
+
+    def test_unpinned_django_versions_fall_back_to_bulk_create(self):
+        first, second, _ = self.reviews
+        Like.objects.create(user=self.user, review=first)
+        with mock.patch.object(batch, 'INSERT_RETURNING_VERSIONS', ((0, 0), (0, 0))):
+            inserted = batch._insert_new(
+                Like, [Like(user=self.user, review_id=review.pk) for review in (first, second)], 'review'
+            )
+        # Without RETURNING the skipped conflict is reported as inserted too.
+        self.assertEqual(inserted, [first.pk, second.pk])
+        self.assertEqual(Like.objects.filter(user=self.user).count(), 2)
+
+    def test_follow_reports_mixed_statuses(self):
+        profiles = [author.profile for author in self.authors]
+        self.user.profile.follow(profiles[0])
+        results = self.post(
+            '/api/profiles/batch-follow/', [profiles[0].pk, profiles[1].pk, self.user.profile.pk, 999],
+        )
+        self.assertEqual(results, [
+            (profiles[0].pk, batch.ALREADY_FOLLOWING),
+            (profiles[1].pk, batch.FOLLOWED),
+            (self.user.profile.pk, batch.CANNOT_FOLLOW_SELF),
+            (999, batch.NOT_FOUND),
+        ])
+        counts = dict(UserProfile.objects.values_list('pk', 'follower_count'))
+        self.assertEqual((counts[profiles[0].pk], counts[profiles[1].pk], counts[profiles[2].pk]), (1, 1, 0))
+        self.assertEqual(UserProfile.objects.get(pk=self.user.profile.pk).following_count, 2)
+        self.assertEqual(
+            set(TimelineEntry.objects.filter(user=self.user).values_list('review_id', flat=True)),
+            {self.reviews[0].pk, self.reviews[1].pk},
+        )
+
+    def test_invalid_batches_are_rejected(self):
+        for ids in ([], ['x'], [0], list(range(1, 102))):
+            with self.subTest(ids=ids[:3]):
+                response = self.client.post('/api/reviews/batch-like/', {'ids': ids}, format='json')
+                self.assertEqual(response.status_code, 400)
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.post('/api/reviews/batch-like/', {'ids': [1]}, format='json').status_code, 401)
@@ -0,0 +1,115 @@
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+
+from api import counters
+from api.models import Comment, Like, Movie, Review, UserProfile
+
+
+class CounterTests(TestCase):
+    """
+    Engagement counters follow every write path, survive full saves and are repaired by reconciling.
+    """
+
+    def setUp(self):
+        self.users = [User.objects.create_user(username=f'member{index}') for index in range(4)]
+        self.movie = Movie.objects.create(title='Heist', genre='ACTION', release_year=2000, description='A heist')
+        self.review = Review.objects.create(movie=self.movie, user=self.users[0], text='Great', rating=5)
+
+    def profile(self, index):
+        return UserProfile.objects.get(user=self.users[index])
+
+    def profile_counts(self, index):
+        profile = self.profile(index)
+        return profile.follower_count, profile.following_count, profile.review_count
+
+    def review_counts(self):
+        self.review.refresh_from_db()
+        return self.review.likes_count, self.review.comments_count
+
+    def test_reviews_are_counted_on_their_author(self):
+        other = Review.objects.create(
+            movie=Movie.objects.create(title='Caper', genre='ACTION', release_year=2001, description='A caper'),
+            user=self.users[0], text='Fine', rating=3,
+        )
+        self.assertEqual(self.profile_counts(0), (0, 0, 2))
+        other.rating = 4
+        other.save()
+        self.assertEqual(self.profile_counts(0), (0, 0, 2))
+        other.delete()
+        self.assertEqual(self.profile_counts(0), (0, 0, 1))
+
+    def test_likes_and_comments_are_counted_on_their_review(self):
+        likes = [Like.objects.create(user=user, review=self.review) for user in self.users[1:]]
+        comment = Comment.objects.create(review=self.review, author=self.users[1], text='Agreed')
+        self.assertEqual(self.review_counts(), (3, 1))
+        comment.text = 'Strongly agreed'
+        comment.save()
+        likes[0].delete()
+        Like.objects.filter(pk=likes[1].pk).delete()
+        self.assertEqual(self.review_counts(), (1, 1))
+        self.users[1].delete()
+        self.assertEqual(self.review_counts(), (1, 0))
+
+    def test_follows_are_counted_on_both_profiles(self):
+        follower = self.profile(1)
+        follower.follow(self.profile(0))
+        follower.follow(self.profile(0))
+        follower.following.add(self.profile(2), self.profile(3))
+        self.assertEqual(self.profile_counts(1), (0, 3, 0))
+        self.assertEqual(self.profile_counts(0), (1, 0, 1))
+
+        # Removing an edge that does not exist changes nothing.
+        self.profile(2).unfollow(self.profile(0))
+        follower.unfollow(self.profile(0))
+        self.assertEqual(self.profile_counts(0), (0, 0, 1))
+        self.profile(3).followers.add(self.profile(0))
+        self.assertEqual((self.profile_counts(3)[0], self.profile_counts(0)[1]), (2, 1))
+        self.profile(3).followers.clear()
+        self.assertEqual((self.profile_counts(3)[0], self.profile_counts(0)[1]), (0, 0))
+        self.assertEqual(self.profile_counts(1), (0, 1, 0))
+
+        self.users[1].delete()
+        self.assertEqual(self.profile_counts(2), (0, 0, 0))
+
+    def test_full_saves_keep_counters_written_since_loading(self):
+        review = Review.objects.get(pk=self.review.pk)
+        profile = self.profile(0)
+        Like.objects.create(user=self.users[1], review=self.review)
+        self.profile(1).follow(profile)
+
+        review.text = 'Still great'
+        review.save()
+        profile.bio = 'Critic'
+        profile.save()
+        self.assertEqual(self.review_counts(), (1, 0))
+        self.assertEqual(self.review.text, 'Still great')
+        self.assertEqual(self.profile_counts(0), (1, 0, 1))
+        self.assertEqual(self.profile(0).bio, 'Critic')
+
+        # An explicit update_fields is left alone, so counters can still be written on purpose.
+        review.likes_count = 7
+        review.save(update_fields=['likes_count'])
+        self.assertEqual(self.review_counts(), (7, 0))
+
+    def test_reconcile_repairs_drifted_counters_only(self):
+        Like.objects.create(user=self.users[1], review=self.review)
+        Comment.objects.create(review=self.review, author=self.users[2], text='Agreed')
+        self.profile(1).follow(self.profile(0))
+        Review.objects.filter(pk=self.review.pk).update(likes_count=5, comments_count=0)
+        UserProfile.objects.filter(user=self.users[0]).update(follower_count=0, review_count=9)
+
+        self.assertEqual(counters.reconcile_reviews(batch_size=1), 1)
+        self.assertEqual(counters.reconcile_profiles(batch_size=1), 1)
+        self.assertEqual(self.review_counts(), (1, 1))
+        self.assertEqual(self.profile_counts(0), (1, 0, 1))
+        self.assertEqual(self.profile_counts(1), (0, 1, 0))
+        self.assertEqual((counters.reconcile_reviews(), counters.reconcile_profiles()), (0, 0))
+
+        UserProfile.objects.filter(user=self.users[1]).update(following_count=3)
+        stdout = StringIO()
+        call_command('reconcile_counters', stdout=stdout)
+        self.assertIn('Repaired 0 review(s) and 1 profile(s)', stdout.getvalue())
+        self.assertEqual(self.profile_counts(1), (0, 1, 0))
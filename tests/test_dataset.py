@@ -0,0 +1,73 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.models import F, Sum
+from django.test import TestCase
+from django.utils import timezone
+
+from api import counters, dataset, trending
+from api.models import (
+    Comment, Like, Movie, MovieRatingStats, Review, TimelineEntry, TrendingBucket, TrendingMovie, UserProfile,
+)
+
+
+class DatasetTests(TestCase):
+    """
+    Generated datasets keep their backdated activity and the state the receivers would have written.
+    """
+
+    def generate(self, **options):
+        return dataset.generate(
+            users=30, movies=12, avg_following=4, avg_reviews=4, avg_likes=2, avg_comments=1,
+            days=20, chunk_size=7, **options,
+        )
+
+    def test_generated_rows_match_the_report(self):
+        created = self.generate()
+        self.assertEqual(created, {
+            'users': 30, 'movies': 12, 'follows': UserProfile.following.through.objects.count(),
+            'reviews': Review.objects.count(), 'likes': Like.objects.count(), 'comments': Comment.objects.count(),
+        })
+        self.assertTrue(created['reviews'] and created['likes'] and created['comments'])
+
+    def test_activity_is_backdated(self):
+        started = timezone.now()
+        self.generate()
+        self.assertTrue(Review._meta.get_field('timestamp').auto_now_add)
+        for model in (Review, Like, Comment):
+            with self.subTest(model=model.__name__):
+                self.assertTrue(model.objects.filter(timestamp__lt=started - timedelta(days=1)).exists())
+                self.assertFalse(model.objects.filter(timestamp__lt=started - timedelta(days=20, minutes=1)).exists())
+        for model in (Like, Comment):
+            self.assertFalse(model.objects.filter(timestamp__lt=F('review__timestamp')).exists())
+
+    def test_derived_state_is_rebuilt(self):
+        self.generate()
+        self.assertEqual((counters.reconcile_reviews(), counters.reconcile_profiles()), (0, 0))
+        self.assertEqual(MovieRatingStats.objects.count(), Movie.objects.count())
+        rated = MovieRatingStats.objects.filter(rating_count__gt=0)
+        self.assertEqual(rated.aggregate(total=Sum('rating_count'))['total'], Review.objects.count())
+        self.assertFalse(rated.filter(ratings_changed_at__isnull=True).exists())
+
+        self.assertTrue(TimelineEntry.objects.exists())
+        for profile in UserProfile.objects.all():
+            self.assertEqual(profile.timeline_length, TimelineEntry.objects.filter(user_id=profile.user_id).count())
+
+        cutoff = trending.bucket_hour(timezone.now()) - timedelta(hours=trending.get_settings()['WINDOW_HOURS'])
+        for target, count_field, model in (('review', 'like_count', Like), ('movie', 'review_count', Review)):
+            with self.subTest(count_field=count_field):
+                buckets = TrendingBucket.objects.filter(**{f'{target}__isnull': False})
+                self.assertEqual(
+                    buckets.aggregate(total=Sum(count_field))['total'],
+                    model.objects.filter(timestamp__gte=cutoff).count(),
+                )
+        self.assertTrue(TrendingMovie.objects.exists())
+
+    def test_command_validates_its_options(self):
+        stdout = StringIO()
+        call_command('generate_dataset', '--users', '3', '--movies', '2', '--verbosity', '0', stdout=stdout)
+        self.assertIn('Created 3 users, 2 movies', stdout.getvalue())
+        with self.assertRaisesMessage(CommandError, '--users must be at least 1.'):
+            call_command('generate_dataset', '--users', '0')
@@ -0,0 +1,104 @@
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from api.models import Comment, Like, Movie, Review
+
+
+class ExportTests(APITestCase):
+    """
+    Exports stream one JSON object per row and filter on ``movie``, ``user`` and ``since``.
+    """
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='admin', password='unused')
+        self.client.force_authenticate(self.admin)
+        self.users = [User.objects.create_user(username=f'critic{index}') for index in range(2)]
+        self.movies = [
+            Movie.objects.create(title=f'Heist {index}', genre='ACTION', release_year=2000, description='A heist')
+            for index in range(2)
+        ]
+        self.start = timezone.now() - timedelta(days=1)
+        self.reviews = []
+        for index, (movie, user) in enumerate([(0, 0), (0, 1), (1, 0)]):
+            review = Review.objects.create(movie=self.movies[movie], user=self.users[user], text='Great', rating=4)
+            # Microseconds apart, so a ``since`` has to keep full precision.
+            Review.objects.filter(pk=review.pk).update(timestamp=self.start + timedelta(microseconds=index))
+            self.reviews.append(Review.objects.get(pk=review.pk))
+        for review in self.reviews:
+            Like.objects.create(review=review, user=self.users[1])
+            Comment.objects.create(review=review, author=self.users[0], text='Agreed')
+
+    def export(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        content = b''.join(response.streaming_content)
+        self.assertTrue(content == b'' or content.endswith(b'\n'))
+        return [json.loads(line) for line in content.splitlines()]
+
+    def test_rows_are_streamed_in_primary_key_order(self):
+        rows = self.export('/api/export/reviews/')
+        self.assertEqual([row['id'] for row in rows], [review.pk for review in self.reviews])
+        self.assertEqual(set(rows[0]), {
+            'id', 'movie_id', 'user_id', 'text', 'rating', 'timestamp', 'likes_count', 'comments_count',
+        })
+        self.assertEqual((rows[0]['likes_count'], rows[0]['comments_count']), (1, 1))
+        likes = self.export('/api/export/likes/')
+        self.assertEqual(set(likes[0]), {'id', 'review_id', 'movie_id', 'user_id', 'timestamp'})
+
+    def test_since_keeps_rows_strictly_after_it(self):
+        rows = self.export('/api/export/reviews/')
+        since = rows[0]['timestamp']
+        self.assertEqual(since, self.reviews[0].timestamp.isoformat())
+        newer = self.export(f'/api/export/reviews/?since={since.replace("+", "%2B")}')
+        self.assertEqual([row['id'] for row in newer], [review.pk for review in self.reviews[1:]])
+        self.assertEqual(self.export(f'/api/export/reviews/?since={rows[-1]["timestamp"].replace("+", "%2B")}'), [])
+        # Naive timestamps are read in the server's time zone.
+        naive = timezone.make_naive(self.reviews[1].timestamp).isoformat()
+        self.assertEqual([row['id'] for row in self.export(f'/api/export/reviews/?since={naive}')], [self.reviews[2].pk])
+
+    def test_movie_and_user_filters_follow_each_kind(self):
+        movie = self.movies[0].pk
+        for kind in ('reviews', 'comments', 'likes'):
+            with self.subTest(kind=kind):
+                rows = self.export(f'/api/export/{kind}/?movie={movie}')
+                self.assertEqual(len(rows), 2)
+                self.assertEqual({row['movie_id'] for row in rows}, {movie})
+        rows = self.export(f'/api/export/reviews/?movie={movie}&user={self.users[1].pk}')
+        self.assertEqual([row['id'] for row in rows], [self.reviews[1].pk])
+        self.assertEqual(len(self.export(f'/api/export/comments/?user={self.users[1].pk}')), 0)
+
+    def test_invalid_requests_are_rejected(self):
+        for url, status in (
+            ('/api/export/users/', 404),
+            ('/api/export/reviews/?movie=x', 400),
+            ('/api/export/reviews/?since=yesterday', 400),
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, status)
+        self.client.force_authenticate(self.users[0])
+        self.assertEqual(self.client.get('/api/export/reviews/').status_code, 403)
+
+    def test_command_writes_the_same_rows(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'likes.ndjson')
+        stderr = StringIO()
+        call_command(
+            'export_ndjson', 'likes', '--movie', str(self.movies[0].pk), '--chunk-size', '1',
+            '--output', path, stderr=stderr,
+        )
+        self.assertIn(f'Exported 2 likes to {path}.', stderr.getvalue())
+        with open(path, 'rb') as file:
+            rows = [json.loads(line) for line in file]
+        self.assertEqual(rows, self.export(f'/api/export/likes/?movie={self.movies[0].pk}'))
@@ -0,0 +1,57 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.test import override_settings
+from rest_framework.test import APITestCase
+
+from api import search
+from api.models import Movie, MovieRatingStats, Review, Comment, Like
+
+
+# The feed is filled by jobs; run them as the fixtures are written.
+@override_settings(JOBS={'EAGER': True})
+class CompiledSerializerTests(APITestCase):
+    """
+    Compiled list pages must render exactly what the serializers render.
+    """
+
+    def setUp(self):
+        caches['responses'].clear()
+        # Test databases are created without migrations, so without the FTS5 index.
+        search.install()
+        self.user = User.objects.create_user(username='viewer', password='testpass123', first_name='Vi')
+        author = User.objects.create_user(username='author', email='author@example.com')
+        self.user.profile.follow(author.profile)
+        self.movie = Movie.objects.create(
+            title='Heist', genre='ACTION', release_year=2000, description='A heist', poster_url='http://x.test/p.jpg'
+        )
+        unrated = Movie.objects.create(title='Quiet', genre='DRAMA', release_year=2001, description='Calm')
+        MovieRatingStats.objects.filter(movie=unrated).delete()
+        for rating, user in ((4, self.user), (3, author)):
+            review = Review.objects.create(movie=self.movie, user=user, text='Fine', rating=rating)
+            Comment.objects.create(review=review, author=author, text='Agreed')
+            Like.objects.create(review=review, user=self.user)
+        self.review = review
+        self.client.force_authenticate(self.user)
+
+    def assertSameAsSerializer(self, url):
+        compiled = self.client.get(url)
+        self.assertEqual(compiled.status_code, 200, compiled.data)
+        caches['responses'].clear()
+        with mock.patch('api.fastserializers.compile_serializer', return_value=None) as compile_serializer:
+            expected = self.client.get(url)
+        compile_serializer.assert_called()
+        self.assertEqual(compiled.content, expected.content, url)
+
+    def test_list_endpoints(self):
+        for url in (
+            '/api/reviews/', '/api/comments/', '/api/likes/', '/api/movies/', '/api/movies/?ordering=-average_rating',
+            f'/api/movies/{self.movie.pk}/reviews/', f'/api/reviews/{self.review.pk}/comments/', '/api/profiles/feed/',
+            '/api/reviews/?page_size=1', '/api/comments/?expand=review.movie', '/api/movies/?fields=id,review_count',
+            '/api/async/movies/', f'/api/async/movies/{self.movie.pk}/reviews/',
+        ):
+            self.assertSameAsSerializer(url)
+
+    def test_search_annotations(self):
+        self.assertSameAsSerializer('/api/movies/?search=heist')
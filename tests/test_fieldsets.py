@@ -0,0 +1,71 @@
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from api.models import Movie, Review, Comment
+
+
+class SparseFieldsetTests(APITestCase):
+    """
+    ``?fields=`` and ``?expand=`` shape the response and the queries behind it.
+    """
+
+    def setUp(self):
+        caches['responses'].clear()
+        self.user = User.objects.create_user(username='viewer', password='testpass123', email='viewer@example.com')
+        self.movie = Movie.objects.create(
+            title='Heist', genre='ACTION', release_year=2000, description='A long description'
+        )
+        self.review = Review.objects.create(movie=self.movie, user=self.user, text='Great heist', rating=5)
+        Comment.objects.create(review=self.review, author=self.user, text='Agreed')
+        self.client.force_authenticate(self.user)
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.data)
+        return response, [query['sql'] for query in queries]
+
+    def test_fields_limit_the_response_and_the_columns(self):
+        response, queries = self.get('/api/movies/?fields=id,title,average_rating')
+        self.assertEqual(list(response.data['results'][0]), ['id', 'title', 'average_rating'])
+        self.assertEqual(response.data['results'][0]['average_rating'], 5)
+        self.assertFalse(any('"description"' in sql for sql in queries), queries)
+
+    def test_nested_fields(self):
+        response, queries = self.get(f'/api/movies/{self.movie.pk}/reviews/?fields=id,rating,user.username')
+        self.assertEqual(response.data['results'][0], {'id': self.review.pk, 'rating': 5, 'user': {'username': 'viewer'}})
+        self.assertFalse(any('"email"' in sql or '"text"' in sql for sql in queries), queries)
+
+    def test_unrequested_relations_are_not_joined(self):
+        _, queries = self.get('/api/reviews/?fields=id,rating')
+        self.assertFalse(any('auth_user' in sql for sql in queries), queries)
+
+    def test_expand(self):
+        response, _ = self.get('/api/reviews/')
+        self.assertEqual(response.data['results'][0]['movie'], self.movie.pk)
+        response, queries = self.get('/api/comments/?expand=review.movie&fields=id,review.movie.title')
+        self.assertEqual(response.data['results'][0]['review'], {'movie': {'title': 'Heist'}})
+        self.assertEqual(len(queries), 1, queries)
+
+    def test_fields_of_expandable_fields_expand_them(self):
+        response, _ = self.get('/api/reviews/?fields=movie.title,movie.review_count')
+        self.assertEqual(response.data['results'][0], {'movie': {'title': 'Heist', 'review_count': 1}})
+
+    def test_default_response_is_unchanged(self):
+        response, _ = self.get(f'/api/movies/{self.movie.pk}/')
+        self.assertIn('rating_histogram', response.data)
+        self.assertEqual(response.data['rating_histogram']['5'], 1)
+
+    def test_invalid_fields_are_rejected(self):
+        for url in ('/api/movies/?fields=id,budget', '/api/reviews/?expand=user', '/api/reviews/?fields=rating.value'):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 400, url)
+
+    def test_writes_ignore_fields(self):
+        other = Movie.objects.create(title='Sequel', genre='ACTION', release_year=2001, description='More')
+        response = self.client.post('/api/reviews/?fields=id', {'movie': other.pk, 'text': 'Fine', 'rating': 3})
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['text'], 'Fine')
@@ -0,0 +1,131 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from api import importer
+from api.models import Movie
+
+
+class ImportMoviesTests(TestCase):
+    """
+    Imports validate records, upsert on the natural key and resume from a byte offset.
+    """
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.directory = directory
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8', newline='') as file:
+            file.write(content)
+        return path
+
+    def write_jsonl(self, records):
+        return self.write('movies.jsonl', ''.join(json.dumps(record) + '\n' for record in records))
+
+    def run_import(self, path, *args):
+        stdout, stderr = StringIO(), StringIO()
+        call_command('import_movies', path, *args, stdout=stdout, stderr=stderr)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def movie(self, title, year=2000, **fields):
+        return {'title': title, 'genre': 'Action', 'release_year': year, 'description': 'A film', **fields}
+
+    def test_invalid_records_are_reported_and_skipped(self):
+        path = self.write_jsonl([
+            self.movie('Heist'),
+            self.movie('', genre='Western'),
+            self.movie('Future', year=9999),
+            self.movie('Poster', poster_url='not a url'),
+            ['not', 'an', 'object'],
+        ])
+        stdout, stderr = self.run_import(path)
+        self.assertEqual(list(Movie.objects.values_list('title', 'genre')), [('Heist', 'ACTION')])
+        self.assertIn('Imported 1 movie(s) from 5 record(s), skipped 4 invalid', stdout)
+        lines = stderr.splitlines()
+        self.assertEqual([line.split(':')[0] for line in lines], ['Record 2', 'Record 3', 'Record 4', 'Record 5'])
+        self.assertIn("Unknown genre 'Western'.", lines[0])
+        self.assertIn('This field is required.', lines[0])
+        self.assertFalse(os.path.exists(f'{path}.checkpoint'))
+
+    def test_movies_are_upserted_on_title_and_year(self):
+        existing = Movie.objects.create(title='Heist', genre='DRAMA', release_year=2000, description='Old')
+        path = self.write(
+            'movies.csv',
+            'title,genre,release_year,description,poster_url\n'
+            'Heist,Action,2000,"New,\nand improved",http://x.test/p.jpg\n'
+            'Heist,Comedy,2001,Remake,\n',
+        )
+        self.run_import(path)
+        existing.refresh_from_db()
+        self.assertEqual(
+            (existing.genre, existing.description, existing.poster_url),
+            ('ACTION', 'New,\nand improved', 'http://x.test/p.jpg'),
+        )
+        self.assertEqual(Movie.objects.count(), 2)
+        self.assertEqual(existing.rating_stats.rating_count, 0)
+        self.assertTrue(Movie.objects.get(release_year=2001).rating_stats)
+
+    def interrupt_after(self, chunks):
+        """
+        Patch ``upsert_chunk`` to stop the import once ``chunks`` chunks are written.
+        """
+        upsert_chunk = importer.upsert_chunk
+        calls = []
+
+        def upsert(values):
+            calls.append(values)
+            if len(calls) > chunks:
+                raise KeyboardInterrupt
+            return upsert_chunk(values)
+        return mock.patch.object(importer, 'upsert_chunk', side_effect=upsert)
+
+    def test_interrupted_imports_resume_at_the_checkpoint(self):
+        for name, path in (
+            ('jsonl', self.write_jsonl([self.movie(f'Movie {index}') for index in range(5)])),
+            ('csv', self.write('movies.csv', 'title,genre,release_year,description\n' + ''.join(
+                f'Movie {index},Action,2000,"Line one\nline two"\n' for index in range(5)
+            ))),
+        ):
+            with self.subTest(format=name):
+                Movie.objects.all().delete()
+                with self.interrupt_after(2), self.assertRaises(KeyboardInterrupt):
+                    self.run_import(path, '--chunk-size', '2')
+                self.assertEqual(Movie.objects.count(), 4)
+                checkpoint = importer.load_checkpoint(f'{path}.checkpoint')
+                self.assertEqual(checkpoint['records'], 4)
+
+                # The imported records are not read again: garble them, keeping the size.
+                with open(path, 'rb') as file:
+                    content = file.read()
+                header = content.index(b'\n') + 1 if name == 'csv' else 0
+                with open(path, 'wb') as file:
+                    garbled = bytes(b if b == ord('\n') else ord('{') for b in content[header:checkpoint['offset']])
+                    file.write(content[:header] + garbled + content[checkpoint['offset']:])
+
+                with mock.patch.object(importer, 'upsert_chunk', wraps=importer.upsert_chunk) as upsert:
+                    stdout, _ = self.run_import(path, '--chunk-size', '2')
+                self.assertIn('Resuming after record 4.', stdout)
+                self.assertEqual([[row['title'] for row in call.args[0]] for call in upsert.call_args_list], [
+                    ['Movie 4'],
+                ])
+                self.assertIn('Imported 5 movie(s) from 5 record(s)', stdout)
+                self.assertEqual(Movie.objects.count(), 5)
+                self.assertFalse(os.path.exists(f'{path}.checkpoint'))
+
+    def test_checkpoints_of_other_inputs_are_refused(self):
+        path = self.write_jsonl([self.movie('Heist')])
+        importer.save_checkpoint(f'{path}.checkpoint', {'source': path, 'size': 1, 'records': 1, 'offset': 1})
+        with self.assertRaisesMessage(CommandError, 'different version'):
+            self.run_import(path)
+        self.run_import(path, '--restart')
+        self.assertEqual(Movie.objects.count(), 1)
@@ -0,0 +1,138 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api import jobs
+from api.models import Job, Movie, Review, TimelineEntry
+
+calls = []
+
+
+@jobs.task(name='tests.remember', key='{0}')
+def remember(value):
+    calls.append(value)
+
+
+@jobs.task(name='tests.flaky', max_attempts=2)
+def flaky():
+    raise RuntimeError('still broken')
+
+
+class JobQueueTests(TestCase):
+    """
+    Jobs are inserted on commit, deduplicated by key, and retried with backoff.
+    """
+
+    def setUp(self):
+        calls.clear()
+        self.worker = jobs.Worker(concurrency=1)
+
+    def test_jobs_are_inserted_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            remember.enqueue('kept')
+            self.assertFalse(Job.objects.exists())
+            try:
+                with transaction.atomic():
+                    remember.enqueue('rolled back')
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertEqual(list(Job.objects.values_list('key', flat=True)), ['tests.remember:kept'])
+
+    def test_keys_deduplicate_queued_jobs_and_serialize_running_ones(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            remember.enqueue_many([('a',), ('a',), ('b',)])
+        self.assertEqual(Job.objects.count(), 2)
+        claimed = jobs.claim('other', 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            remember.enqueue('a')
+        # 'a' is running elsewhere, so only 'b' can be claimed.
+        self.assertEqual(self.worker.run_batch(), (1, 0, 0))
+        self.assertEqual(calls, ['b'])
+        jobs.finish(claimed, [None])
+        self.assertEqual(self.worker.run_batch(), (1, 0, 0))
+        self.assertEqual(calls, ['b', 'a'])
+
+    def test_failures_are_retried_with_backoff_then_failed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            flaky.enqueue()
+        self.assertEqual(self.worker.run_batch(), (0, 1, 0))
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertIn('still broken', job.last_error)
+        self.assertEqual(self.worker.run_batch(), (0, 0, 0))
+
+        Job.objects.update(run_at=timezone.now())
+        self.assertEqual(self.worker.run_batch(), (0, 0, 1))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+
+    def test_expired_leases_are_claimed_again(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            remember.enqueue('lost')
+        jobs.claim('crashed', 10)
+        self.assertEqual(self.worker.run_batch(), (0, 0, 0))
+        Job.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.worker.run_batch(), (1, 0, 0))
+        self.assertEqual(Job.objects.get().attempts, 2)
+
+    def test_metrics(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            remember.enqueue_many([('a',), ('b',)])
+        Job.objects.filter(key='tests.remember:b').update(run_at=timezone.now() - timedelta(seconds=30))
+        stats = jobs.metrics()
+        self.assertEqual((stats['queued'], stats['due'], stats['done_in_window']), (2, 2, 0))
+        self.assertGreaterEqual(stats['lag_seconds'], 30)
+        self.worker.run_batch()
+        stats = jobs.metrics()
+        self.assertEqual((stats['queued'], stats['done_in_window'], stats['lag_seconds']), (0, 2, 0.0))
+
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(username='viewer'))
+        self.assertEqual(client.get('/api/jobs/stats/').status_code, 403)
+        client.force_authenticate(User.objects.create_superuser(username='admin'))
+        self.assertEqual(client.get('/api/jobs/stats/').data['done_in_window'], 2)
+
+
+class DeferredSideEffectTests(TestCase):
+    """
+    Timeline fan-out and follow backfills run from the queue after commit.
+    """
+
+    def setUp(self):
+        self.reader = User.objects.create_user(username='reader')
+        self.author = User.objects.create_user(username='author')
+        self.movie = Movie.objects.create(title='Heist', genre='ACTION', release_year=2000, description='A heist')
+
+    def run_jobs(self):
+        while any(jobs.Worker(concurrency=1).run_batch()):
+            pass
+
+    def test_new_reviews_reach_followers_after_the_worker_runs(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.reader.profile.follow(self.author.profile)
+            review = Review.objects.create(movie=self.movie, user=self.author, text='Great', rating=5)
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.run_jobs()
+        self.assertEqual(list(TimelineEntry.objects.values_list('user', 'review')), [(self.reader.pk, review.pk)])
+
+    def test_undone_follow_is_pruned_once(self):
+        Review.objects.create(movie=self.movie, user=self.author, text='Great', rating=5)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.reader.profile.follow(self.author.profile)
+            self.reader.profile.unfollow(self.author.profile)
+        self.assertEqual(Job.objects.filter(task='api.timelines.sync_follow').count(), 1)
+        self.run_jobs()
+        self.assertFalse(TimelineEntry.objects.exists())
+
+    @override_settings(JOBS={'EAGER': True})
+    def test_eager_jobs_run_inline(self):
+        self.reader.profile.follow(self.author.profile)
+        Review.objects.create(movie=self.movie, user=self.author, text='Great', rating=5)
+        self.assertFalse(Job.objects.exists())
+        self.assertEqual(TimelineEntry.objects.count(), 1)
@@ -0,0 +1,84 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from api.models import Movie, Review
+from api.pagination import ReviewCursorPagination, estimate_count
+
+
+class KeysetPaginationTests(APITestCase):
+    """
+    Cursors seek on the full ``(timestamp, id)`` key and estimates say when they stopped counting.
+    """
+
+    def setUp(self):
+        caches['responses'].clear()
+        self.movie = Movie.objects.create(title='Heist', genre='ACTION', release_year=2000, description='A heist')
+        self.other = Movie.objects.create(title='Caper', genre='ACTION', release_year=2001, description='A caper')
+        self.reviews = [
+            Review.objects.create(
+                movie=self.movie if index < 5 else self.other,
+                user=User.objects.create_user(username=f'critic{index}'),
+                text='Seen it', rating=4,
+            )
+            for index in range(7)
+        ]
+
+    def ids(self, response):
+        self.assertEqual(response.status_code, 200, response.data)
+        return [review['id'] for review in response.data['results']]
+
+    def walk(self, url):
+        pages = []
+        while url:
+            response = self.client.get(url)
+            pages.append(self.ids(response))
+            url = response.data['next']
+        return pages
+
+    def expected(self, reviews):
+        return [review.pk for review in sorted(reviews, key=lambda review: (review.timestamp, review.pk), reverse=True)]
+
+    def test_next_and_previous_cursors_walk_every_row_once(self):
+        pages = self.walk('/api/reviews/?page_size=3')
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertEqual(sum(pages, []), self.expected(Review.objects.all()))
+
+        response = self.client.get('/api/reviews/?page_size=3')
+        self.assertIsNone(response.data['previous'])
+        second = self.client.get(response.data['next'])
+        third = self.client.get(second.data['next'])
+        self.assertEqual(self.ids(self.client.get(third.data['previous'])), pages[1])
+        back = self.client.get(second.data['previous'])
+        self.assertEqual(self.ids(back), pages[0])
+        self.assertIsNone(back.data['previous'])
+
+    def test_rows_sharing_a_timestamp_are_neither_skipped_nor_repeated(self):
+        Review.objects.update(timestamp=timezone.now())
+        pages = self.walk('/api/reviews/?page_size=2')
+        self.assertEqual(sum(pages, []), sorted((review.pk for review in self.reviews), reverse=True))
+
+        response = self.client.get(self.client.get('/api/reviews/?page_size=2').data['next'])
+        self.assertEqual(self.ids(self.client.get(response.data['previous'])), pages[0])
+
+    def test_invalid_cursors_are_not_found(self):
+        for cursor in ('garbage', 'eyJrIjpbMV19'):
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self.client.get(f'/api/reviews/?cursor={cursor}').status_code, 404)
+
+    def test_estimates_report_when_they_hit_the_cap(self):
+        reviews = Review.objects.filter(movie=self.movie)
+        self.assertEqual(estimate_count(reviews, cap=5), (5, False))
+        self.assertEqual(estimate_count(reviews, cap=4), (4, True))
+        self.assertEqual(estimate_count(Review.objects.all())[1], False)
+
+        url = f'/api/movies/{self.movie.pk}/reviews/?total=estimate'
+        with mock.patch.object(ReviewCursorPagination, 'estimate_cap', 3):
+            response = self.client.get(url)
+        self.assertEqual((response.data['estimated_total'], response.data['estimated_total_is_capped']), (3, True))
+        response = self.client.get(f'{url}&page_size=2')
+        self.assertEqual((response.data['estimated_total'], response.data['estimated_total_is_capped']), (5, False))
+        self.assertNotIn('estimated_total', self.client.get(f'/api/movies/{self.movie.pk}/reviews/').data)
@@ -0,0 +1,91 @@
+import os
+import shutil
+import tempfile
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.core.cache import caches
+from django.core.handlers.asgi import ASGIHandler
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+from rest_framework.test import APITestCase
+
+from api import profiling
+from api.middleware import ProfilingMiddleware
+from api.models import Movie
+
+
+class ProfilingMiddlewareTests(APITestCase):
+    """
+    Server-Timing and profile dumps are opt-in outside DEBUG and keep async views async.
+    """
+
+    def setUp(self):
+        caches['responses'].clear()
+        Movie.objects.create(title='Heist', genre='ACTION', release_year=2000, description='A heist')
+
+    def make_dump_dir(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        return directory
+
+    def test_disabled_unless_debug(self):
+        self.assertFalse(profiling.get_settings()['ENABLED'])
+        response = self.client.get('/api/movies/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Server-Timing', response)
+        with override_settings(DEBUG=True):
+            self.assertTrue(profiling.get_settings()['ENABLED'])
+
+    @override_settings(PROFILING={'ENABLED': True})
+    def test_server_timing(self):
+        timing = self.client.get('/api/movies/')['Server-Timing']
+        metrics = {entry.split(';')[0] for entry in timing.split(', ')}
+        self.assertLessEqual({'total', 'view', 'render', 'serialize', 'db'}, metrics)
+        self.assertRegex(timing, r'db;dur=[\d.]+;desc="\d+ queries"')
+
+    def test_sampled_and_slow_requests_are_dumped(self):
+        directory = self.make_dump_dir()
+        with override_settings(PROFILING={'ENABLED': True, 'SAMPLE_RATE': 1.0, 'DUMP_DIR': directory}):
+            self.client.get('/api/movies/')
+        files = sorted(os.listdir(directory))
+        self.assertEqual([os.path.splitext(name)[1] for name in files], ['.prof', '.sql'])
+        with open(os.path.join(directory, files[1])) as file:
+            dump = file.read()
+        self.assertTrue(dump.startswith('GET /api/movies/ -> 200'))
+        self.assertIn('SELECT', dump)
+
+        directory = self.make_dump_dir()
+        with override_settings(PROFILING={'ENABLED': True, 'SLOW_THRESHOLD_MS': 0, 'DUMP_DIR': directory}):
+            # A new client: middleware reads its settings when the chain is built.
+            self.client_class().get('/api/movies/')
+        self.assertEqual([os.path.splitext(name)[1] for name in os.listdir(directory)], ['.sql'])
+
+    @override_settings(DEBUG=True, PROFILING={'ENABLED': True}, REPLICA_ROUTING={'REPLICAS': ['default']})
+    def test_middleware_chain_is_not_adapted_under_asgi(self):
+        # With every middleware active, Django logs any it has to wrap for async.
+        with self.assertNoLogs('django.request', 'DEBUG'):
+            ASGIHandler().load_middleware(is_async=True)
+
+    @override_settings(PROFILING={'ENABLED': True})
+    async def test_async_requests(self):
+        async def view(request):
+            return HttpResponse('ok')
+
+        middleware = ProfilingMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = await middleware(RequestFactory().get('/'))
+        self.assertIn('total;dur=', response['Server-Timing'])
+
+        # The async ORM's queries run on another thread, and are still counted.
+        response = await self.async_client.get('/api/async/movies/')
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(response['Server-Timing'], r'db;dur=[\d.]+;desc="[1-9]\d* queries"')
+        self.assertIn('auth;dur=', response['Server-Timing'])
+
+    @override_settings(DEBUG=True)
+    async def test_async_query_budget(self):
+        sync_count = int((await sync_to_async(self.client.get)('/api/movies/'))['X-Query-Count'])
+        response = await self.async_client.get('/api/async/movies/')
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(sync_count, 0)
+        self.assertEqual(int(response['X-Query-Count']), sync_count)
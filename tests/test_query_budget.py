@@ -0,0 +1,179 @@
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.models import Movie, MovieSimilarity, FollowSuggestion, Review, Comment, Like
+from api import search, trending
+from api.querybudget import assert_queries_do_not_scale, query_budget
+from api.urls import router
+
+
+# Feed timelines and trending buckets are filled by jobs; run them inline.
+@override_settings(JOBS={'EAGER': True})
+class QueryBudgetTests(APITestCase):
+    """
+    Every list endpoint must run the same number of queries whatever its page size.
+    """
+
+    # Router prefixes covered below; a new registration must add a test.
+    COVERED_PREFIXES = {'users', 'profiles', 'movies', 'reviews', 'comments', 'likes'}
+
+    def setUp(self):
+        # Cached responses would hide the queries being measured.
+        caches['responses'].clear()
+        # Test databases are created without migrations, so without the FTS5 index.
+        search.install()
+        self.user = User.objects.create_user(username='viewer', password='testpass123')
+        self.movie = Movie.objects.create(
+            title='Test Movie', genre='ACTION', release_year=2024, description='Test description'
+        )
+        self.review = Review.objects.create(movie=self.movie, user=self.user, text='Great heist', rating=5)
+        self.client.force_authenticate(self.user)
+        self.created = 0
+
+    def make_user(self):
+        self.created += 1
+        return User.objects.create_user(username=f'user{self.created}')
+
+    def add_movies(self, count=5):
+        for _ in range(count):
+            author = self.make_user()
+            movie = Movie.objects.create(
+                title=f'Heist {self.created}', genre='ACTION', release_year=2000, description='A heist'
+            )
+            Review.objects.create(movie=movie, user=author, text='Heist review', rating=3)
+
+    def add_neighbours(self, count=5):
+        for _ in range(count):
+            self.add_movies(1)
+            MovieSimilarity.objects.create(
+                movie=self.movie, similar_movie=Movie.objects.latest('pk'), score=0.5, computed_at=timezone.now()
+            )
+
+    def add_suggestions(self, count=5):
+        for _ in range(count):
+            FollowSuggestion.objects.create(
+                profile=self.user.profile, suggested=self.make_user().profile, score=1, computed_at=timezone.now()
+            )
+
+    def add_reviews(self, count=5, movie=None, followed=False):
+        for _ in range(count):
+            author = self.make_user()
+            if followed:
+                self.user.profile.follow(author.profile)
+            Review.objects.create(movie=movie or self.movie, user=author, text='Another heist', rating=4)
+
+    def add_comments(self, count=5):
+        for _ in range(count):
+            Comment.objects.create(review=self.review, author=self.make_user(), text='Agreed')
+
+    def add_likes(self, count=5):
+        for _ in range(count):
+            Like.objects.create(review=self.review, user=self.make_user())
+
+    def assertConstantQueries(self, url, grow):
+        """
+        Compare a page of ``grow()``'s rows against a page with twice as many.
+        """
+        def fetch():
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, response.data)
+        grow()
+        assert_queries_do_not_scale(fetch, grow)
+
+    def test_every_router_prefix_is_covered(self):
+        registered = {prefix for prefix, _, _ in router.registry}
+        self.assertEqual(registered - self.COVERED_PREFIXES, set())
+
+    def test_user_list(self):
+        self.assertConstantQueries('/api/users/', self.add_likes)
+
+    def test_profile_list(self):
+        self.assertConstantQueries('/api/profiles/', self.add_likes)
+
+    def test_profile_feed(self):
+        self.assertConstantQueries('/api/profiles/feed/', lambda: self.add_reviews(5, followed=True))
+
+    def test_profile_suggestions(self):
+        self.assertConstantQueries('/api/profiles/suggestions/', self.add_suggestions)
+
+    def test_profile_recommendations(self):
+        self.assertConstantQueries('/api/profiles/recommendations/', self.add_neighbours)
+
+    def test_movie_list(self):
+        self.assertConstantQueries('/api/movies/', self.add_movies)
+
+    def test_movie_search(self):
+        self.assertConstantQueries('/api/movies/?search=heist', self.add_movies)
+
+    def test_movie_autocomplete(self):
+        self.assertConstantQueries('/api/movies/autocomplete/?q=hei', self.add_movies)
+
+    def test_movie_reviews(self):
+        self.assertConstantQueries(f'/api/movies/{self.movie.pk}/reviews/', self.add_reviews)
+
+    def test_movie_similar(self):
+        self.assertConstantQueries(f'/api/movies/{self.movie.pk}/similar/', self.add_neighbours)
+
+    def test_movie_trending(self):
+        def grow():
+            self.add_movies()
+            trending.refresh()
+        self.assertConstantQueries('/api/movies/trending/', grow)
+
+    def test_review_list(self):
+        self.assertConstantQueries('/api/reviews/', self.add_reviews)
+
+    def test_review_search(self):
+        self.assertConstantQueries('/api/reviews/search/?q=heist', self.add_reviews)
+
+    def test_review_comments(self):
+        self.assertConstantQueries(f'/api/reviews/{self.review.pk}/comments/', self.add_comments)
+
+    def test_review_trending(self):
+        def grow():
+            self.add_reviews()
+            for review in Review.objects.all():
+                Like.objects.get_or_create(review=review, user=self.user)
+            trending.refresh()
+        self.assertConstantQueries('/api/reviews/trending/', grow)
+
+    def test_comment_list(self):
+        self.assertConstantQueries('/api/comments/', self.add_comments)
+
+    def test_like_list(self):
+        self.assertConstantQueries('/api/likes/', self.add_likes)
+
+    def test_detail_endpoints_stay_within_budget(self):
+        self.add_comments(3)
+        self.add_likes(3)
+        comment = Comment.objects.first()
+        like = Like.objects.first()
+        for url in [
+            f'/api/users/{self.user.pk}/',
+            f'/api/profiles/{self.user.profile.pk}/',
+            f'/api/movies/{self.movie.pk}/',
+            f'/api/reviews/{self.review.pk}/',
+            f'/api/comments/{comment.pk}/',
+            f'/api/likes/{like.pk}/',
+        ]:
+            with self.subTest(url=url), query_budget(2):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+
+    def test_token_authentication_is_cached(self):
+        self.client.force_authenticate(None)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+        url = f'/api/users/{self.user.pk}/'
+        self.assertEqual(self.client.get(url).status_code, 200)
+        # Only the user being retrieved is read; the requester comes from the cache.
+        with query_budget(1):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_query_budget_reports_overruns(self):
+        with self.assertRaises(AssertionError):
+            with query_budget(0):
+                list(Movie.objects.all())
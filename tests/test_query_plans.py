@@ -0,0 +1,102 @@
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import connection
+from django.test import override_settings
+from rest_framework.test import APITestCase
+
+from api.models import Movie, Review, Comment, Like
+from api.querybudget import assert_indexed, explain, plan_problems
+from api import exports, timelines
+
+
+# Feed timelines are filled by jobs; run them as the fixtures are written.
+@override_settings(JOBS={'EAGER': True})
+class QueryPlanTests(APITestCase):
+    """
+    The hot read paths must be answered from an index: no full table scans
+    and no temporary B-tree sorts. Each test walks to the second page too,
+    so the keyset seek filter is covered as well as the first page.
+    """
+
+    def setUp(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest("Query plans are only checked on SQLite.")
+        # Cached responses would skip the queries being checked.
+        caches['responses'].clear()
+        self.user = User.objects.create_user(username='viewer', password='testpass123')
+        self.author = User.objects.create_user(username='author')
+        self.user.profile.follow(self.author.profile)
+        self.movies = [
+            Movie.objects.create(title=f'Heist {index}', genre='ACTION', release_year=2000, description='A heist')
+            for index in range(11)
+        ]
+        self.movie = self.movies[0]
+        for index in range(3):
+            reviewer = User.objects.create_user(username=f'reviewer{index}')
+            self.user.profile.follow(reviewer.profile)
+            Review.objects.create(movie=self.movie, user=reviewer, text='Great heist', rating=4)
+        self.review = Review.objects.create(movie=self.movie, user=self.author, text='Great heist', rating=5)
+        for index in range(3):
+            commenter = User.objects.create_user(username=f'commenter{index}')
+            Comment.objects.create(review=self.review, author=commenter, text='Agreed')
+            Like.objects.create(review=self.review, user=commenter)
+        self.client.force_authenticate(self.user)
+
+    def get_pages(self, url, **allowed):
+        """
+        Fetch the first two pages of ``url`` inside ``assert_indexed``.
+        """
+        with assert_indexed(**allowed):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, response.data)
+            self.assertIsNotNone(response.data['next'])
+            response = self.client.get(response.data['next'])
+            self.assertEqual(response.status_code, 200, response.data)
+
+    def test_plan_problems_detects_scans_and_sorts(self):
+        sql, params = Review.objects.filter(text='Great heist').order_by('rating').query.sql_with_params()
+        problems = plan_problems(explain(sql, params))
+        self.assertTrue(any(line.startswith('SCAN') for line in problems), problems)
+        self.assertTrue(any('TEMP B-TREE' in line for line in problems), problems)
+
+    def test_movie_list_by_genre_and_year(self):
+        # Page-number pagination: a COUNT plus the page, ten movies per page.
+        self.get_pages('/api/movies/?genre=ACTION&release_year=2000')
+
+    def test_movie_reviews(self):
+        self.get_pages(f'/api/movies/{self.movie.pk}/reviews/?page_size=1')
+
+    def test_review_list(self):
+        self.get_pages('/api/reviews/?page_size=1')
+
+    def test_review_comments(self):
+        self.get_pages(f'/api/reviews/{self.review.pk}/comments/?page_size=1')
+
+    def test_comment_list(self):
+        self.get_pages('/api/comments/?page_size=1')
+
+    def test_profile_feed(self):
+        self.get_pages('/api/profiles/feed/?page_size=1')
+
+    def test_profile_feed_with_pull_authors(self):
+        with self.settings(FEED_FANOUT_THRESHOLD=1):
+            self.assertTrue(timelines.get_pull_author_ids(self.user.profile))
+            self.get_pages('/api/profiles/feed/?page_size=1')
+
+    def test_review_likes(self):
+        with assert_indexed():
+            list(self.review.likes.order_by('-timestamp')[:10])
+            response = self.client.post(f'/api/reviews/{self.review.pk}/like/')
+            self.assertEqual(response.status_code, 201, response.data)
+            response = self.client.post(f'/api/reviews/{self.review.pk}/unlike/')
+            self.assertEqual(response.status_code, 200, response.data)
+
+    def test_incremental_exports(self):
+        since = Review.objects.order_by('timestamp').values_list('timestamp', flat=True).first()
+        for kind in exports.EXPORTS:
+            with self.subTest(kind=kind):
+                with assert_indexed():
+                    self.assertTrue(list(exports.get_export_queryset(kind, since=since)))
+                # One movie's newer rows may be found through the movie and sorted.
+                with assert_indexed(allow=('USE TEMP B-TREE FOR ORDER BY',)):
+                    list(exports.get_export_queryset(kind, movie=self.movie.pk, since=since))
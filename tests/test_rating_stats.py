@@ -0,0 +1,84 @@
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from rest_framework.test import APITestCase
+
+from api import counters
+from api.models import Movie, MovieRatingStats, Review
+
+
+class RatingStatsTests(APITestCase):
+    """
+    ``MovieRatingStats`` follows every rating change and is rebuilt from reviews by reconciling.
+    """
+
+    def setUp(self):
+        caches['responses'].clear()
+        self.users = [User.objects.create_user(username=f'critic{index}') for index in range(3)]
+        self.movies = [
+            Movie.objects.create(title=f'Heist {index}', genre='ACTION', release_year=2000, description='A heist')
+            for index in range(2)
+        ]
+
+    def stats(self, movie):
+        stats = MovieRatingStats.objects.get(movie=self.movies[movie])
+        return stats.rating_count, stats.rating_sum, round(stats.average_rating, 2), stats.get_histogram()
+
+    def histogram(self, **counts):
+        return {rating: counts.get(f'r{rating}', 0) for rating in range(1, 6)}
+
+    def test_stats_follow_created_edited_moved_and_deleted_reviews(self):
+        self.assertEqual(self.stats(0), (0, 0, 0, self.histogram()))
+        reviews = [
+            Review.objects.create(movie=self.movies[0], user=user, text='Seen it', rating=rating)
+            for user, rating in zip(self.users, (5, 4, 4))
+        ]
+        self.assertEqual(self.stats(0), (3, 13, 4.33, self.histogram(r4=2, r5=1)))
+
+        reviews[0].rating = 1
+        reviews[0].save()
+        self.assertEqual(self.stats(0), (3, 9, 3.0, self.histogram(r1=1, r4=2)))
+        # Saves that change neither the movie nor the rating leave the stats alone.
+        reviews[0].text = 'Changed my mind'
+        reviews[0].save()
+        self.assertEqual(self.stats(0)[:2], (3, 9))
+
+        reviews[1].movie = self.movies[1]
+        reviews[1].save()
+        self.assertEqual(self.stats(0), (2, 5, 2.5, self.histogram(r1=1, r4=1)))
+        self.assertEqual(self.stats(1), (1, 4, 4.0, self.histogram(r4=1)))
+
+        reviews[2].delete()
+        reviews[0].delete()
+        self.assertEqual(self.stats(0), (0, 0, 0, self.histogram()))
+
+    def test_api_reads_the_stats(self):
+        for user, rating in zip(self.users, (2, 3, 5)):
+            Review.objects.create(movie=self.movies[1], user=user, text='Seen it', rating=rating)
+        Review.objects.create(movie=self.movies[0], user=self.users[0], text='Seen it', rating=4)
+        detail = self.client.get(f'/api/movies/{self.movies[1].pk}/').data
+        self.assertEqual((detail['average_rating'], detail['review_count']), (3.33, 3))
+        self.assertEqual(detail['rating_histogram'], {'1': 0, '2': 1, '3': 1, '4': 0, '5': 1})
+        response = self.client.get('/api/movies/?ordering=-average_rating')
+        self.assertEqual([movie['id'] for movie in response.data['results']], [self.movies[0].pk, self.movies[1].pk])
+        response = self.client.get('/api/movies/?ordering=-review_count')
+        self.assertEqual([movie['id'] for movie in response.data['results']], [self.movies[1].pk, self.movies[0].pk])
+
+    def test_reconcile_rebuilds_drifted_and_missing_stats(self):
+        first = Review.objects.create(movie=self.movies[0], user=self.users[0], text='Seen it', rating=5)
+        Review.objects.create(movie=self.movies[0], user=self.users[1], text='Seen it', rating=3)
+        MovieRatingStats.objects.filter(movie=self.movies[0]).update(rating_count=7, rating_5_count=0, average_rating=1)
+        MovieRatingStats.objects.filter(movie=self.movies[1]).delete()
+        Review.objects.bulk_create([Review(movie=self.movies[1], user=self.users[2], text='Seen it', rating=2)])
+
+        self.assertEqual(counters.reconcile_rating_stats(batch_size=1), 2)
+        self.assertEqual(self.stats(0), (2, 8, 4.0, self.histogram(r3=1, r5=1)))
+        self.assertEqual(self.stats(1), (1, 2, 2.0, self.histogram(r2=1)))
+        created = MovieRatingStats.objects.get(movie=self.movies[1])
+        self.assertEqual(created.ratings_changed_at, Review.objects.get(movie=self.movies[1]).timestamp)
+
+        # A rating added to a movie without a stats row rebuilds it from its reviews.
+        MovieRatingStats.objects.filter(movie=self.movies[0]).delete()
+        first.delete()
+        self.assertFalse(MovieRatingStats.objects.filter(movie=self.movies[0]).exists())
+        Review.objects.create(movie=self.movies[0], user=self.users[2], text='Seen it', rating=1)
+        self.assertEqual(self.stats(0), (2, 4, 2.0, self.histogram(r1=1, r3=1)))
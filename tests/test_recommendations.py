@@ -0,0 +1,108 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from api import jobs, recommendations
+from api.models import Job, Movie, MovieRatingStats, MovieSimilarity, Review
+
+
+class RecommendationTests(TestCase):
+    """
+    Builds store cosine neighbours, refresh what rating changes can alter, and feed both reads.
+    """
+
+    def setUp(self):
+        self.users = [User.objects.create_user(username=f'rater{index}') for index in range(5)]
+        self.movies = [
+            Movie.objects.create(title=f'Heist {index}', genre='ACTION', release_year=2000, description='A heist')
+            for index in range(6)
+        ]
+
+    def rate(self, user, movie, rating):
+        return Review.objects.create(movie=self.movies[movie], user=self.users[user], text='Seen it', rating=rating)
+
+    def rate_all(self):
+        # Rows over raters 0-2: movie 0 = (5, 4, 0), 1 = (5, 2, 0), 2 = (0, 4, 0), 3 = (0, 0, 5).
+        for user, movie, rating in ((0, 0, 5), (0, 1, 5), (1, 0, 4), (1, 1, 2), (1, 2, 4), (2, 3, 5)):
+            self.rate(user, movie, rating)
+        # An unrelated pair no other change touches.
+        self.rate(4, 4, 3)
+        self.rate(4, 5, 3)
+
+    def neighbours(self, movie):
+        return [
+            (self.movies.index(similar), round(similar.score, 3))
+            for similar in recommendations.similar_movies(self.movies[movie].pk)
+        ]
+
+    def test_builds_store_cosine_neighbours_best_first(self):
+        self.rate_all()
+        self.assertEqual(recommendations.build(full=True), 6)
+        self.assertEqual(self.neighbours(0), [(1, 0.957), (2, 0.625)])
+        self.assertEqual(self.neighbours(2), [(0, 0.625), (1, 0.371)])
+        self.assertEqual(self.neighbours(3), [])
+        self.assertEqual(self.neighbours(4), [(5, 1.0)])
+
+        recommendations.build(full=True, top_k=1)
+        self.assertEqual(self.neighbours(0), [(1, 0.957)])
+        self.assertEqual(recommendations.build(), 0)
+
+    def test_incremental_builds_refresh_changed_movies_and_the_lists_they_alter(self):
+        self.rate_all()
+        recommendations.build(full=True)
+        untouched = MovieSimilarity.objects.get(movie=self.movies[4]).computed_at
+
+        # Movie 2 becomes (0, 4, 5): its own list and those of movies 0 and 1,
+        # which list it, change; movie 3 now shares a rater with it.
+        review = self.rate(2, 2, 5)
+        self.assertEqual(recommendations.stale_movie_ids(), {self.movies[2].pk})
+        self.assertEqual(recommendations.build(), 4)
+        self.assertEqual(self.neighbours(0), [(1, 0.957), (2, 0.39)])
+        self.assertEqual(self.neighbours(3), [(2, 0.781)])
+        self.assertEqual(self.neighbours(2), [(3, 0.781), (0, 0.39), (1, 0.232)])
+        self.assertEqual(MovieSimilarity.objects.get(movie=self.movies[4]).computed_at, untouched)
+        self.assertEqual(recommendations.stale_movie_ids(), set())
+
+        # Edits and deletes are picked up too, without a full build.
+        review.rating = 1
+        review.save()
+        self.assertEqual(recommendations.stale_movie_ids(), {self.movies[2].pk})
+        recommendations.build()
+        self.assertEqual(self.neighbours(3), [(2, 0.243)])
+        review.delete()
+        recommendations.build()
+        self.assertEqual(self.neighbours(3), [])
+        self.assertEqual(self.neighbours(0), [(1, 0.957), (2, 0.625)])
+
+    def test_movies_that_lose_every_review_lose_their_neighbours(self):
+        self.rate_all()
+        recommendations.build(full=True)
+        Review.objects.filter(movie=self.movies[2]).delete()
+        recommendations.build()
+        self.assertEqual(self.neighbours(2), [])
+        self.assertEqual(self.neighbours(0), [(1, 0.957)])
+        self.assertEqual(self.neighbours(1), [(0, 0.957)])
+
+    def test_review_writes_queue_one_keyed_refresh(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.rate_all()
+        self.assertEqual(Job.objects.filter(task='api.recommendations.refresh').count(), 1)
+        jobs.Worker(concurrency=1).run_batch()
+        self.assertEqual(self.neighbours(0), [(1, 0.957), (2, 0.625)])
+        self.assertFalse(
+            MovieRatingStats.objects.filter(movie__in=self.movies, neighbours_computed_at__isnull=True).exists()
+        )
+
+    def test_recommendations_weigh_neighbours_by_rating(self):
+        self.rate(0, 0, 5)
+        self.rate(0, 1, 1)
+        self.rate(1, 3, 4)
+        computed_at = MovieRatingStats.objects.get(movie=self.movies[0]).ratings_changed_at
+        for movie, similar, score in ((0, 2, 0.9), (0, 3, 0.5), (1, 3, 0.8), (1, 0, 0.7), (0, 4, 0.1), (1, 4, 0.2)):
+            MovieSimilarity.objects.create(
+                movie=self.movies[movie], similar_movie=self.movies[similar], score=score, computed_at=computed_at,
+            )
+        # Movie 2: 0.9 * (5 - 3). Movie 3: 0.5 * 2 + 0.8 * (1 - 3) < 0, as is movie 4.
+        # Movie 0 was reviewed by the user and is left out.
+        recommended = recommendations.recommended_movies(self.users[0])
+        self.assertEqual([(self.movies.index(movie), round(movie.score, 3)) for movie in recommended], [(2, 1.8)])
+        self.assertEqual(list(recommendations.recommended_movies(self.users[2])), [])
@@ -0,0 +1,94 @@
+import datetime
+import uuid
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+
+from api import renderers
+from api.models import Movie
+
+msgpack = renderers.msgpack
+
+
+class FastJSONRendererTests(APITestCase):
+    """
+    ``FastJSONRenderer`` must write what ``JSONRenderer`` writes.
+    """
+
+    DATA = {
+        'aware': datetime.datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=datetime.timezone.utc),
+        'offset': datetime.datetime(2024, 5, 1, 12, 30, tzinfo=datetime.timezone(datetime.timedelta(hours=5))),
+        'naive': datetime.datetime(2024, 5, 1, 12, 30),
+        'date': datetime.date(2024, 5, 1),
+        'delta': datetime.timedelta(minutes=3),
+        'decimal': Decimal('4.25'),
+        'uuid': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+        'lazy': gettext_lazy('Not found.'),
+        'separators': 'a b c',
+        'unicode': 'Amélie ✓',
+        'nested': [{'float': 0.1, 'int': 3, 'none': None, 'bool': True}, (1, 2)],
+        'huge': 2 ** 70,
+        5: 'int key',
+    }
+
+    def assertRendersLikeJSONRenderer(self, data):
+        self.assertEqual(renderers.FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_matches_json_renderer(self):
+        self.assertRendersLikeJSONRenderer(self.DATA)
+        self.assertRendersLikeJSONRenderer({key: value for key, value in self.DATA.items() if key != 'huge'})
+        self.assertEqual(renderers.FastJSONRenderer().render(None), b'')
+
+    def test_falls_back_without_orjson(self):
+        with mock.patch.object(renderers, 'orjson', None):
+            self.assertRendersLikeJSONRenderer(self.DATA)
+
+    def test_indented_output(self):
+        context = {'indent': 4}
+        self.assertEqual(
+            renderers.FastJSONRenderer().render(self.DATA, renderer_context=context),
+            JSONRenderer().render(self.DATA, renderer_context=context),
+        )
+
+
+class NegotiationTests(APITestCase):
+
+    def setUp(self):
+        caches['responses'].clear()
+        self.user = User.objects.create_user(username='viewer', password='testpass123')
+        self.movie = Movie.objects.create(title='Heist', genre='ACTION', release_year=2000, description='A heist')
+        self.client.force_authenticate(self.user)
+
+    def test_json_endpoints(self):
+        response = self.client.get('/api/movies/')
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(response.json()['results'][0]['title'], 'Heist')
+        response = self.client.post(
+            '/api/reviews/', '{"movie": %d, "text": "Fine", "rating": 3}' % self.movie.pk,
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 201, response.data)
+        response = self.client.post('/api/reviews/', '{"movie": ', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_msgpack(self):
+        if msgpack is None:
+            self.skipTest("msgpack is not installed.")
+        response = self.client.get('/api/movies/', HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        body = msgpack.unpackb(response.content)
+        self.assertEqual(body['results'][0]['created_at'], timezone.localtime(self.movie.created_at).isoformat()
+                         .replace('+00:00', 'Z'))
+        self.assertEqual(msgpack.unpackb(self.client.get('/api/async/movies/?format=msgpack').content), body)
+
+        payload = msgpack.packb({'movie': self.movie.pk, 'text': 'Fine', 'rating': 3})
+        response = self.client.post('/api/reviews/', payload, content_type='application/msgpack')
+        self.assertEqual(response.status_code, 201, response.data)
+        response = self.client.post('/api/reviews/', b'\xc1', content_type='application/msgpack')
+        self.assertEqual(response.status_code, 400)
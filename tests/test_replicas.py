@@ -0,0 +1,192 @@
+import os
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+from io import StringIO
+from unittest import mock
+
+from asgiref.local import Local
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import OperationalError, connections
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api import replicas
+from api.authentication import user_cache
+from api.middleware import ReplicaRoutingMiddleware
+from api.models import Movie, Review
+
+
+@override_settings(
+    REPLICA_ROUTING={'REPLICAS': ['replica1', 'replica2'], 'MAX_LAG_SECONDS': 10},
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'replicas'}},
+)
+class ReplicaRoutingTests(SimpleTestCase):
+    """
+    Safe requests read from a current replica; writes, recent writers and
+    code outside a request stay on the primary.
+    """
+
+    def setUp(self):
+        self.lags = {'replica1': 0.0, 'replica2': 0.0}
+        patcher = mock.patch.object(replicas, 'get_lag', side_effect=lambda alias: self.lags[alias])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.factory = RequestFactory()
+        self.token = AccessToken.for_user(User(pk=7))
+        self.router = replicas.ReplicaRouter()
+
+    def read_alias(self, method='get', status=200):
+        """
+        Run a request through the middleware; return the alias its view reads from.
+        """
+        seen = []
+
+        def view(request):
+            seen.append(self.router.db_for_read(Movie))
+            return HttpResponse(status=status)
+
+        request = getattr(self.factory, method)('/api/movies/', HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        ReplicaRoutingMiddleware(view)(request)
+        return seen[0]
+
+    def test_outside_a_request_reads_use_the_primary(self):
+        self.assertEqual(self.router.db_for_read(Movie), 'default')
+        self.assertEqual(self.router.db_for_write(Movie), 'default')
+
+    def test_safe_requests_read_from_a_replica(self):
+        self.assertIn(self.read_alias(), ['replica1', 'replica2'])
+
+    def test_writes_read_from_the_primary_and_pin_the_client(self):
+        self.assertEqual(self.read_alias('post', status=201), 'default')
+        self.assertEqual(self.read_alias(), 'default')
+        self.assertTrue(replicas.is_pinned('user:7'))
+
+    def test_failed_writes_do_not_pin(self):
+        self.read_alias('post', status=400)
+        self.assertIn(self.read_alias(), ['replica1', 'replica2'])
+
+    def test_lagging_replicas_are_skipped(self):
+        self.lags['replica1'] = 60.0
+        self.assertEqual(self.read_alias(), 'replica2')
+        self.lags['replica2'] = None
+        self.assertEqual(self.read_alias(), 'default')
+
+    def test_replicas_are_not_migrated(self):
+        self.assertIs(self.router.allow_migrate('replica1', 'api'), False)
+        self.assertIsNone(self.router.allow_migrate('default', 'api'))
+
+
+@contextmanager
+def sqlite_files(directory):
+    """
+    Point ``default`` at a migrated SQLite file and add ``replica1``, another file, until exit.
+
+    The test run's own connections are set aside and restored afterwards,
+    so the in-memory test database survives.
+    """
+    primary = {**settings.DATABASES['default'], 'NAME': os.path.join(directory, 'primary.sqlite3')}
+    # As settings.py configures DATABASE_REPLICAS.
+    replica = {
+        **primary,
+        'NAME': os.path.join(directory, 'replica1.sqlite3'),
+        'PRAGMAS': {
+            **{key: value for key, value in settings.SQLITE_PRAGMAS.items() if key != 'journal_mode'},
+            'query_only': 'ON',
+        },
+    }
+    saved = connections.__dict__.get('settings'), connections._settings, connections._connections
+    connections.__dict__['settings'] = connections._settings = connections.configure_settings(
+        {'default': primary, 'replica1': replica}
+    )
+    connections._connections = Local(connections.thread_critical)
+    try:
+        # run_syncdb covers test runs with migrations disabled.
+        call_command('migrate', run_syncdb=True, verbosity=0)
+        yield
+    finally:
+        connections.close_all()
+        connections.__dict__['settings'], connections._settings, connections._connections = saved
+
+
+def settings_name(alias):
+    return connections[alias].settings_dict['NAME']
+
+
+@override_settings(REPLICA_ROUTING={'REPLICAS': ['replica1'], 'MAX_LAG_SECONDS': 10, 'LAG_CHECK_INTERVAL': 0})
+class SQLiteReplicaTests(SimpleTestCase):
+    """
+    Against a real primary file and replica file: reads follow the router,
+    writes pin their client to the primary, and stale copies are skipped.
+    """
+    databases = '__all__'
+    client_class = APIClient
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        files = sqlite_files(directory)
+        files.__enter__()
+        self.addCleanup(files.__exit__, None, None, None)
+        for cache in ('default', 'responses'):
+            caches[cache].clear()
+        user_cache.clear()
+        replicas._lags.clear()
+        self.addCleanup(replicas._lags.clear)
+
+        self.user = User.objects.create_user(username='critic')
+        self.movie = Movie.objects.create(title='Heist', genre='ACTION', release_year=2000, description='A heist')
+        call_command('sync_replicas', stdout=StringIO())
+        # Written after the copy: only the primary has it.
+        self.sequel = Movie.objects.create(title='Heist 2', genre='ACTION', release_year=2001, description='Again')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    def titles(self):
+        caches['responses'].clear()
+        response = self.client.get('/api/movies/')
+        self.assertEqual(response.status_code, 200)
+        return {movie['title'] for movie in response.data['results']}
+
+    def test_connections_get_their_pragmas(self):
+        with connections['default'].cursor() as cursor:
+            self.assertEqual(cursor.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+        with self.assertRaisesMessage(OperationalError, 'readonly'):
+            with connections['replica1'].cursor() as cursor:
+                cursor.execute("DELETE FROM api_movie")
+        self.assertEqual(Movie.objects.using('replica1').count(), 1)
+
+    def test_safe_requests_read_the_replica_and_writers_the_primary(self):
+        self.assertLess(replicas.measure_lag('replica1'), 10)
+        self.assertEqual(self.titles(), {'Heist'})
+
+        response = self.client.post('/api/reviews/', {'movie': self.sequel.pk, 'text': 'Fine', 'rating': 3})
+        self.assertEqual(response.status_code, 201, response.data)
+        # Pinned: the next read sees the write.
+        response = self.client.get(f'/api/movies/{self.sequel.pk}/reviews/')
+        self.assertEqual([review['text'] for review in response.data['results']], ['Fine'])
+        self.assertEqual(self.titles(), {'Heist', 'Heist 2'})
+
+        # Other clients still read the copy.
+        self.client.credentials()
+        self.assertEqual(self.titles(), {'Heist'})
+        replicas.copy_sqlite(settings_name('default'), settings_name('replica1'))
+        self.assertEqual(self.titles(), {'Heist', 'Heist 2'})
+        self.assertEqual(Review.objects.using('replica1').get().text, 'Fine')
+
+    def test_lagging_replicas_are_skipped(self):
+        self.client.credentials()
+        self.assertEqual(self.titles(), {'Heist'})
+        # The copy is a minute older than the primary's last write.
+        stale = time.time() - 60
+        for name in (settings_name('replica1'), f"{settings_name('replica1')}-wal"):
+            if os.path.exists(name):
+                os.utime(name, (stale, stale))
+        self.assertGreater(replicas.measure_lag('replica1'), 10)
+        self.assertEqual(self.titles(), {'Heist', 'Heist 2'})
+
@@ -0,0 +1,81 @@
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from rest_framework.test import APITestCase
+
+from api.models import Movie, Review
+
+
+class ResponseCacheTests(APITestCase):
+    """
+    Cached catalog responses carry ETags and are invalidated only by the writes they show.
+    """
+
+    def setUp(self):
+        caches['responses'].clear()
+        self.author = User.objects.create_user(username='critic')
+        self.heist = Movie.objects.create(title='Heist', genre='ACTION', release_year=2000, description='A heist')
+        self.drama = Movie.objects.create(title='Tears', genre='DRAMA', release_year=2000, description='Sad')
+        self.review = Review.objects.create(movie=self.heist, user=self.author, text='Great', rating=5)
+        self.reviews_url = f'/api/movies/{self.heist.pk}/reviews/'
+
+    def etag(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response['ETag']
+
+    def assertUnchanged(self, url, etag):
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def assertChanged(self, url, etag):
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_matching_etags_get_304_and_hits_run_no_queries(self):
+        etag = self.etag('/api/movies/')
+        with self.assertNumQueries(0):
+            self.assertUnchanged('/api/movies/', etag)
+            response = self.client.get('/api/movies/', HTTP_IF_NONE_MATCH='"other"')
+        self.assertEqual((response.status_code, response['ETag']), (200, etag))
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertNotEqual(self.etag('/api/movies/?genre=DRAMA'), etag)
+
+    def test_reviews_invalidate_only_the_pages_showing_their_movie(self):
+        urls = ['/api/movies/', '/api/movies/?genre=DRAMA', '/api/movies/?ordering=-review_count',
+                self.reviews_url, f'/api/movies/{self.drama.pk}/']
+        etags = [self.etag(url) for url in urls]
+        Review.objects.create(movie=self.heist, user=User.objects.create_user(username='fan'), text='Fine', rating=3)
+        for url, etag, changed in zip(urls, etags, (True, False, True, True, False)):
+            with self.subTest(url=url):
+                (self.assertChanged if changed else self.assertUnchanged)(url, etag)
+        self.assertEqual(self.client.get(self.reviews_url).data['results'][0]['text'], 'Fine')
+
+        # Editing the text leaves ratings, and pages ordered by them, alone.
+        etags = [self.etag(url) for url in urls]
+        self.review.text = 'Still great'
+        self.review.save()
+        for url, etag, changed in zip(urls, etags, (False, False, False, True, False)):
+            with self.subTest(url=url):
+                (self.assertChanged if changed else self.assertUnchanged)(url, etag)
+
+    def test_user_changes_invalidate_only_lists_nesting_them(self):
+        other = Movie.objects.create(title='Caper', genre='ACTION', release_year=2001, description='A caper')
+        Review.objects.create(movie=other, user=User.objects.create_user(username='fan'), text='Fine', rating=3)
+        other_url = f'/api/movies/{other.pk}/reviews/'
+        etag, other_etag = self.etag(self.reviews_url), self.etag(other_url)
+
+        self.client.login(username='critic', password='unused')
+        self.author.save(update_fields=['last_login'])
+        self.assertUnchanged(self.reviews_url, etag)
+
+        self.author.username = 'top-critic'
+        self.author.save()
+        self.assertChanged(self.reviews_url, etag)
+        self.assertEqual(self.client.get(self.reviews_url).data['results'][0]['user']['username'], 'top-critic')
+        self.assertUnchanged(other_url, other_etag)
+
+    def test_responses_without_dependency_ids_are_not_cached(self):
+        response = self.client.get(f'{self.reviews_url}?fields=text,user.username')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response)
+        self.assertIn('ETag', self.client.get(f'{self.reviews_url}?fields=text'))
@@ -0,0 +1,79 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import connection
+from rest_framework.test import APITestCase
+
+from api import search
+from api.models import Movie, Review
+
+
+class SearchTests(APITestCase):
+    """
+    The FTS5 indexes rank and highlight matches and follow every write to their tables.
+    """
+
+    def setUp(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest("Full-text search needs SQLite's FTS5.")
+        # Test databases are created without migrations.
+        search.install()
+        caches['responses'].clear()
+        self.user = User.objects.create_user(username='viewer')
+        self.client.force_authenticate(self.user)
+
+    def add_movie(self, title, description='A film'):
+        return Movie.objects.create(title=title, genre='ACTION', release_year=2000, description=description)
+
+    def test_title_matches_rank_above_description_matches(self):
+        described = self.add_movie('Night Moves', 'A heist goes wrong')
+        titled = self.add_movie('The Heist')
+        self.add_movie('Unrelated')
+        self.assertEqual([hit.id for hit in search.search_movies('heist')], [titled.pk, described.pk])
+        response = self.client.get('/api/movies/?search=heist')
+        self.assertEqual([movie['id'] for movie in response.data['results']], [titled.pk, described.pk])
+        self.assertIs(response.data['search_truncated'], False)
+
+    def test_autocomplete_matches_prefixes(self):
+        movie = self.add_movie('Heat')
+        self.add_movie('Hearts')
+        self.add_movie('Alien')
+        response = self.client.get('/api/movies/autocomplete/?q=hea')
+        self.assertEqual(len(response.data), 2)
+        response = self.client.get('/api/movies/autocomplete/?q=heat')
+        self.assertEqual(response.data, [
+            {'id': movie.pk, 'title': 'Heat', 'release_year': 2000, 'highlight': '<mark>Heat</mark>'},
+        ])
+
+    def test_snippets_escape_indexed_text(self):
+        movie = self.add_movie('Heist')
+        Review.objects.create(movie=movie, user=self.user, text='<script>alert(1)</script> a <b>great</b> heist', rating=5)
+        snippet = self.client.get('/api/reviews/search/?q=heist').data[0]['search_snippet']
+        self.assertEqual(snippet, '&lt;script&gt;alert(1)&lt;/script&gt; a &lt;b&gt;great&lt;/b&gt; <mark>heist</mark>')
+
+    def test_triggers_follow_updates_and_deletes(self):
+        movie = self.add_movie('Heist')
+        review = Review.objects.create(movie=movie, user=self.user, text='A slow burn', rating=3)
+        self.assertEqual([hit.id for hit in search.search_reviews('slow')], [review.pk])
+
+        Review.objects.filter(pk=review.pk).update(text='A fast ride')
+        self.assertEqual(search.search_reviews('slow'), [])
+        self.assertEqual([hit.id for hit in search.search_reviews('fast')], [review.pk])
+
+        Movie.objects.filter(pk=movie.pk).update(title='Caper')
+        self.assertEqual(search.search_movies('heist'), [])
+        movie.delete()
+        self.assertEqual(search.search_movies('caper'), [])
+        self.assertEqual(search.search_reviews('fast'), [])
+
+    def test_results_cut_off_at_max_results_are_reported(self):
+        for index in range(3):
+            self.add_movie(f'Heist {index}')
+        with mock.patch.object(search, 'MAX_RESULTS', 2):
+            hits = search.search_movies('heist')
+            self.assertEqual((len(hits), hits.truncated), (2, True))
+            response = self.client.get('/api/movies/?search=heist')
+        self.assertEqual(response.data['count'], 2)
+        self.assertIs(response.data['search_truncated'], True)
+        self.assertNotIn('search_truncated', self.client.get('/api/movies/').data)
@@ -0,0 +1,81 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from api import suggestions
+from api.models import FollowSuggestion, Movie, Review
+
+
+class ScoringTests(TestCase):
+    """
+    Candidates are friends of friends, ranked by mutual follows and then by co-reviewed movies.
+    """
+
+    def test_mutual_follows_rank_candidates(self):
+        # 1 follows 2 and 3; both follow 4, only 2 follows 5.
+        following = {1: {2, 3}, 2: {4, 5}, 3: {4}}
+        self.assertEqual(suggestions.score_candidates(1, following, {}), [(4, 2, 2, 0), (5, 1, 1, 0)])
+        self.assertEqual(suggestions.score_candidates(1, following, {}, top_n=1), [(4, 2, 2, 0)])
+        self.assertEqual(suggestions.score_candidates(4, following, {}), [])
+
+    def test_co_reviews_break_ties(self):
+        following = {1: {2}, 2: {3, 4, 5}}
+        reviewed = {1: {10, 11}, 4: {10}, 5: {10, 11}, 3: {12}}
+        self.assertEqual(suggestions.score_candidates(1, following, reviewed), [
+            (5, 2.0, 1, 2), (4, 1.5, 1, 1), (3, 1, 1, 0),
+        ])
+        # Equal scores fall back to the lower id.
+        self.assertEqual([entry[0] for entry in suggestions.score_candidates(1, following, {})], [3, 4, 5])
+
+    def test_self_and_followed_profiles_are_excluded(self):
+        # 2 follows 1 back and also follows 3, whom 1 already follows.
+        following = {1: {2, 3}, 2: {1, 3, 4}, 3: {4}}
+        self.assertEqual(suggestions.score_candidates(1, following, {}), [(4, 2, 2, 0)])
+
+    def test_followees_following_too_many_are_skipped(self):
+        following = {1: {2, 3}, 2: {4, 5, 6}, 3: {4}}
+        with mock.patch.object(suggestions, 'MAX_FOLLOWEE_FANOUT', 2):
+            self.assertEqual(suggestions.score_candidates(1, following, {}), [(4, 1, 1, 0)])
+        self.assertEqual(len(suggestions.score_candidates(1, following, {})), 3)
+
+
+class BuildTests(TestCase):
+    """
+    ``build`` stores every profile's suggestions and drops those of profiles that stopped following.
+    """
+
+    def setUp(self):
+        self.profiles = [User.objects.create_user(username=f'member{index}').profile for index in range(5)]
+        a, b, c, d, e = self.profiles
+        for follower, followee in ((a, b), (a, c), (b, d), (b, e), (c, d)):
+            follower.follow(followee)
+        movie = Movie.objects.create(title='Heist', genre='ACTION', release_year=2000, description='A heist')
+        for profile in (a, e):
+            Review.objects.create(movie=movie, user=profile.user, text='Great', rating=4)
+
+    def suggested(self, profile):
+        return [
+            (self.profiles.index(suggested), suggested.score, suggested.mutual_count, suggested.co_reviewed_count)
+            for suggested in suggestions.suggested_profiles(profile)
+        ]
+
+    def test_build_stores_scored_suggestions(self):
+        self.assertEqual(suggestions.build(chunk_size=1), 2)
+        self.assertEqual(self.suggested(self.profiles[0]), [(3, 2.0, 2, 0), (4, 1.5, 1, 1)])
+        self.assertEqual(FollowSuggestion.objects.exclude(profile=self.profiles[0]).count(), 0)
+
+    def test_later_follows_are_hidden_until_the_next_build(self):
+        suggestions.build()
+        a, _, _, d, _ = self.profiles
+        a.follow(d)
+        self.assertEqual(self.suggested(a), [(4, 1.5, 1, 1)])
+        self.assertEqual(FollowSuggestion.objects.filter(profile=a).count(), 2)
+
+    def test_profiles_that_stop_following_lose_their_suggestions(self):
+        suggestions.build()
+        a, b, c, _, _ = self.profiles
+        a.unfollow(b)
+        a.unfollow(c)
+        self.assertEqual(suggestions.build(), 0)
+        self.assertFalse(FollowSuggestion.objects.exists())
@@ -0,0 +1,102 @@
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+from rest_framework.test import APITestCase
+
+from api import throttling
+from api.models import Movie, Review
+
+RATES = {'like': '2/min', 'like_ip': '3/min', 'review': '10/min', 'review_ip': '50/min'}
+
+
+class Clock:
+    """
+    Stands in for the ``time`` module, moved forward by hand.
+    """
+
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+
+class BackendTests(SimpleTestCase):
+    """
+    Both bucket backends allow a burst of ``capacity`` and then one request per interval.
+    """
+
+    def setUp(self):
+        caches['default'].clear()
+        self.clock = Clock()
+        patcher = mock.patch.object(throttling, 'time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_bursts_then_refills_one_token_per_interval(self):
+        for backend in (throttling.LocalBackend(), throttling.CacheBackend('default')):
+            with self.subTest(backend=type(backend).__name__):
+                key = f'test:{type(backend).__name__}'
+                self.assertEqual([backend.consume(key, 3, 2.0) for _ in range(3)], [None] * 3)
+                self.assertAlmostEqual(backend.consume(key, 3, 2.0), 2.0)
+                # Rejected requests take no token.
+                self.assertAlmostEqual(backend.consume(key, 3, 2.0), 2.0)
+                self.clock.now += 0.5
+                self.assertAlmostEqual(backend.consume(key, 3, 2.0), 1.5)
+                self.clock.now += 1.5
+                self.assertIsNone(backend.consume(key, 3, 2.0))
+                self.assertAlmostEqual(backend.consume(key, 3, 2.0), 2.0)
+
+                # An idle bucket fills up again, but no further than its capacity.
+                self.clock.now += 600
+                self.assertEqual([backend.consume(key, 3, 2.0) for _ in range(3)], [None] * 3)
+                self.assertIsNotNone(backend.consume(key, 3, 2.0))
+
+
+@override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': RATES})
+class ThrottleTests(APITestCase):
+    """
+    Write endpoints answer 429 with the seconds until the next token once a bucket is empty.
+    """
+
+    def setUp(self):
+        caches['default'].clear()
+        self.clock = Clock()
+        patcher = mock.patch.object(throttling, 'time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.users = [User.objects.create_user(username=f'fan{index}') for index in range(2)]
+        movie = Movie.objects.create(title='Heist', genre='ACTION', release_year=2000, description='A heist')
+        author = User.objects.create_user(username='critic')
+        self.review = Review.objects.create(movie=movie, user=author, text='Great', rating=5)
+        self.url = f'/api/reviews/{self.review.pk}/like/'
+
+    def like(self, user):
+        self.client.force_authenticate(user)
+        return self.client.post(self.url)
+
+    def test_exhausted_user_buckets_get_429_with_retry_after(self):
+        self.assertEqual([self.like(self.users[0]).status_code for _ in range(2)], [201, 200])
+        response = self.like(self.users[0])
+        self.assertEqual(response.status_code, 429)
+        # 2/min refills a token every 30 seconds.
+        self.assertEqual(response['Retry-After'], '30')
+        self.clock.now += 10
+        self.assertEqual(self.like(self.users[0])['Retry-After'], '20')
+        # Reads are never throttled.
+        self.assertEqual(self.client.get(f'/api/reviews/{self.review.pk}/').status_code, 200)
+        self.clock.now += 20
+        self.assertEqual(self.like(self.users[0]).status_code, 200)
+
+    def test_ip_buckets_cover_every_user_behind_an_address(self):
+        self.assertEqual([self.like(user).status_code for user in self.users], [201, 201])
+        self.assertEqual(self.like(self.users[0]).status_code, 200)
+        # The address has used its 3 tokens; the second user's own bucket still has one.
+        response = self.like(self.users[1])
+        self.assertEqual((response.status_code, response['Retry-After']), (429, '20'))
@@ -0,0 +1,130 @@
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import override_settings
+from PIL import Image
+from rest_framework.test import APITestCase
+
+from api import jobs, responsecache, thumbnails
+from api.models import Job, Movie, Review, UserProfile
+
+THUMBNAILS = {'VARIANTS': {'small': 40, 'medium': 128}, 'FORMATS': ['webp', 'jpeg']}
+
+
+def make_image(color='red', size=(300, 200), image_format='PNG', mode='RGBA'):
+    output = BytesIO()
+    Image.new(mode, size, color).save(output, format=image_format)
+    return output.getvalue()
+
+
+class ThumbnailTests(APITestCase):
+    """
+    Pictures are stored once per content and get their variants from a job or on demand.
+    """
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        override = override_settings(MEDIA_ROOT=media_root, THUMBNAILS=THUMBNAILS)
+        override.enable()
+        self.addCleanup(override.disable)
+        caches['responses'].clear()
+        self.user = User.objects.create_user(username='viewer', password='testpass123')
+        self.client.force_authenticate(self.user)
+
+    def upload(self, user, content, filename='me.png'):
+        profile = user.profile
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.profile_picture = SimpleUploadedFile(filename, content)
+            profile.save()
+        jobs.Worker(concurrency=1).run_batch()
+        profile.refresh_from_db()
+        return profile
+
+    def test_upload_builds_variants(self):
+        profile = self.upload(self.user, make_image())
+        name = profile.profile_picture.name
+        self.assertRegex(name, r'^profile_pics/[0-9a-f]{2}/[0-9a-f]{64}\.png$')
+        self.assertEqual(profile.profile_picture_variants, thumbnails.all_variants())
+        storage = thumbnails.picture_storage()
+        with storage.open(thumbnails.variant_name(name, 'small', 'webp')) as file:
+            image = Image.open(file)
+            self.assertEqual((image.format, image.size), ('WEBP', (40, 40)))
+        with storage.open(thumbnails.variant_name(name, 'medium', 'jpeg')) as file:
+            image = Image.open(file)
+            self.assertEqual((image.format, image.mode, image.size), ('JPEG', 'RGB', (128, 128)))
+
+    def test_duplicate_uploads_are_stored_once(self):
+        content = make_image('blue')
+        first = self.upload(self.user, content, 'a.png')
+        second = self.upload(User.objects.create_user(username='twin'), content, 'b.png')
+        self.assertEqual(first.profile_picture.name, second.profile_picture.name)
+        _, files = thumbnails.picture_storage().listdir(first.profile_picture.name.rsplit('/', 1)[0])
+        self.assertEqual(len(files), 1)
+
+    def test_serializers_expose_variant_urls(self):
+        profile = self.upload(self.user, make_image())
+        movie = Movie.objects.create(title='Heist', genre='ACTION', release_year=2000, description='A heist')
+        Review.objects.create(movie=movie, user=self.user, text='Great', rating=5)
+        small = self.client.get('/api/reviews/').data['results'][0]['user']['avatar']['small']
+        self.assertEqual(
+            small['webp'],
+            'http://testserver/media/' + thumbnails.variant_name(profile.profile_picture.name, 'small', 'webp'),
+        )
+        response = self.client.get(f'/api/profiles/{profile.pk}/')
+        self.assertEqual(response.data['avatar'], response.data['user']['avatar'])
+
+    def test_missing_variants_are_built_on_request(self):
+        profile = self.user.profile
+        with self.captureOnCommitCallbacks(execute=False):
+            profile.profile_picture = SimpleUploadedFile('me.jpg', make_image(image_format='JPEG', mode='RGB'))
+            profile.save()
+        profile.refresh_from_db()
+        self.assertEqual(profile.profile_picture_variants, [])
+        url = self.client.get(f'/api/users/{self.user.pk}/').data['avatar']['medium']['webp']
+        self.assertIn('/api/avatars/', url)
+
+        self.client.force_authenticate(None)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            response['Location'], '/media/' + thumbnails.variant_name(profile.profile_picture.name, 'medium', 'webp')
+        )
+        profile.refresh_from_db()
+        self.assertEqual(profile.profile_picture_variants, ['medium.webp'])
+        # The rest are left to one build job, however many are requested.
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(url.replace('medium', 'small'))
+        self.assertEqual(Job.objects.filter(task='api.thumbnails.build').count(), 1)
+        jobs.Worker(concurrency=1).run_batch()
+        profile.refresh_from_db()
+        self.assertEqual(profile.profile_picture_variants, thumbnails.all_variants())
+        self.assertEqual(self.client.get(url.replace('medium', 'huge')).status_code, 404)
+        self.assertEqual(self.client.get(f'/api/avatars/{"0" * 64}/small.webp').status_code, 404)
+
+    def test_existing_variants_are_not_recorded_again(self):
+        profile = self.upload(self.user, make_image())
+        name = profile.profile_picture.name
+        version = responsecache.get_versions([f'user:{self.user.pk}'])
+        url = f'/api/avatars/{thumbnails.picture_key(name)}/small.webp'
+        for _ in range(2):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertEqual(self.client.get(url).status_code, 302)
+        thumbnails.build(name)
+        self.assertEqual(responsecache.get_versions([f'user:{self.user.pk}']), version)
+        self.assertFalse(Job.objects.filter(status=Job.QUEUED).exists())
+
+    def test_build_thumbnails_moves_older_uploads(self):
+        storage = thumbnails.picture_storage()
+        legacy = storage.save_as('profile_pics/old.png', SimpleUploadedFile('old.png', make_image('green')))
+        UserProfile.objects.filter(pk=self.user.profile.pk).update(profile_picture=legacy)
+        call_command('build_thumbnails', stdout=StringIO())
+        profile = UserProfile.objects.get(pk=self.user.profile.pk)
+        self.assertRegex(profile.profile_picture.name, r'^profile_pics/[0-9a-f]{2}/[0-9a-f]{64}\.png$')
+        self.assertEqual(profile.profile_picture_variants, thumbnails.all_variants())
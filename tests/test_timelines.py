@@ -0,0 +1,158 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from api import timelines
+from api.models import Movie, Review, TimelineEntry, UserProfile
+from api.pagination import FeedCursorPagination
+
+
+# Fan-out, backfills and prunes are jobs; run them as the fixtures are written.
+@override_settings(JOBS={'EAGER': True}, FEED_FANOUT_THRESHOLD=3)
+class TimelineTests(APITestCase):
+    """
+    Timelines follow reviews and follows, stay capped, and feeds merge pull authors per page.
+    """
+
+    def setUp(self):
+        caches['responses'].clear()
+        self.reader = User.objects.create_user(username='reader')
+        self.author = User.objects.create_user(username='author')
+        self.client.force_authenticate(self.reader)
+        self.start = timezone.now() - timedelta(days=1)
+
+    def review(self, user, minutes):
+        movie = Movie.objects.create(
+            title=f'Heist {Movie.objects.count()}', genre='ACTION', release_year=2000, description='A heist'
+        )
+        review = Review.objects.create(movie=movie, user=user, text='Great', rating=4)
+        Review.objects.filter(pk=review.pk).update(timestamp=self.start + timedelta(minutes=minutes))
+        TimelineEntry.objects.filter(review=review).update(timestamp=self.start + timedelta(minutes=minutes))
+        return review
+
+    def timeline(self, user):
+        return set(TimelineEntry.objects.filter(user=user).values_list('review_id', flat=True))
+
+    def add_followers(self, user, count):
+        for index in range(count):
+            User.objects.create_user(username=f'{user.username}-fan{index}').profile.follow(user.profile)
+
+    def get_feed(self, url='/api/profiles/feed/?page_size=2'):
+        """
+        Walk the feed forwards, then back from the last page; return both id lists.
+        """
+        forward, pages = [], []
+        while url:
+            data = self.client.get(url).data
+            pages.append(data)
+            forward.extend(review['id'] for review in data['results'])
+            url = data['next']
+        backward = []
+        url = pages[-1]['previous']
+        while url:
+            data = self.client.get(url).data
+            backward[:0] = [review['id'] for review in data['results']]
+            url = data['previous']
+        return forward, backward + [review['id'] for review in pages[-1]['results']]
+
+    def test_reviews_are_fanned_out_to_followers(self):
+        self.reader.profile.follow(self.author.profile)
+        stranger = User.objects.create_user(username='stranger')
+        review = self.review(self.author, 1)
+        self.assertEqual(self.timeline(self.reader), {review.pk})
+        self.assertEqual(self.timeline(stranger), set())
+        self.assertEqual(UserProfile.objects.get(user=self.reader).timeline_length, 1)
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        other = User.objects.create_user(username='other')
+        reviews = [self.review(self.author, minutes) for minutes in range(3)]
+        kept = self.review(other, 10)
+        self.reader.profile.follow(other.profile)
+        with self.settings(FEED_BACKFILL_LIMIT=2):
+            self.reader.profile.follow(self.author.profile)
+        self.assertEqual(self.timeline(self.reader), {kept.pk, reviews[1].pk, reviews[2].pk})
+
+        self.reader.profile.unfollow(self.author.profile)
+        self.assertEqual(self.timeline(self.reader), {kept.pk})
+        self.assertEqual(UserProfile.objects.get(user=self.reader).timeline_length, 1)
+
+    def test_rebuild(self):
+        self.reader.profile.follow(self.author.profile)
+        review = self.review(self.author, 1)
+        TimelineEntry.objects.all().delete()
+        timelines.rebuild(self.reader.profile)
+        self.assertEqual(self.timeline(self.reader), {review.pk})
+
+    @override_settings(FEED_TIMELINE_LENGTH=3)
+    def test_timelines_are_capped(self):
+        self.reader.profile.follow(self.author.profile)
+        reviews = [self.review(self.author, minutes) for minutes in range(5)]
+        self.assertEqual(self.timeline(self.reader), {review.pk for review in reviews[2:]})
+
+        other = User.objects.create_user(username='other')
+        newer = [self.review(other, minutes) for minutes in range(10, 12)]
+        self.reader.profile.follow(other.profile)
+        self.assertEqual(self.timeline(self.reader), {reviews[4].pk} | {review.pk for review in newer})
+        self.assertEqual(UserProfile.objects.get(user=self.reader).timeline_length, 3)
+
+    def test_pull_authors_are_not_fanned_out_but_are_in_the_feed(self):
+        self.reader.profile.follow(self.author.profile)
+        self.add_followers(self.author, 2)
+        self.assertTrue(timelines.is_pull_author(UserProfile.objects.get(user=self.author)))
+        pulled = self.review(self.author, 2)
+        self.assertEqual(self.timeline(self.reader), set())
+
+        other = User.objects.create_user(username='other')
+        self.reader.profile.follow(other.profile)
+        pushed = [self.review(other, minutes) for minutes in (1, 3, 4)]
+        expected = [pushed[2].pk, pushed[1].pk, pulled.pk, pushed[0].pk]
+        self.assertEqual(self.get_feed(), (expected, expected))
+
+        # The estimate sums the timeline and the pull authors' reviews.
+        data = self.client.get('/api/profiles/feed/?total=estimate').data
+        self.assertEqual((data['estimated_total'], data['estimated_total_is_capped']), (4, False))
+        with mock.patch.object(FeedCursorPagination, 'estimate_cap', 3):
+            data = self.client.get('/api/profiles/feed/?total=estimate&page_size=2').data
+        self.assertEqual((data['estimated_total'], data['estimated_total_is_capped']), (3, True))
+
+    def test_crossing_the_threshold_keeps_every_review(self):
+        self.reader.profile.follow(self.author.profile)
+        pushed = self.review(self.author, 1)
+        # Up: already pushed reviews stay in the timeline and are listed once.
+        self.add_followers(self.author, 2)
+        pulled = self.review(self.author, 2)
+        self.assertEqual(self.timeline(self.reader), {pushed.pk})
+        self.assertEqual(self.get_feed()[0], [pulled.pk, pushed.pk])
+
+        # Down: reviews written while pulled are pushed once the author drops below the threshold.
+        User.objects.get(username='author-fan0').profile.unfollow(self.author.profile)
+        self.assertEqual(self.timeline(self.reader), {pushed.pk, pulled.pk})
+        self.assertEqual(self.get_feed()[0], [pulled.pk, pushed.pk])
+
+    def test_losing_followers_in_bulk_or_by_deletion_demotes(self):
+        self.add_followers(self.author, 4)
+        self.reader.profile.follow(self.author.profile)
+        pulled = self.review(self.author, 1)
+        fans = UserProfile.objects.filter(user__username__in=['author-fan0', 'author-fan1'])
+        UserProfile.objects.get(user=self.author).followers.remove(*fans)
+        self.assertEqual(self.timeline(self.reader), set())
+
+        User.objects.get(username='author-fan2').delete()
+        self.assertEqual(self.timeline(self.reader), {pulled.pk})
+
+    def test_feed_pages_break_timestamp_ties(self):
+        self.reader.profile.follow(self.author.profile)
+        other = User.objects.create_user(username='other')
+        self.reader.profile.follow(other.profile)
+        self.add_followers(other, 2)
+        reviews = [self.review(user, 5) for user in (self.author, other, self.author, other, self.author)]
+        expected = sorted(review.pk for review in reviews)[::-1]
+        with self.assertNumQueries(4):
+            # Pull authors, a seek per source, then the page's reviews by primary key.
+            self.client.get('/api/profiles/feed/?page_size=2')
+        self.assertEqual(self.get_feed(), (expected, expected))
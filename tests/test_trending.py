@@ -0,0 +1,84 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from api import trending
+from api.models import Like, Movie, Review, TrendingBucket, TrendingMovie, TrendingReview
+
+TRENDING = {'WINDOW_HOURS': 48, 'HALF_LIFE_HOURS': 10, 'WEIGHTS': {'review_count': 3, 'like_count': 1, 'comment_count': 2}}
+
+
+# Activity is recorded by jobs; run them as the fixtures are written.
+@override_settings(JOBS={'EAGER': True}, TRENDING=TRENDING)
+class TrendingTests(TestCase):
+    """
+    Buckets count every addition and removal, and leaderboards decay them over the window.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='viewer')
+        self.movies = [
+            Movie.objects.create(title=f'Heist {index}', genre='ACTION', release_year=2000, description='A heist')
+            for index in range(2)
+        ]
+        self.now = trending.bucket_hour(timezone.now())
+
+    def counts(self, **target):
+        return list(TrendingBucket.objects.filter(**target).values_list('review_count', 'like_count', 'comment_count'))
+
+    def test_write_paths_fill_the_current_bucket(self):
+        review = Review.objects.create(movie=self.movies[0], user=self.user, text='Great', rating=5)
+        like = Like.objects.create(review=review, user=User.objects.create_user(username='fan'))
+        self.assertEqual(self.counts(movie=self.movies[0]), [(1, 1, 0)])
+        self.assertEqual(self.counts(review=review), [(0, 1, 0)])
+        like.delete()
+        self.assertEqual(self.counts(review=review), [(0, 0, 0)])
+
+    def test_increments_to_new_and_existing_buckets_all_count(self):
+        movie_id = self.movies[0].pk
+        trending.record(movie_ids=[movie_id, movie_id], like_count=1)
+        trending.record(movie_ids=[movie_id], like_count=1)
+        self.assertEqual(self.counts(movie_id=movie_id), [(0, 3, 0)])
+
+    def test_removals_recorded_before_their_additions_cancel_out(self):
+        movie_id = self.movies[0].pk
+        trending.record(movie_ids=[movie_id], like_count=-1)
+        trending.record(movie_ids=[movie_id], like_count=1)
+        self.assertEqual(self.counts(movie_id=movie_id), [(0, 0, 0)])
+        self.assertEqual(trending.refresh(), (0, 0))
+
+    def test_deleted_targets_get_no_bucket(self):
+        movie_id = self.movies[0].pk
+        self.movies[0].delete()
+        trending.record(movie_ids=[movie_id], like_count=1)
+        self.assertFalse(TrendingBucket.objects.exists())
+
+    def test_activity_decays_with_age(self):
+        old, new = self.movies
+        trending.record(movie_ids=[old.pk], at=self.now - timedelta(hours=10), like_count=4)
+        trending.record(movie_ids=[new.pk], like_count=1, comment_count=1)
+        self.assertEqual(trending.refresh(now=self.now), (2, 0))
+        scores = dict(TrendingMovie.objects.values_list('movie_id', 'score'))
+        self.assertAlmostEqual(scores[old.pk], 2.0)
+        self.assertAlmostEqual(scores[new.pk], 3.0)
+        self.assertEqual([movie.pk for movie in trending.trending_movies(10)], [new.pk, old.pk])
+
+    def test_activity_outside_the_window_is_dropped(self):
+        review = Review.objects.create(movie=self.movies[0], user=self.user, text='Great', rating=5)
+        trending.record(review_ids=[review.pk], at=self.now - timedelta(hours=49), like_count=1)
+        self.assertFalse(TrendingBucket.objects.filter(review=review).exists())
+
+        trending.record(review_ids=[review.pk], at=self.now - timedelta(hours=47), like_count=1)
+        self.assertEqual(trending.refresh(now=self.now), (1, 1))
+        self.assertEqual(list(TrendingReview.objects.values_list('review_id', flat=True)), [review.pk])
+        self.assertEqual(trending.refresh(now=self.now + timedelta(hours=2)), (1, 0))
+        self.assertFalse(TrendingBucket.objects.filter(review=review).exists())
+
+    def test_buckets_have_exactly_one_target(self):
+        review = Review.objects.create(movie=self.movies[0], user=self.user, text='Great', rating=5)
+        for target in ({}, {'movie': self.movies[1], 'review': review}):
+            with self.subTest(target=target), self.assertRaises(IntegrityError), transaction.atomic():
+                TrendingBucket.objects.create(hour=self.now, **target)
@@ -0,0 +1,95 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from rest_framework.test import APITestCase
+
+from api.models import Like, Movie, Review
+from api.serializers import LikeSerializer, ReviewSerializer
+
+
+class ReviewTests(APITestCase):
+    """
+    Each user reviews a movie at most once; repeats are a 400, never a 500.
+    """
+
+    def setUp(self):
+        caches['responses'].clear()
+        self.user = User.objects.create_user(username='critic')
+        self.client.force_authenticate(self.user)
+        self.movies = [
+            Movie.objects.create(title=f'Heist {index}', genre='ACTION', release_year=2000, description='A heist')
+            for index in range(2)
+        ]
+
+    def post(self, movie, text='Great'):
+        return self.client.post('/api/reviews/', {'movie': self.movies[movie].pk, 'text': text, 'rating': 5})
+
+    def test_duplicate_reviews_are_rejected(self):
+        response = self.post(0)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['user']['id'], self.user.pk)
+        response = self.post(0, text='Again')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['non_field_errors'], ["You have already reviewed this movie."])
+        self.assertEqual(Review.objects.filter(movie=self.movies[0]).count(), 1)
+        # Other users and other movies are unaffected.
+        self.assertEqual(self.post(1).status_code, 201)
+        self.client.force_authenticate(User.objects.create_user(username='fan'))
+        self.assertEqual(self.post(0).status_code, 201)
+
+    def test_edits_cannot_move_a_review_onto_another(self):
+        first = Review.objects.get(pk=self.post(0).data['id'])
+        self.post(1)
+        serializer = ReviewSerializer(first, data={'text': 'Changed my mind'}, partial=True)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        serializer = ReviewSerializer(first, data={'movie': self.movies[1].pk}, partial=True)
+        self.assertFalse(serializer.is_valid())
+        self.assertEqual(serializer.errors['non_field_errors'], ["You have already reviewed this movie."])
+
+    def test_concurrent_duplicates_are_a_validation_error(self):
+        self.post(0)
+        # As if another request inserted the review after validate() ran.
+        with mock.patch.object(ReviewSerializer, 'validate', lambda serializer, attrs: attrs):
+            response = self.post(0, text='Again')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['non_field_errors'], ["You have already reviewed this movie."])
+        self.assertEqual(Review.objects.count(), 1)
+
+
+class LikeTests(APITestCase):
+    """
+    Liking a review twice through ``/api/likes/`` is a 400 and leaves the counter alone.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='fan')
+        self.client.force_authenticate(self.user)
+        movie = Movie.objects.create(title='Heist', genre='ACTION', release_year=2000, description='A heist')
+        self.review = Review.objects.create(
+            movie=movie, user=User.objects.create_user(username='critic'), text='Great', rating=5,
+        )
+
+    def like(self):
+        return self.client.post('/api/likes/', {'review': self.review.pk})
+
+    def assertLikes(self, count):
+        self.review.refresh_from_db()
+        self.assertEqual((Like.objects.filter(review=self.review).count(), self.review.likes_count), (count, count))
+
+    def test_duplicate_likes_are_rejected(self):
+        self.assertEqual(self.like().status_code, 201)
+        response = self.like()
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['non_field_errors'], ["You have already liked this review."])
+        self.assertLikes(1)
+        self.client.force_authenticate(User.objects.create_user(username='other'))
+        self.assertEqual(self.like().status_code, 201)
+        self.assertLikes(2)
+
+    def test_concurrent_duplicates_are_a_validation_error(self):
+        self.like()
+        with mock.patch.object(LikeSerializer, 'validate', lambda serializer, attrs: attrs):
+            response = self.like()
+        self.assertEqual(response.status_code, 400)
+        self.assertLikes(1)